@@ -0,0 +1,154 @@
+from flask import Flask
+from flask_cors import CORS
+import atexit
+import os
+
+def create_app(config_name=None):
+    """Build the Flask app: config, database pool, lazy services and blueprints"""
+    from config import config
+
+    app = Flask(__name__)
+
+    config_name = config_name or os.environ.get('FLASK_ENV', 'development')
+    app.config.from_object(config[config_name])
+
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": app.config['CORS_ORIGINS'],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"]
+        }
+    })
+
+    from app.models.database import Database
+    profiler = None
+    if app.config['DB_PROFILE']:
+        from app.models.profiler import QueryProfiler
+        profiler = QueryProfiler(
+            app.config['DATABASE_PATH'],
+            threshold_ms=app.config['DB_SLOW_QUERY_MS'],
+            log_path=app.config['DB_PROFILE_LOG'] or None
+        )
+        print(f"✓ Query profiling on (slow >= {profiler.threshold_ms:g} ms, log: {profiler.log_path})")
+    app.db = Database(
+        app.config['DATABASE_PATH'],
+        pool_size=app.config['DB_POOL_SIZE'],
+        pool_timeout=app.config['DB_POOL_TIMEOUT'],
+        profiler=profiler,
+        history_cache_bytes=int(app.config['HISTORY_CACHE_MB'] * 1024 * 1024),
+        columnar_engine=app.config['COLUMNAR_ENGINE']
+    )
+    print(f"✓ Database initialized: {app.config['DATABASE_PATH']}")
+
+    # Jobs a previous process left behind can never finish. This runs once per
+    # app, i.e. in the gunicorn master when preloading, never per worker.
+    interrupted = app.db.fail_interrupted_jobs()
+    if interrupted:
+        print(f"Marked {interrupted} interrupted jobs as failed")
+
+    # Forecasting, anomaly detection and the model client load on first use
+    from app.services import Services
+    app.services = Services(app.db, app.config)
+    # Inserts through the API wake the incremental anomaly scorer
+    app.db.subscribe(app.services.notify_insert)
+
+    # Request/stage timing and /metrics
+    from app.utils import metrics
+    metrics.init_app(app)
+    _register_stats(app, metrics)
+
+    # Register all blueprints
+    from app.routes.auth import auth_bp
+    from app.routes.transactions import transactions_bp
+    from app.routes.chat import chat_bp
+    from app.routes.jobs import jobs_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(transactions_bp, url_prefix='/api/transactions')
+    app.register_blueprint(chat_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+
+    @app.route('/health')
+    def health():
+        return {'status': 'healthy', 'environment': config_name}
+
+    @app.route('/stats')
+    def stats():
+        stats = {
+            'db_pool': app.db.pool_stats(),
+            'history_cache': app.db.history_cache_stats(),
+            'pid': os.getpid()
+        }
+        if app.db.profiler:
+            stats['top_queries'] = app.db.profiler.top_queries(10)
+        return stats
+
+    @app.route('/')
+    def index():
+        return {
+            'message': 'Student Finance AI API',
+            'version': '1.0.0',
+            'endpoints': {
+                'auth': '/api/auth',
+                'transactions': '/api/transactions',
+                'chat': '/api/chat',
+                'jobs': '/api/jobs',
+                'health': '/health',
+                'metrics': '/metrics',
+                'stats': '/stats'
+            }
+        }
+
+    app.config_name = config_name
+    app.shutdown = lambda: shutdown_app(app)
+    atexit.register(app.shutdown)
+    return app
+
+def _register_stats(app, metrics):
+    """Export counters the pool and services already keep, read at scrape time"""
+    services = app.services
+
+    def loaded(name, stats):
+        return lambda: stats() if name in services.loaded() else None
+
+    metrics.register_stats(
+        'db_pool', 'SQLite connection pool', app.db.pool_stats,
+        counters=('checkouts', 'waits'), gauges=('open_connections', 'in_use', 'idle', 'max_size')
+    )
+    metrics.register_stats(
+        'history_cache', 'Columnar user history cache', app.db.history_cache_stats,
+        counters=('hits', 'misses', 'stale', 'evictions', 'invalidations', 'write_throughs'),
+        gauges=('size', 'rows', 'bytes', 'bytes_per_row', 'hit_rate')
+    )
+    metrics.register_stats(
+        'forecast_cache', 'Forecast cache',
+        loaded('forecaster', lambda: services.forecaster.cache_stats()),
+        counters=('hits', 'misses', 'evictions', 'expirations', 'persisted_hits'), gauges=('size',)
+    )
+    metrics.register_stats(
+        'intent_cache', 'LLM intent cache',
+        loaded('response_cache', lambda: services.response_cache.stats()),
+        counters=('cache_hits', 'persisted_hits', 'rule_hits', 'misses')
+    )
+    metrics.register_stats(
+        'chatterbox', 'Chatterbox client',
+        loaded('chatterbox', lambda: services.chatterbox.stats()),
+        counters=('requests', 'failures', 'rejected_by_breaker')
+    )
+    metrics.register_stats(
+        'jobs', 'Background jobs',
+        loaded('job_queue', lambda: services.job_queue.stats()),
+        counters=('submitted', 'deduplicated', 'completed', 'failed')
+    )
+    metrics.register_stats(
+        'anomaly_consumer', 'Incremental anomaly scorer',
+        loaded('anomaly_consumer', lambda: services.anomaly_consumer.stats()),
+        counters=('batches', 'scored', 'flagged', 'skipped_no_model')
+    )
+
+def shutdown_app(app):
+    """Stop background work and close connections; safe to call more than once"""
+    app.services.shutdown()
+    app.db.pool.close_all()
+    if app.db.profiler:
+        app.db.profiler.close()
@@ -0,0 +1,133 @@
+import threading
+from app.models.migrations import ANOMALY_CONSUMER
+
+class AnomalyConsumer:
+    """Scores newly inserted transactions as they arrive.
+
+    Subscribed to the Database insert event, it wakes a background thread
+    that reads every transaction past its offset in consumer_offsets, scores
+    the new expenses against each user's current model (never refitting)
+    and logs the hits together with the advanced offset in one database
+    transaction. Work is O(new rows); on start it replays whatever arrived
+    while the process was down. Users without a fitted model are skipped
+    until the full detector fits one.
+
+    Every gunicorn worker runs one. The offset only advances from the value
+    a batch was read at, under the database write lock, so each batch is
+    logged once and the offset never moves backwards; a worker that loses
+    the race drops its results and continues from the new offset.
+    """
+
+    name = ANOMALY_CONSUMER
+
+    def __init__(self, db, detector, batch_size=1000, poll_interval=30.0):
+        self.db = db
+        self.detector = detector
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.batches = 0
+        self.scored = 0
+        self.flagged = 0
+        self.skipped = 0
+
+    def notify(self, user_ids):
+        """Insert event callback; only wakes the worker"""
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                self.process_pending()
+            except Exception as e:
+                print(f"Anomaly consumer error: {e}")
+            # The timeout also catches inserts made by other processes
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def process_pending(self):
+        """Score all transactions past the stored offset; returns rows read"""
+        with self._lock:
+            processed = 0
+            while True:
+                # Recorded when the schema was created or migrated
+                offset = self.db.get_consumer_offset(self.name) or 0
+                batch = self.db.get_transactions_after(offset, self.batch_size)
+                if batch.empty:
+                    return processed
+
+                hits = self._score_batch(batch)
+                # Hits and offset commit together, so a crash replays the batch
+                if self.db.commit_consumer_batch(self.name, offset, int(batch['id'].max()), hits):
+                    processed += len(batch)
+                    self.batches += 1
+
+    def _score_batch(self, batch):
+        """Anomaly rows (transaction_id, score, reason, model_version) for a batch"""
+        expenses = batch[batch['type'] == 'expense']
+        rows = []
+        for user_id, new in expenses.groupby('user_id'):
+            state = self.detector.current_model(int(user_id))
+            if state is None:
+                self.skipped += len(new)
+                continue
+
+            predictions, scores = self.detector.score(new, state)
+            self.scored += len(new)
+
+            is_anomaly = predictions == -1
+            if not is_anomaly.any():
+                continue
+            flagged = new[is_anomaly]
+            reasons = self._reasons(int(user_id), flagged)
+            rows.extend(
+                (int(txn_id), float(score), reason, state['version'])
+                for txn_id, score, reason in zip(flagged['id'], scores[is_anomaly], reasons)
+            )
+            self.flagged += len(flagged)
+        return rows
+
+    def _reasons(self, user_id, flagged):
+        """Reason text from the rollup means, without loading the history"""
+        totals = {}
+        counts = {}
+        for txn_type, category, _, total, txn_count in self.db.get_user_aggregates(user_id):
+            if txn_type == 'expense':
+                totals[category] = totals.get(category, 0) + total
+                counts[category] = counts.get(category, 0) + txn_count
+        overall_mean = sum(totals.values()) / max(sum(counts.values()), 1)
+
+        reasons = []
+        for amount, category in zip(flagged['amount'], flagged['category']):
+            category_mean = totals.get(category, 0) / max(counts.get(category, 0), 1)
+            if category_mean > 0 and amount > category_mean * 2:
+                reasons.append(f"Amount ${amount:.2f} is {amount / category_mean:.1f}x category average")
+            elif overall_mean > 0 and amount > overall_mean * 3:
+                reasons.append(f"Unusually high spending: {amount / overall_mean:.1f}x overall average")
+            else:
+                reasons.append("Unusual pattern detected")
+        return reasons
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'scored': self.scored,
+            'flagged': self.flagged,
+            'skipped_no_model': self.skipped,
+            'offset': self.db.get_consumer_offset(self.name)
+        }
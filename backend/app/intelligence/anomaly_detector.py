@@ -1,57 +1,256 @@
 from sklearn.ensemble import IsolationForest
+from collections import OrderedDict
+import json
+import pickle
 import numpy as np
 import pandas as pd
+from app.models.dates import CALENDAR
+from app.models.history_cache import HISTORY_COLUMNS
+from app.utils.metrics import ANOMALY_SECONDS, timed
 
 class AnomalyDetector:
-    def __init__(self, db):
+    """IsolationForest anomaly detection with per-user persisted models.
+
+    A fitted model is stored in the anomaly_models table together with the
+    number of rows and the highest transaction id it was trained on. Later
+    calls score against that model and only refit once enough new data has
+    arrived or the new amounts have drifted away from the training mean.
+    Categories enter the features as their stable category ids, so a stored
+    model reads new rows, and categories added since, the way it was fitted.
+    """
+
+    def __init__(self, db, contamination=0.1, refit_min_rows=20, refit_fraction=0.25,
+                 drift_threshold=3.0, cache_size=128):
         self.db = db
-        self.model = IsolationForest(contamination=0.1, random_state=42)
-    
-    def detect_anomalies(self, user_id):
-        df = self.db.get_user_transactions(user_id)
-        df = df[df['type'] == 'expense']
-        
+        self.contamination = contamination
+        self.refit_min_rows = refit_min_rows
+        self.refit_fraction = refit_fraction
+        self.drift_threshold = drift_threshold
+        self.cache_size = cache_size
+        self._models = OrderedDict()
+
+    @timed(ANOMALY_SECONDS, 'detect')
+    def detect_anomalies(self, user_id, snapshot=None):
+        """Flag unusual expenses; ``snapshot`` reuses data already loaded for the request"""
+        if snapshot is not None:
+            df = snapshot.expenses.copy()
+        else:
+            df = self.db.get_user_history(user_id, HISTORY_COLUMNS, txn_type='expense')
+
         if len(df) < 10:
             return []
-        
-        # Feature engineering
-        df['day_of_week'] = pd.to_datetime(df['date']).dt.dayofweek
-        df['day_of_month'] = pd.to_datetime(df['date']).dt.day
-        
-        # Category encoding
-        category_map = {cat: idx for idx, cat in enumerate(df['category'].unique())}
-        df['category_encoded'] = df['category'].map(category_map)
-        
-        # Features for anomaly detection
-        features = df[['amount', 'day_of_week', 'category_encoded']].values
-        
-        # Fit and predict
-        predictions = self.model.fit_predict(features)
-        anomaly_scores = self.model.score_samples(features)
-        
+
+        # Feature engineering: calendar attributes looked up by day number
+        calendar = CALENDAR.lookup(df['day'].to_numpy(), ('day_of_week', 'day_of_month'))
+        df['day_of_week'] = calendar['day_of_week']
+        df['day_of_month'] = calendar['day_of_month']
+
+        state = self._get_model(user_id, df)
+
+        # Score against the cached model
+        predictions, anomaly_scores = self.score(df, state)
+
         # Flag anomalies
         df['is_anomaly'] = predictions == -1
         df['anomaly_score'] = anomaly_scores
-        
+
         anomalies = df[df['is_anomaly']].copy()
-        
-        # Generate reasons
-        for idx, row in anomalies.iterrows():
-            reason = self._generate_reason(row, df)
-            anomalies.at[idx, 'reason'] = reason
-            
-            # Log to database
-            self.db.log_anomaly(row['id'], row['anomaly_score'], reason)
-        
-        return anomalies[['id', 'date', 'amount', 'category', 'anomaly_score', 'reason']].to_dict('records')
-    
-    def _generate_reason(self, transaction, history):
-        category_avg = history[history['category'] == transaction['category']]['amount'].mean()
-        overall_avg = history['amount'].mean()
-        
-        if transaction['amount'] > category_avg * 2:
-            return f"Amount ${transaction['amount']:.2f} is {transaction['amount']/category_avg:.1f}x category average"
-        elif transaction['amount'] > overall_avg * 3:
-            return f"Unusually high spending: {transaction['amount']/overall_avg:.1f}x overall average"
-        else:
-            return "Unusual pattern detected"
+
+        # Generate reasons for all anomalies in one pass
+        anomalies = anomalies.join(self._generate_reasons(anomalies, df))
+
+        # Log to database in one batch, deduplicated per model version
+        self.db.log_anomalies([
+            (int(txn_id), float(score), reason, state['version'])
+            for txn_id, score, reason in zip(anomalies['id'], anomalies['anomaly_score'], anomalies['reason'])
+        ])
+
+        result = anomalies[['id', 'date', 'amount', 'category', 'anomaly_score', 'reason',
+                            'reason_code', 'z_score', 'percentile']]
+        # NaN statistics (single-row or constant categories) are not valid JSON
+        return result.astype(object).where(result.notna(), None).to_dict('records')
+
+    @timed(ANOMALY_SECONDS, 'score')
+    def score(self, df, state):
+        """Return (predictions, scores) for rows with amount, day and category_id columns"""
+        features = np.column_stack([
+            df['amount'].to_numpy(dtype=float),
+            CALENDAR.lookup(df['day'].to_numpy(), ('day_of_week',))['day_of_week'],
+            df['category_id'].to_numpy(dtype=float)
+        ])
+        model = state['model']
+        return model.predict(features), model.score_samples(features)
+
+    def current_model(self, user_id):
+        """The user's cached or persisted model state, never refitting; None if unfitted"""
+        state = self._cached_model(user_id)
+        if state is None:
+            state = self._load_model(user_id)
+            if state is None:
+                return None
+        self._remember(user_id, state)
+        return state
+
+    def _get_model(self, user_id, df):
+        """Return the user's model state, refitting only when it is stale"""
+        state = self._cached_model(user_id)
+        if state is None:
+            state = self._load_model(user_id)
+
+        if state is None or self._needs_refit(state, df):
+            state = self._fit(user_id, df)
+
+        self._remember(user_id, state)
+        return state
+
+    def _cached_model(self, user_id):
+        """The cached state if it is still the stored version, else None.
+
+        Other worker processes refit and save models too; scoring with an
+        older version would log anomalies that the version filter on
+        anomaly reads hides.
+        """
+        state = self._models.get(user_id)
+        if state is not None and self.db.get_anomaly_model_version(user_id) != state['version']:
+            self._models.pop(user_id, None)
+            return None
+        return state
+
+    def _remember(self, user_id, state):
+        self._models[user_id] = state
+        self._models.move_to_end(user_id)
+        while len(self._models) > self.cache_size:
+            self._models.popitem(last=False)
+
+    def _needs_refit(self, state, df):
+        seen = df['id'] <= state['high_water_mark']
+        new_amounts = df.loc[~seen, 'amount']
+        # Deleted training rows count as changed data too
+        changed = len(new_amounts) + max(0, state['trained_rows'] - int(seen.sum()))
+
+        if changed >= max(self.refit_min_rows, self.refit_fraction * state['trained_rows']):
+            return True
+
+        if len(new_amounts) >= 2 and state['amount_std'] > 0:
+            stderr = state['amount_std'] / np.sqrt(len(new_amounts))
+            if abs(new_amounts.mean() - state['amount_mean']) / stderr > self.drift_threshold:
+                return True
+
+        return False
+
+    @timed(ANOMALY_SECONDS, 'fit')
+    def _fit(self, user_id, df):
+        # Recorded with the model: the category ids it was fitted on
+        category_map = {
+            name: int(category_id)
+            for name, category_id in zip(df['category'].astype(object), df['category_id'])
+        }
+        features = np.column_stack([
+            df['amount'].values,
+            df['day_of_week'].values,
+            df['category_id'].to_numpy(dtype=float)
+        ])
+
+        model = IsolationForest(contamination=self.contamination, random_state=42)
+        model.fit(features)
+
+        state = {
+            'model': model,
+            'category_map': category_map,
+            'trained_rows': len(df),
+            'high_water_mark': int(df['id'].max()),
+            'amount_mean': float(df['amount'].mean()),
+            'amount_std': float(df['amount'].std(ddof=0))
+        }
+        state['version'] = self.db.save_anomaly_model(
+            user_id,
+            pickle.dumps(model),
+            json.dumps(category_map),
+            state['trained_rows'],
+            state['high_water_mark'],
+            state['amount_mean'],
+            state['amount_std']
+        )
+        return state
+
+    def _load_model(self, user_id):
+        row = self.db.get_anomaly_model(user_id)
+        if row is None:
+            return None
+        try:
+            model = pickle.loads(row['model'])
+        except Exception:
+            # Unreadable blob (e.g. from another scikit-learn version): refit
+            return None
+        category_map = json.loads(row['category_map'])
+        # Models fitted before category ids coded categories by sorted name
+        if any(self.db.get_category_id(name) != code for name, code in category_map.items()):
+            return None
+        return {
+            'model': model,
+            'version': row['version'],
+            'category_map': category_map,
+            'trained_rows': row['trained_rows'],
+            'high_water_mark': row['high_water_mark'],
+            'amount_mean': row['amount_mean'],
+            'amount_std': row['amount_std']
+        }
+
+    @timed(ANOMALY_SECONDS, 'reasons')
+    def _generate_reasons(self, anomalies, history):
+        """Explain every anomaly using per-category statistics computed once.
+
+        ``anomalies`` must be a subset of ``history`` sharing its index.
+        Returns reason text, a reason code, the z-score against the category
+        mean and the percentile rank of the amount within its category.
+        """
+        amounts = history['amount']
+        by_category = amounts.groupby(history['category_id'])
+
+        cat_mean = by_category.transform('mean')
+        cat_std = by_category.transform('std', ddof=0)
+        cat_median = by_category.transform('median')
+        cat_mad = (amounts - cat_median).abs().groupby(history['category_id']).transform('median')
+        percentile = by_category.rank(pct=True) * 100
+        overall_mean = amounts.mean()
+
+        idx = anomalies.index
+        amount = amounts.loc[idx].to_numpy(dtype=float)
+        mean = cat_mean.loc[idx].to_numpy(dtype=float)
+        std = cat_std.loc[idx].to_numpy(dtype=float)
+        median = cat_median.loc[idx].to_numpy(dtype=float)
+        mad = cat_mad.loc[idx].to_numpy(dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = np.where(std > 0, (amount - mean) / std, np.nan)
+            # 0.6745 scales MAD to a standard deviation for normal data
+            robust_z = np.where(mad > 0, 0.6745 * (amount - median) / mad, np.nan)
+            category_ratio = amount / mean
+            overall_ratio = amount / overall_mean
+
+        codes = np.select(
+            [amount > mean * 2, amount > overall_mean * 3, np.abs(robust_z) > 3.5],
+            ['category_multiple', 'overall_multiple', 'robust_outlier'],
+            default='pattern'
+        )
+
+        reasons = []
+        categories = anomalies['category'].to_numpy()
+        for code, amt, cat, c_ratio, o_ratio, rz in zip(
+                codes, amount, categories, category_ratio, overall_ratio, robust_z):
+            if code == 'category_multiple':
+                reasons.append(f"Amount ${amt:.2f} is {c_ratio:.1f}x category average")
+            elif code == 'overall_multiple':
+                reasons.append(f"Unusually high spending: {o_ratio:.1f}x overall average")
+            elif code == 'robust_outlier':
+                direction = 'above' if rz > 0 else 'below'
+                reasons.append(f"Amount ${amt:.2f} is {abs(rz):.1f} MADs {direction} the {cat} median")
+            else:
+                reasons.append("Unusual pattern detected")
+
+        return pd.DataFrame({
+            'reason': reasons,
+            'reason_code': codes,
+            'z_score': np.round(z_score, 3),
+            'percentile': np.round(percentile.loc[idx].to_numpy(dtype=float), 1)
+        }, index=idx)
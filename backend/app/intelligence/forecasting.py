@@ -1,55 +1,248 @@
-from prophet import Prophet
+import json
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import timedelta
+from app.models.columnar import days_to_datetime
+from app.models.dates import CALENDAR
+from app.utils.cache import LRUCache
+from app.utils.metrics import FORECAST_SECONDS
+
+# z-score for an 80% interval, matching Prophet's default interval_width
+INTERVAL_Z = 1.2816
+
+class ForecastEngine:
+    """Turns a daily expense history into the forecast_expenses result dict.
+
+    ``history`` is a DataFrame with a datetime ``ds`` column and summed
+    amounts in ``y``, one row per day that had spending.
+    """
+    name = None
+
+    def forecast(self, history, days_ahead):
+        raise NotImplementedError
+
+    @staticmethod
+    def _result(dates, yhat, lower, upper):
+        return {
+            'dates': [d.strftime('%Y-%m-%d') for d in dates],
+            'predicted_amount': [float(v) for v in yhat],
+            'lower_bound': [float(v) for v in lower],
+            'upper_bound': [float(v) for v in upper],
+            'total_predicted': float(np.sum(yhat))
+        }
+
+class ProphetEngine(ForecastEngine):
+    name = 'prophet'
+
+    def forecast(self, history, days_ahead):
+        # Imported lazily: Prophet/cmdstanpy take seconds to load
+        from prophet import Prophet
 
-class ExpenseForecaster:
-    def __init__(self, db):
-        self.db = db
-    
-    def forecast_expenses(self, user_id, days_ahead=30, category=None):
-        # Get historical data
-        df = self.db.get_user_transactions(user_id)
-        
-        if category:
-            df = df[df['category'] == category]
-        
-        # Filter expenses only
-        df = df[df['type'] == 'expense']
-        
-        # Prepare for Prophet
-        df_prophet = df.groupby('date').agg({'amount': 'sum'}).reset_index()
-        df_prophet.columns = ['ds', 'y']
-        df_prophet['ds'] = pd.to_datetime(df_prophet['ds'])
-        
-        # Train Prophet
         model = Prophet(
             daily_seasonality=True,
             weekly_seasonality=True,
             yearly_seasonality=False
         )
-        model.fit(df_prophet)
-        
+        model.fit(history)
+
         # Forecast
         future = model.make_future_dataframe(periods=days_ahead)
         forecast = model.predict(future)
-        
+
         # Extract future predictions
-        future_forecast = forecast[forecast['ds'] > df_prophet['ds'].max()]
+        future_forecast = forecast[forecast['ds'] > history['ds'].max()]
+
+        return self._result(
+            future_forecast['ds'],
+            future_forecast['yhat'].values,
+            future_forecast['yhat_lower'].values,
+            future_forecast['yhat_upper'].values
+        )
+
+class SmoothingEngine(ForecastEngine):
+    """Additive Holt-Winters with damped trend and weekly seasonality, NumPy only.
+
+    Days without spending count as zero. Smoothing parameters are picked
+    from a small grid by one-step-ahead squared error, and intervals use the
+    analytic forecast variance of the additive model. Histories shorter than
+    two weeks drop the seasonal term.
+    """
+    name = 'smoothing'
+    season_length = 7
+    damping = 0.98
+    alphas = (0.1, 0.3, 0.5)
+    betas = (0.0, 0.05, 0.15)
+    gammas = (0.05, 0.2, 0.4)
+
+    def forecast(self, history, days_ahead):
+        daily = history.set_index('ds')['y'].asfreq('D', fill_value=0.0)
+        y = daily.to_numpy(dtype=float)
+        m = self.season_length if len(y) >= 2 * self.season_length else 1
+
+        best = None
+        for alpha in self.alphas:
+            for beta in self.betas:
+                for gamma in (self.gammas if m > 1 else (0.0,)):
+                    sse, state = self._fit(y, m, alpha, beta, gamma)
+                    if best is None or sse < best[0]:
+                        best = (sse, state, alpha, beta, gamma)
+
+        sse, (level, trend, season), alpha, beta, gamma = best
+        sigma2 = sse / max(len(y) - 1, 1)
+
+        h = np.arange(1, days_ahead + 1)
+        phi = self.damping
+        damped = np.cumsum(phi ** h)
+        seasonal = season[(len(y) + h - 1) % m]
+        yhat = level + damped * trend + seasonal
+
+        # Var(e_h) = sigma^2 * (1 + sum_{j<h} c_j^2), c_j = alpha(1 + j*beta) + gamma*[j % m == 0]
+        j = np.arange(1, days_ahead)
+        c = alpha * (1 + j * beta) + (gamma * (j % m == 0) if m > 1 else 0)
+        variance = sigma2 * (1 + np.concatenate(([0.0], np.cumsum(c ** 2))))
+        half_width = INTERVAL_Z * np.sqrt(variance)
+
+        # Spending cannot go negative
+        yhat = np.clip(yhat, 0, None)
+        lower = np.clip(yhat - half_width, 0, None)
+        upper = yhat + half_width
+
+        dates = pd.date_range(daily.index[-1] + timedelta(days=1), periods=days_ahead, freq='D')
+        return self._result(dates, yhat, lower, upper)
+
+    def _fit(self, y, m, alpha, beta, gamma):
+        phi = self.damping
+        if m > 1:
+            level = y[:m].mean()
+            trend = (y[m:2 * m].mean() - level) / m
+            season = y[:m] - level
+        else:
+            level, trend, season = y[0], 0.0, np.zeros(1)
+        season = season.copy()
+
+        sse = 0.0
+        for t in range(len(y)):
+            s = season[t % m]
+            error = y[t] - (level + phi * trend + s)
+            sse += error * error
+            prev_level = level
+            level = alpha * (y[t] - s) + (1 - alpha) * (prev_level + phi * trend)
+            trend = beta * (level - prev_level) + (1 - beta) * phi * trend
+            if m > 1:
+                season[t % m] = gamma * (y[t] - level) + (1 - gamma) * s
+        return sse, (level, trend, season)
+
+ENGINES = {engine.name: engine for engine in (ProphetEngine, SmoothingEngine)}
+
+def select_engine(history, engine='auto', prophet_min_points=100):
+    """Pick an engine: Prophet for long histories, smoothing for short ones"""
+    if engine == 'auto':
+        engine = 'prophet' if len(history) >= prophet_min_points else 'smoothing'
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown forecast engine: {engine}")
+    return ENGINES[engine]()
+
+def forecast_series(history, days_ahead, engine='auto', prophet_min_points=100):
+    """Forecast a (ds, y) daily history with the selected engine"""
+    selected = select_engine(history, engine, prophet_min_points)
+    with FORECAST_SECONDS.time('fit_predict', selected.name):
+        return selected.forecast(history, days_ahead)
+
+class ExpenseForecaster:
+    def __init__(self, db, engine='auto', prophet_min_points=100, cache_size=256, cache_ttl=6 * 3600):
+        self.db = db
+        self.engine = engine
+        self.prophet_min_points = prophet_min_points
+        # Keyed by (user_id, category, days_ahead, data_version): any change to
+        # the user's transactions bumps the version and so misses the cache.
+        # Categories are keyed by display name, as the batch job stores them
+        self.cache = LRUCache(max_entries=cache_size, ttl=cache_ttl)
+        self.persisted_hits = 0
+    
+    def forecast_expenses(self, user_id, days_ahead=30, category=None, snapshot=None):
+        """Forecast daily expenses, served from cache while the data is unchanged.
+
+        ``snapshot`` reuses the request's UserDataSnapshot for the data
+        version and, on a cache miss, the history.
+        """
+        if snapshot is not None:
+            data_version = snapshot.data_version
+        else:
+            data_version = self.db.get_data_version(user_id)
+        category = self.db.get_category_name(category) if category else None
+        key = (user_id, category or '', days_ahead, data_version)
         
-        return {
-            'dates': future_forecast['ds'].dt.strftime('%Y-%m-%d').tolist(),
-            'predicted_amount': future_forecast['yhat'].tolist(),
-            'lower_bound': future_forecast['yhat_lower'].tolist(),
-            'upper_bound': future_forecast['yhat_upper'].tolist(),
-            'total_predicted': future_forecast['yhat'].sum()
-        }
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        
+        # Survive restarts: a persisted forecast for the same data version is still valid
+        stored = self.db.get_forecast(user_id, category, days_ahead)
+        if stored is not None and stored['data_version'] == data_version:
+            result = json.loads(stored['result'])
+            self.persisted_hits += 1
+        else:
+            result = self._fit_forecast(user_id, days_ahead, category, snapshot)
+            self.db.save_forecast(user_id, category, days_ahead, data_version, json.dumps(result))
+        
+        self.cache.put(key, result)
+        return result
+    
+    def cached_forecast(self, user_id, days_ahead=30, category=None, data_version=None):
+        """Return (result, fresh) for the last stored forecast without fitting.
+
+        ``fresh`` is False when the stored result predates ``data_version``;
+        ``(None, False)`` means no forecast has been made yet.
+        """
+        if data_version is None:
+            data_version = self.db.get_data_version(user_id)
+        category = self.db.get_category_name(category) if category else None
+        result = self.cache.get((user_id, category or '', days_ahead, data_version))
+        if result is not None:
+            return result, True
+        
+        stored = self.db.get_forecast(user_id, category, days_ahead)
+        if stored is None:
+            return None, False
+        result = json.loads(stored['result'])
+        fresh = stored['data_version'] == data_version
+        if fresh:
+            self.persisted_hits += 1
+            self.cache.put((user_id, category or '', days_ahead, data_version), result)
+        return result, fresh
+    
+    def cache_stats(self):
+        stats = self.cache.stats()
+        stats['persisted_hits'] = self.persisted_hits
+        return stats
+    
+    def _fit_forecast(self, user_id, days_ahead, category, snapshot=None):
+        with FORECAST_SECONDS.time('prepare', self.engine):
+            # Get historical data, expenses only
+            if snapshot is not None:
+                df = snapshot.expenses
+            else:
+                df = self.db.get_user_history(user_id, ('day', 'amount', 'category_id'), txn_type='expense')
+            
+            if category:
+                df = df[df['category_id'] == self.db.get_category_id(category)]
+            
+            # Daily totals in Prophet's (ds, y) shape, shared by all engines;
+            # grouped on the integer day, converted to datetimes once per day
+            daily = df.groupby('day')['amount'].sum()
+            df_prophet = pd.DataFrame({'ds': days_to_datetime(daily.index.to_numpy()),
+                                       'y': daily.to_numpy()})
+        
+        return forecast_series(df_prophet, days_ahead, self.engine, self.prophet_min_points)
     
     def get_spending_trends(self, user_id):
-        df = self.db.get_user_transactions(user_id)
-        df = df[df['type'] == 'expense']
-        df['date'] = pd.to_datetime(df['date'])
+        df = self.db.get_user_history(user_id, ('day', 'amount', 'category'), txn_type='expense')
         
-        # Category-wise trends
-        category_trends = df.groupby(['category', pd.Grouper(key='date', freq='W')])['amount'].sum().reset_index()
+        # Category-wise trends per week, labelled with the week's Sunday
+        # like pd.Grouper(freq='W'); weeks come from the calendar dimension
+        df['week_end'] = CALENDAR.lookup(df['day'].to_numpy(), ('week_start',))['week_start'] + 6
+        category_trends = df.groupby(['category', 'week_end'], observed=True)['amount'].sum().reset_index()
+        category_trends['week_end'] = days_to_datetime(category_trends['week_end'].to_numpy())
+        category_trends = category_trends.rename(columns={'week_end': 'date'})
         
         return category_trends.to_dict('records')
@@ -0,0 +1,79 @@
+import threading
+
+def normalize_category(name):
+    """Category text as stored: surrounding and repeated whitespace collapsed"""
+    return ' '.join(str(name).split())
+
+class CategoryDictionary:
+    """Process-wide view of the categories table: stable integer ids for category names.
+
+    A category's key is its lowercased name (SQLite ``lower()``, so the
+    trigger for rows inserted without an id agrees), and its display name
+    is the spelling first seen. Ids never change and rows are never
+    deleted, so lookups are cached for the life of the process. Only rows
+    read outside a transaction are cached: one added by a transaction that
+    later rolls back must not be handed out again.
+    """
+
+    def __init__(self):
+        self._by_name = {}
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, conn, names):
+        """{name: (id, display name)} for normalized names, adding unknown ones"""
+        with self._lock:
+            found = {name: self._by_name[name] for name in names if name in self._by_name}
+        for name in set(names) - set(found):
+            row = self._find(conn, name)
+            if row is None:
+                conn.execute('''
+                    INSERT INTO categories (key, name) VALUES (lower(?), ?)
+                    ON CONFLICT (key) DO NOTHING
+                ''', (name, name))
+                row = self._find(conn, name)
+            found[name] = row
+        return found
+
+    def lookup(self, conn, name):
+        """Id of an existing category matching ``name`` in any case, else None"""
+        name = normalize_category(name)
+        with self._lock:
+            if name in self._by_name:
+                return self._by_name[name][0]
+        row = self._find(conn, name)
+        return row[0] if row else None
+
+    def _find(self, conn, name):
+        committed = not conn.in_transaction
+        row = conn.execute('SELECT id, name FROM categories WHERE key = lower(?)', (name,)).fetchone()
+        if row is None:
+            return None
+        if committed:
+            with self._lock:
+                self._by_name[name] = (row[0], row[1])
+                self._names[row[0]] = row[1]
+        return row[0], row[1]
+
+    def names(self, conn, ids):
+        """{id: display name} for category ids"""
+        with self._lock:
+            known = {i: self._names[i] for i in ids if i in self._names}
+        missing = [int(i) for i in set(ids) if i not in known]
+        if missing:
+            committed = not conn.in_transaction
+            placeholders = ', '.join('?' * len(missing))
+            rows = conn.execute(
+                f'SELECT id, name FROM categories WHERE id IN ({placeholders})', missing
+            ).fetchall()
+            for category_id, name in rows:
+                known[category_id] = name
+            if committed:
+                with self._lock:
+                    self._names.update(known)
+        return known
+
+    def clear(self):
+        with self._lock:
+            self._by_name.clear()
+            self._names.clear()
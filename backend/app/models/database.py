@@ -1,32 +1,280 @@
 import sqlite3
 import os
-import pandas as pd
-from datetime import datetime
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from app.models.categories import CategoryDictionary, normalize_category
+from app.models.columnar import ColumnReader, day_number, days_to_datetime
+from app.models.history_cache import (DERIVED_COLUMNS, HISTORY_COLUMNS, HISTORY_READ_COLUMNS,
+                                      HistoryCache, UserHistory)
+from app.models.dates import iso_date, to_day
+from app.models.migrations import (CATEGORIES_TABLE, CATEGORY_TRIGGERS, CONSUMER_OFFSETS_TABLE, DAY_TRIGGERS,
+                                   TRANSACTION_INDEXES, init_consumer_offsets, optimize, run_migrations, stamp)
+from app.utils.metrics import DB_METHOD_SECONDS, instrument_methods
 
+# pandas is imported inside the methods that return DataFrames: it adds about
+# half a second to startup and auth/transaction requests never need it
+
+# Applied once to every new connection. WAL lets readers run alongside the
+# single writer, and synchronous=NORMAL is durable enough in WAL mode.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,           # ms
+    'cache_size': -16000,           # negative = KiB, i.e. 16 MB per connection
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+TRANSACTION_TYPES = ('income', 'expense')
+TRANSACTION_FIELDS = ('user_id', 'date', 'amount', 'category', 'type', 'description', 'source')
+TRANSACTION_COLUMNS = ('id',) + TRANSACTION_FIELDS + ('created_at', 'category_id', 'day')
+
+def validate_transaction(row, user_id=None):
+    """Validate a transaction dict and return its insert tuple.
+
+    ``user_id`` is used when the row does not carry its own. Raises
+    ValueError with a message suitable for per-row error reporting.
+    """
+    if not isinstance(row, dict):
+        raise ValueError('row must be a JSON object')
+    
+    uid = row.get('user_id') or user_id
+    missing = [f for f in ('date', 'amount', 'category', 'type') if row.get(f) in (None, '')]
+    if uid in (None, ''):
+        missing.insert(0, 'user_id')
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    
+    try:
+        uid = int(uid)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid user_id: {uid!r}")
+    
+    # SQLite's date functions, and so transactions.day, need the padded form
+    date = iso_date(row['date'])
+    
+    try:
+        amount = float(row['amount'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {row['amount']!r}")
+    if amount != amount or amount in (float('inf'), float('-inf')):
+        raise ValueError(f"Invalid amount: {row['amount']!r}")
+    
+    txn_type = str(row['type']).strip().lower()
+    if txn_type not in TRANSACTION_TYPES:
+        raise ValueError(f"Invalid type {row['type']!r}, expected income or expense")
+    
+    category = normalize_category(row['category'])
+    if not category:
+        raise ValueError("Missing required fields: category")
+    
+    return (
+        uid,
+        date,
+        amount,
+        category,
+        txn_type,
+        row.get('description') or '',
+        row.get('source') or ''
+    )
+
+class ConnectionPool:
+    """Bounded pool of pre-configured SQLite connections.
+
+    Connections are handed out through the ``connection()`` context manager.
+    A thread that already holds a connection gets the same one back, so
+    nested ``Database`` calls share a single transaction.
+
+    SQLite connections must not be used across ``fork()``: a pool that finds
+    itself in a new process drops the inherited connections unused and
+    starts empty, so a preloaded app is safe in forked workers.
+
+    ``factory`` is the ``sqlite3.Connection`` class to open, e.g. the
+    profiled connection of a ``QueryProfiler``.
+    """
+
+    def __init__(self, db_path, max_size=8, timeout=30.0, pragmas=None, factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.factory = factory
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas.get('busy_timeout', 5000) / 1000,
+            check_same_thread=False,
+            factory=self.factory
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        return conn
+
+    def reset_after_fork(self):
+        """Forget connections inherited from the parent process without closing them"""
+        # Closing would touch the parent's file locks and WAL index
+        self._reset()
+
+    def acquire(self):
+        """Check out a connection, opening a new one while under max_size"""
+        if self._pid != os.getpid():
+            self.reset_after_fork()
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open < self.max_size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No database connection available after {self.timeout}s"
+                    )
+                with self._lock:
+                    self._waits += 1
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        if self._pid != os.getpid():
+            # Checked out before a fork; belongs to the parent's pool
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Yield a connection; commit on success, roll back on error"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': self._pid,
+                'max_size': self.max_size,
+                'open_connections': self._open,
+                'in_use': self._in_use,
+                'idle': self._open - self._in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'total_wait_ms': round(self._wait_time * 1000, 3),
+                'avg_wait_ms': round(self._wait_time * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._max_wait_time * 1000, 3),
+            }
+
+# Every public method is timed under db_method_duration_seconds{method=...}
+@instrument_methods(DB_METHOD_SECONDS, exclude=('connection', 'get_connection', 'pool_stats', 'subscribe',
+                                                'history_cache_stats'))
 class Database:
-    def __init__(self, db_path='finance.db'):
+    def __init__(self, db_path='finance.db', pool_size=8, pool_timeout=30.0, pragmas=None, profiler=None,
+                 history_cache_bytes=64 * 1024 * 1024, columnar_engine='auto'):
         self.db_path = db_path
+        # An optional QueryProfiler times every statement on pooled connections
+        self.profiler = profiler
+        self.pool = ConnectionPool(
+            db_path, max_size=pool_size, timeout=pool_timeout, pragmas=pragmas,
+            factory=profiler.connection_factory() if profiler else sqlite3.Connection
+        )
+        # Columnar user histories shared by every request in this process
+        self.history_cache = HistoryCache(history_cache_bytes)
+        # Bulk reads into NumPy columns (see ColumnReader for the engines)
+        self.column_reader = ColumnReader(db_path, engine=columnar_engine)
+        # Category name <-> id lookups, cached for the process
+        self.categories = CategoryDictionary()
+        self._subscribers = []
         self.init_db()
     
     def init_db(self):
         """Check if database exists, create if not"""
         db_exists = os.path.exists(self.db_path)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if not db_exists:
-            print(f"Database not found. Creating new database at {self.db_path}")
-            self._create_tables(cursor)
-            conn.commit()
-            print("Database created successfully")
-        else:
-            print(f"Database found at {self.db_path}")
-            # Verify tables exist, create if missing
-            self._verify_tables(cursor)
-            conn.commit()
-        
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            if not db_exists:
+                print(f"Database not found. Creating new database at {self.db_path}")
+                self._create_tables(cursor)
+                # Already current, so every migration counts as applied
+                stamp(conn)
+                print("Database created successfully")
+            else:
+                print(f"Database found at {self.db_path}")
+                # Upgrade existing tables before (re)creating indexes on them
+                run_migrations(conn)
+                # Verify tables exist, create if missing
+                self._verify_tables(cursor)
+                conn.commit()
+            
+            optimize(conn)
     
     def _create_tables(self, cursor):
         """Create all required tables"""
@@ -42,6 +290,9 @@ class Database:
             )
         ''')
         
+        # Category dictionary: stable integer ids for category names
+        cursor.execute(CATEGORIES_TABLE)
+        
         # Transactions table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS transactions (
@@ -54,10 +305,15 @@ class Database:
                 type TEXT CHECK(type IN ('income', 'expense')) NOT NULL,
                 source TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                category_id INTEGER REFERENCES categories(id),
+                day INTEGER,
                 FOREIGN KEY (user_id) REFERENCES users(id)
             )
         ''')
         
+        for statement in CATEGORY_TRIGGERS + DAY_TRIGGERS:
+            cursor.execute(statement)
+        
         # Financial goals table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS financial_goals (
@@ -80,16 +336,12 @@ class Database:
                 detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 anomaly_score REAL NOT NULL,
                 reason TEXT,
+                model_version INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (transaction_id) REFERENCES transactions(id)
             )
         ''')
         
         # Create indexes
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_transactions_user_date 
-            ON transactions(user_id, date)
-        ''')
-        
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_transactions_category 
             ON transactions(category)
@@ -100,160 +352,949 @@ class Database:
             ON anomalies(transaction_id)
         ''')
         
-        print("Tables created: users, transactions, financial_goals, anomalies")
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_anomalies_transaction_version
+            ON anomalies(transaction_id, model_version)
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_anomalies_detected_at
+            ON anomalies(detected_at)
+        ''')
+        
+        # Per-user day, covering and partial daily-expense indexes
+        for statement in TRANSACTION_INDEXES:
+            cursor.execute(statement)
+        
+        # Fitted anomaly models, one row per user
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS anomaly_models (
+                user_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL,
+                model BLOB NOT NULL,
+                category_map TEXT NOT NULL,
+                trained_rows INTEGER NOT NULL,
+                high_water_mark INTEGER NOT NULL,
+                amount_mean REAL NOT NULL,
+                amount_std REAL NOT NULL,
+                fitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # Persisted forecast results, one per (user, category, horizon)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forecasts (
+                user_id INTEGER NOT NULL,
+                category TEXT NOT NULL DEFAULT '',
+                days_ahead INTEGER NOT NULL,
+                data_version INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, category, days_ahead)
+            )
+        ''')
+        
+        # Cached LLM intent-parsing responses
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used
+            ON llm_cache(last_used)
+        ''')
+        
+        # Background jobs (forecasts, anomaly detection) and their results
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                user_id INTEGER,
+                params TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                status TEXT CHECK(status IN ('queued', 'running', 'done', 'failed')) NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        
+        # At most one queued or running job per dedupe key
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_dedupe
+            ON jobs(dedupe_key) WHERE status IN ('queued', 'running')
+        ''')
+        
+        # Last transaction id each insert-event consumer has processed
+        cursor.execute(CONSUMER_OFFSETS_TABLE)
+        init_consumer_offsets(cursor)
+        
+        self._create_aggregates(cursor)
+        self._create_data_versions(cursor)
+        
+        print("Tables created: users, categories, transactions, financial_goals, anomalies, anomaly_models, "
+              "forecasts, llm_cache, jobs, consumer_offsets, user_aggregates, user_data_versions")
+    
+    def _create_data_versions(self, cursor):
+        """Per-user counter bumped on every transaction change, used to invalidate caches"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_data_versions (
+                user_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        for event, ref in (('INSERT', 'NEW'), ('DELETE', 'OLD'), ('UPDATE', 'NEW')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_transactions_version_{event.lower()}
+                AFTER {event} ON transactions
+                BEGIN
+                    INSERT INTO user_data_versions (user_id, version) VALUES ({ref}.user_id, 1)
+                    ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+                END
+            ''')
+        
+        # A transaction moved to another user changes both users' data
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_transactions_version_move
+            AFTER UPDATE OF user_id ON transactions
+            WHEN OLD.user_id != NEW.user_id
+            BEGIN
+                INSERT INTO user_data_versions (user_id, version) VALUES (OLD.user_id, 1)
+                ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            END
+        ''')
+    
+    def _create_aggregates(self, cursor):
+        """Create the per-user/type/category/month rollup and the triggers that maintain it"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_aggregates (
+                user_id INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                category TEXT NOT NULL,
+                month TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                txn_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, type, category, month)
+            ) WITHOUT ROWID
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_transactions_aggregate_insert
+            AFTER INSERT ON transactions
+            BEGIN
+                INSERT INTO user_aggregates (user_id, type, category, month, total, txn_count)
+                VALUES (NEW.user_id, NEW.type, NEW.category, substr(NEW.date, 1, 7), NEW.amount, 1)
+                ON CONFLICT (user_id, type, category, month) DO UPDATE SET
+                    total = total + excluded.total,
+                    txn_count = txn_count + 1;
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_transactions_aggregate_delete
+            AFTER DELETE ON transactions
+            BEGIN
+                UPDATE user_aggregates
+                SET total = total - OLD.amount, txn_count = txn_count - 1
+                WHERE user_id = OLD.user_id AND type = OLD.type
+                  AND category = OLD.category AND month = substr(OLD.date, 1, 7);
+                DELETE FROM user_aggregates
+                WHERE user_id = OLD.user_id AND type = OLD.type
+                  AND category = OLD.category AND month = substr(OLD.date, 1, 7)
+                  AND txn_count <= 0;
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_transactions_aggregate_update
+            AFTER UPDATE OF user_id, type, category, date, amount ON transactions
+            BEGIN
+                UPDATE user_aggregates
+                SET total = total - OLD.amount, txn_count = txn_count - 1
+                WHERE user_id = OLD.user_id AND type = OLD.type
+                  AND category = OLD.category AND month = substr(OLD.date, 1, 7);
+                DELETE FROM user_aggregates
+                WHERE user_id = OLD.user_id AND type = OLD.type
+                  AND category = OLD.category AND month = substr(OLD.date, 1, 7)
+                  AND txn_count <= 0;
+                INSERT INTO user_aggregates (user_id, type, category, month, total, txn_count)
+                VALUES (NEW.user_id, NEW.type, NEW.category, substr(NEW.date, 1, 7), NEW.amount, 1)
+                ON CONFLICT (user_id, type, category, month) DO UPDATE SET
+                    total = total + excluded.total,
+                    txn_count = txn_count + 1;
+            END
+        ''')
     
     def _verify_tables(self, cursor):
         """Verify all tables exist, create missing ones"""
         cursor.execute("""
             SELECT name FROM sqlite_master 
             WHERE type='table' 
-            AND name IN ('users', 'transactions', 'financial_goals', 'anomalies')
+            AND name IN ('users', 'categories', 'transactions', 'financial_goals', 'anomalies', 'anomaly_models',
+                         'forecasts', 'llm_cache', 'jobs', 'consumer_offsets', 'user_aggregates',
+                         'user_data_versions')
         """)
         
         existing_tables = {row[0] for row in cursor.fetchall()}
-        required_tables = {'users', 'transactions', 'financial_goals', 'anomalies'}
+        required_tables = {'users', 'categories', 'transactions', 'financial_goals', 'anomalies', 'anomaly_models',
+                           'forecasts', 'llm_cache', 'jobs', 'consumer_offsets', 'user_aggregates',
+                           'user_data_versions'}
         
         missing_tables = required_tables - existing_tables
         
         if missing_tables:
             print(f"Missing tables: {missing_tables}. Creating...")
             self._create_tables(cursor)
+            if 'user_aggregates' in missing_tables:
+                # Backfill the rollup from existing history
+                self._rebuild_aggregates(cursor)
         else:
             print("All tables verified")
     
+    def connection(self):
+        """Context manager yielding a pooled connection (commits on exit)"""
+        return self.pool.connection()
+    
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Get a standalone connection outside the pool (caller must close)"""
+        return self.pool._connect()
+    
+    def pool_stats(self):
+        """Connection pool statistics"""
+        return self.pool.stats()
+    
+    def history_cache_stats(self):
+        """History cache size, memory per row and hit rate"""
+        return self.history_cache.stats()
+    
+    def subscribe(self, callback):
+        """Call ``callback(user_ids)`` after transactions are inserted.
+
+        Callbacks run on the inserting thread and should only hand off work.
+        Inside an outer ``connection()`` block the event can fire before the
+        rows are committed, so consumers read from their own offset rather
+        than trusting the event to carry the rows.
+        """
+        self._subscribers.append(callback)
+    
+    def _publish_insert(self, user_ids):
+        for callback in list(self._subscribers):
+            try:
+                callback(user_ids)
+            except Exception as e:
+                print(f"Insert event subscriber failed: {e}")
     
     def add_user(self, username, email):
         """Add new user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute('''
-                INSERT INTO users (username, email)
-                VALUES (?, ?)
-            ''', (username, email))
-            conn.commit()
-            user_id = cursor.lastrowid
-            print(f"User created: {username} (ID: {user_id})")
-            return user_id
-        except sqlite3.IntegrityError:
-            print(f"User {username} already exists")
-            cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
-            return cursor.fetchone()[0]
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                    INSERT INTO users (username, email)
+                    VALUES (?, ?)
+                ''', (username, email))
+                user_id = cursor.lastrowid
+                print(f"User created: {username} (ID: {user_id})")
+                return user_id
+            except sqlite3.IntegrityError:
+                print(f"User {username} already exists")
+                cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
+                return cursor.fetchone()[0]
     
     def add_transaction(self, user_id, date, amount, category, txn_type, description='', source=''):
-        """Add transaction"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO transactions (user_id, date, amount, category, type, description, source)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, date, amount, category, txn_type, description, source))
-        conn.commit()
-        txn_id = cursor.lastrowid
-        conn.close()
-        return txn_id
+        """Add transaction; the category is stored under its existing spelling, if any"""
+        date = iso_date(date)
+        with self.connection() as conn:
+            name = normalize_category(category)
+            category_id, category = self.categories.resolve(conn, [name])[name]
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                INSERT INTO transactions (user_id, date, amount, category, type, description, source, category_id,
+                                          day)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, {day_number('?')})
+            ''', (user_id, date, amount, category, txn_type, description, source, category_id, date))
+            transaction_id = cursor.lastrowid
+            version = self._data_version(conn, user_id)
+        
+        self.history_cache.apply_insert(
+            user_id, (transaction_id, date, amount, category, txn_type, category_id), version
+        )
+        self._publish_insert({user_id})
+        return transaction_id
+    
+    def add_transactions(self, rows, user_id=None, batch_size=1000):
+        """Bulk insert transactions in a single database transaction.
+
+        Rows are dicts shaped like the POST /api/transactions body. Invalid
+        rows are skipped and reported by index; valid rows are written with
+        executemany in batches of ``batch_size``.
+        """
+        inserted = 0
+        errors = []
+        batch = []
+        user_ids = set()
+        
+        with self.connection() as conn:
+            for index, row in enumerate(rows):
+                try:
+                    batch.append(validate_transaction(row, user_id))
+                except ValueError as e:
+                    errors.append({'index': index, 'error': str(e)})
+                    continue
+                
+                if len(batch) >= batch_size:
+                    inserted += self._insert_batch(conn, batch)
+                    user_ids.update(values[0] for values in batch)
+                    batch = []
+            
+            if batch:
+                inserted += self._insert_batch(conn, batch)
+                user_ids.update(values[0] for values in batch)
+        
+        for uid in user_ids:
+            self.history_cache.invalidate(uid)
+        if user_ids:
+            self._publish_insert(user_ids)
+        return {'inserted': inserted, 'errors': errors}
+    
+    def _insert_batch(self, conn, batch):
+        categories = self.categories.resolve(conn, {values[3] for values in batch})
+        conn.executemany(f'''
+            INSERT INTO transactions (user_id, date, amount, category, type, description, source, category_id, day)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, {day_number('?')})
+        ''', [values[:3] + (categories[values[3]][1],) + values[4:] + (categories[values[3]][0], values[1])
+              for values in batch])
+        return len(batch)
+    
+    def delete_transaction(self, transaction_id):
+        """Delete transaction, returns False if it does not exist"""
+        with self.connection() as conn:
+            row = conn.execute(
+                'DELETE FROM transactions WHERE id = ? RETURNING user_id', (transaction_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            user_id = row[0]
+            version = self._data_version(conn, user_id)
+        
+        self.history_cache.apply_delete(user_id, transaction_id, version)
+        return True
     
     def get_user_transactions(self, user_id, start_date=None, end_date=None, category=None):
-        """Get user transactions with optional filters"""
-        conn = self.get_connection()
+        """Get user transactions with optional filters; dates are compared as day numbers"""
+        import pandas as pd
         query = 'SELECT * FROM transactions WHERE user_id = ?'
         params = [user_id]
         
         if start_date:
-            query += ' AND date >= ?'
-            params.append(start_date)
+            query += ' AND day >= ?'
+            params.append(to_day(start_date))
         if end_date:
-            query += ' AND date <= ?'
-            params.append(end_date)
+            query += ' AND day <= ?'
+            params.append(to_day(end_date))
         if category:
-            query += ' AND category = ?'
-            params.append(category)
+            query += ' AND category_id = ?'
+            params.append(self.get_category_id(category))
+        
+        query += ' ORDER BY day DESC'
+        
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+    
+    def iter_user_transactions(self, user_id, fields=None, after=None, limit=None):
+        """Yield user transactions as dicts, newest first, straight off the cursor.
+
+        Pages are keyed on (date, id): ``after`` is the (date, id) of the last
+        row already seen, so each page is a range scan of
+        idx_transactions_user_day rather than an OFFSET. ``fields`` restricts
+        the selected columns; id and date are always included.
+        """
+        fields = list(fields) if fields else list(TRANSACTION_COLUMNS)
+        unknown = set(fields) - set(TRANSACTION_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        for key in ('date', 'id'):
+            if key not in fields:
+                fields.insert(0, key)
+        
+        if set(fields) <= set(HISTORY_COLUMNS):
+            history = self.get_cached_history(user_id)
+            if history is not None:
+                yield from history.iter_rows(fields, after, limit)
+                return
+        
+        # As the cached path: rows without a day number have no place in the order
+        query = f"SELECT {', '.join(fields)} FROM transactions WHERE user_id = ? AND day IS NOT NULL"
+        params = [user_id]
+        if after is not None:
+            query += ' AND (day, id) < (?, ?)'
+            params.extend((to_day(after[0]), after[1]))
+        query += ' ORDER BY day DESC, id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        
+        # Checked out directly rather than via connection(): a suspended
+        # generator must not leave a thread-local connection behind
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.execute(query, params)
+            cursor.row_factory = None
+            for row in cursor:
+                yield dict(zip(fields, row))
+        finally:
+            self.pool.release(conn)
+    
+    def get_user_history(self, user_id, columns=HISTORY_COLUMNS, start_date=None, end_date=None,
+                         category=None, txn_type=None):
+        """Compact history frame, newest first, with categorical category/type columns.
+
+        ``ds`` may be requested alongside the stored columns: the date as
+        datetime64, converted from day numbers rather than parsed. Served
+        from the history cache when every column is one it holds; other
+        columns are read from SQLite.
+        """
+        import pandas as pd
+        unknown = set(columns) - set(TRANSACTION_COLUMNS) - set(DERIVED_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        
+        # Matched on the category id, in any case; an unknown name matches nothing
+        category_id = (self.get_category_id(category) or -1) if category else None
+        
+        if set(columns) <= set(HISTORY_COLUMNS + DERIVED_COLUMNS):
+            history = self.get_cached_history(user_id)
+            if history is not None:
+                return history.to_frame(columns, history.mask(start_date, end_date, category_id, txn_type))
+        
+        stored = [c if c != 'ds' else 'day' for c in columns]
+        query = f"SELECT {', '.join(stored)} FROM transactions WHERE user_id = ? AND day IS NOT NULL"
+        params = [user_id]
+        for clause, value in (('day >= ?', to_day(start_date) if start_date else None),
+                              ('day <= ?', to_day(end_date) if end_date else None),
+                              ('category_id = ?', category_id), ('type = ?', txn_type or None)):
+            if value is not None:
+                query += f' AND {clause}'
+                params.append(value)
+        query += ' ORDER BY day DESC, id DESC'
         
-        query += ' ORDER BY date DESC'
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            cursor.row_factory = None
+            rows = cursor.fetchall()
         
-        df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
+        df = pd.DataFrame.from_records(rows, columns=stored)
+        for column in ('category', 'type'):
+            if column in df:
+                df[column] = df[column].astype('category')
+        if 'ds' in columns:
+            df.columns = list(columns)
+            df['ds'] = pd.to_datetime(df['ds'], unit='D')
         return df
     
+    def get_cached_history(self, user_id):
+        """User's columnar history from the cache, loading it on a miss.
+
+        Rows without a day number (a date that is not YYYY-MM-DD, written
+        outside the app) are left out, as in the SQLite reads. Returns None
+        when the rows cannot be held columnar; callers then read SQLite
+        directly.
+        """
+        with self.connection() as conn:
+            # Version first: rows read after it can only be newer, which the
+            # next lookup detects; the reverse order could cache stale rows
+            version = self._data_version(conn, user_id)
+            history = self.history_cache.get(user_id, version)
+            if history is not None:
+                return history
+            
+            try:
+                columns = self.column_reader.read(
+                    conn, HISTORY_READ_COLUMNS, 'transactions WHERE user_id = ? AND day IS NOT NULL', (user_id,)
+                )
+            except ValueError:
+                return None
+            names = self.categories.names(conn, set(columns['category_id'].tolist()))
+        
+        history = UserHistory.from_columns(user_id, version, columns, names)
+        self.history_cache.put(history)
+        return history
+    
+    def get_category_id(self, name):
+        """Id of the category matching ``name`` in any case and spacing, or None"""
+        with self.connection() as conn:
+            return self.categories.lookup(conn, name)
+    
+    def get_category_name(self, name):
+        """Display name of the category matching ``name``; unknown names come back normalized"""
+        with self.connection() as conn:
+            category_id = self.categories.lookup(conn, name)
+            if category_id is None:
+                return normalize_category(name)
+            return self.categories.names(conn, [category_id])[category_id]
+    
+    def get_user_aggregates(self, user_id):
+        """All rollup rows for user as (type, category, month, total, txn_count)"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT type, category, month, total, txn_count
+                FROM user_aggregates
+                WHERE user_id = ?
+            ''', (user_id,))
+            cursor.row_factory = None
+            return cursor.fetchall()
+    
     def get_all_categories(self, user_id):
         """Get all unique categories for user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT DISTINCT category FROM transactions 
-            WHERE user_id = ?
-        ''', (user_id,))
-        categories = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return categories
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT DISTINCT category FROM user_aggregates 
+                WHERE user_id = ?
+            ''', (user_id,))
+            return [row[0] for row in cursor.fetchall()]
     
     def get_user_balance(self, user_id):
-        """Calculate current balance"""
-        df = self.get_user_transactions(user_id)
-        if df.empty:
-            return 0
+        """Calculate current balance from the aggregate rollup"""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN total ELSE -total END), 0)
+                FROM user_aggregates
+                WHERE user_id = ?
+            ''', (user_id,)).fetchone()
+            return row[0]
+    
+    def get_category_totals(self, user_id, txn_type='expense', month=None):
+        """Total amount per category, optionally for a single 'YYYY-MM' month"""
+        query = '''
+            SELECT category, SUM(total) FROM user_aggregates
+            WHERE user_id = ? AND type = ?
+        '''
+        params = [user_id, txn_type]
+        if month:
+            query += ' AND month = ?'
+            params.append(month)
+        query += ' GROUP BY category'
         
-        income = df[df['type'] == 'income']['amount'].sum()
-        expenses = df[df['type'] == 'expense']['amount'].sum()
-        return income - expenses
+        with self.connection() as conn:
+            return {row[0]: row[1] for row in conn.execute(query, params)}
     
-    def log_anomaly(self, transaction_id, score, reason):
-        """Log detected anomaly"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_monthly_totals(self, user_id, txn_type='expense'):
+        """Total amount per 'YYYY-MM' month"""
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT month, SUM(total) FROM user_aggregates
+                WHERE user_id = ? AND type = ?
+                GROUP BY month
+                ORDER BY month
+            ''', (user_id, txn_type))
+            return {row[0]: row[1] for row in rows}
+    
+    def _rebuild_aggregates(self, cursor):
+        cursor.execute('DELETE FROM user_aggregates')
         cursor.execute('''
-            INSERT INTO anomalies (transaction_id, anomaly_score, reason)
-            VALUES (?, ?, ?)
-        ''', (transaction_id, score, reason))
-        conn.commit()
-        conn.close()
+            INSERT INTO user_aggregates (user_id, type, category, month, total, txn_count)
+            SELECT user_id, type, category, substr(date, 1, 7), SUM(amount), COUNT(*)
+            FROM transactions
+            GROUP BY user_id, type, category, substr(date, 1, 7)
+        ''')
+    
+    def rebuild_aggregates(self):
+        """Recompute user_aggregates from the transactions table"""
+        with self.connection() as conn:
+            self._rebuild_aggregates(conn.cursor())
+            return conn.execute('SELECT COUNT(*) FROM user_aggregates').fetchone()[0]
+    
+    def verify_aggregates(self, tolerance=1e-6):
+        """Compare user_aggregates with a fresh scan, returns mismatching keys"""
+        with self.connection() as conn:
+            rows = conn.execute('''
+                WITH expected AS (
+                    SELECT user_id, type, category, substr(date, 1, 7) AS month,
+                           SUM(amount) AS total, COUNT(*) AS txn_count
+                    FROM transactions
+                    GROUP BY user_id, type, category, substr(date, 1, 7)
+                ),
+                keys AS (
+                    SELECT user_id, type, category, month FROM expected
+                    UNION
+                    SELECT user_id, type, category, month FROM user_aggregates
+                )
+                SELECT k.user_id, k.type, k.category, k.month,
+                       e.total, e.txn_count, a.total, a.txn_count
+                FROM keys k
+                LEFT JOIN expected e USING (user_id, type, category, month)
+                LEFT JOIN user_aggregates a USING (user_id, type, category, month)
+                WHERE e.txn_count IS NOT a.txn_count
+                   OR ABS(COALESCE(e.total, 0) - COALESCE(a.total, 0)) > ?
+            ''', (tolerance,)).fetchall()
+        
+        return [{
+            'user_id': row[0],
+            'type': row[1],
+            'category': row[2],
+            'month': row[3],
+            'expected_total': row[4],
+            'expected_count': row[5],
+            'stored_total': row[6],
+            'stored_count': row[7]
+        } for row in rows]
+    
+    def log_anomaly(self, transaction_id, score, reason, model_version=0):
+        """Log detected anomaly"""
+        self.log_anomalies([(transaction_id, score, reason, model_version)])
+    
+    def log_anomalies(self, rows):
+        """Upsert (transaction_id, score, reason, model_version) rows in one batch.
+
+        A transaction flagged again by the same model version updates its
+        score and reason but keeps the original detected_at.
+        """
+        with self.connection() as conn:
+            conn.executemany('''
+                INSERT INTO anomalies (transaction_id, anomaly_score, reason, model_version)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (transaction_id, model_version) DO UPDATE SET
+                    anomaly_score = excluded.anomaly_score,
+                    reason = excluded.reason
+            ''', rows)
     
     def get_anomalies(self, user_id, limit=10):
-        """Get recent anomalies for user"""
-        conn = self.get_connection()
+        """Get recent anomalies for user from their current model version"""
+        import pandas as pd
         query = '''
             SELECT a.*, t.date, t.amount, t.category 
             FROM anomalies a
             JOIN transactions t ON a.transaction_id = t.id
+            LEFT JOIN anomaly_models m ON m.user_id = t.user_id
             WHERE t.user_id = ?
+              AND (m.version IS NULL OR a.model_version = m.version)
             ORDER BY a.detected_at DESC
             LIMIT ?
         '''
-        df = pd.read_sql_query(query, conn, params=(user_id, limit))
-        conn.close()
-        return df
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=(user_id, limit))
+    
+    def count_anomalies(self, user_id):
+        """Number of stored anomalies for user from their current model version"""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT COUNT(*)
+                FROM anomalies a
+                JOIN transactions t ON a.transaction_id = t.id
+                LEFT JOIN anomaly_models m ON m.user_id = t.user_id
+                WHERE t.user_id = ?
+                  AND (m.version IS NULL OR a.model_version = m.version)
+            ''', (user_id,)).fetchone()
+            return row[0]
+    
+    def save_anomaly_model(self, user_id, model, category_map, trained_rows, high_water_mark,
+                           amount_mean, amount_std):
+        """Store a serialized anomaly model for user, returns its new version"""
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT version FROM anomaly_models WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            version = (row[0] if row else 0) + 1
+            conn.execute('''
+                INSERT OR REPLACE INTO anomaly_models
+                    (user_id, version, model, category_map, trained_rows, high_water_mark,
+                     amount_mean, amount_std, fitted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (user_id, version, model, category_map, trained_rows, high_water_mark,
+                  amount_mean, amount_std))
+            return version
+    
+    def get_anomaly_model(self, user_id):
+        """Get the stored anomaly model row for user, or None"""
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT * FROM anomaly_models WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            return dict(row) if row else None
+    
+    def get_anomaly_model_version(self, user_id):
+        """Version of the stored anomaly model for user, or None"""
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT version FROM anomaly_models WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            return row[0] if row else None
+    
+    def get_data_version(self, user_id):
+        """Current data version for user; changes whenever their transactions do"""
+        with self.connection() as conn:
+            return self._data_version(conn, user_id)
+    
+    def _data_version(self, conn, user_id):
+        row = conn.execute(
+            'SELECT version FROM user_data_versions WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        return row[0] if row else 0
+    
+    def save_forecast(self, user_id, category, days_ahead, data_version, result):
+        """Persist a JSON-encoded forecast result"""
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO forecasts
+                    (user_id, category, days_ahead, data_version, result, created_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (user_id, category or '', days_ahead, data_version, result))
+    
+    def get_forecast(self, user_id, category, days_ahead):
+        """Get the persisted forecast row, or None"""
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT * FROM forecasts
+                WHERE user_id = ? AND category = ? AND days_ahead = ?
+            ''', (user_id, category or '', days_ahead)).fetchone()
+            return dict(row) if row else None
+    
+    def save_forecasts(self, rows):
+        """Bulk persist (user_id, category, days_ahead, data_version, result) rows"""
+        with self.connection() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO forecasts
+                    (user_id, category, days_ahead, data_version, result, created_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', ((u, c or '', d, v, r) for u, c, d, v, r in rows))
+    
+    def get_data_versions(self):
+        """Data version of every user that has one"""
+        with self.connection() as conn:
+            return dict(conn.execute('SELECT user_id, version FROM user_data_versions').fetchall())
+    
+    def get_daily_expense_totals(self):
+        """Expense totals per (user, category, date) for all users in one query.
+
+        ``date`` is datetime64, ordered by user, category and date.
+        """
+        import numpy as np
+        import pandas as pd
+        with self.connection() as conn:
+            columns = self.column_reader.read(conn, [
+                ('user_id', 'user_id', 'int64'),
+                ('category_id', 'category_id', 'int64'),
+                ('day', 'day', 'int32'),
+                ('amount', 'amount', 'float64'),
+            ], '''(
+                SELECT user_id, category_id, day, SUM(amount) AS amount
+                FROM transactions
+                WHERE type = 'expense' AND day IS NOT NULL
+                GROUP BY user_id, category_id, day
+            )''')
+            category_ids, codes = np.unique(columns['category_id'], return_inverse=True)
+            names = self.categories.names(conn, category_ids.tolist())
+        
+        category = np.array([names[i] for i in category_ids.tolist()], dtype=object)[codes]
+        order = np.lexsort((columns['day'], category, columns['user_id']))
+        return pd.DataFrame({
+            'user_id': columns['user_id'][order],
+            'category': category[order],
+            'date': days_to_datetime(columns['day'][order]),
+            'amount': columns['amount'][order]
+        })
+    
+    def get_cached_response(self, key, max_age):
+        """Get a cached LLM response younger than max_age seconds, or None"""
+        now = time.time()
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT response FROM llm_cache WHERE key = ? AND created_at > ?',
+                (key, now - max_age)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?',
+                (now, key)
+            )
+            return row[0]
+    
+    def save_cached_response(self, key, response):
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_used, hits)
+                VALUES (?, ?, ?, ?, 0)
+            ''', (key, response, now, now))
+    
+    def evict_cached_responses(self, max_entries, max_age):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        with self.connection() as conn:
+            expired = conn.execute(
+                'DELETE FROM llm_cache WHERE created_at <= ?', (time.time() - max_age,)
+            ).rowcount
+            evicted = conn.execute('''
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (max_entries,)).rowcount
+            return expired + evicted
+    
+    def get_consumer_offset(self, consumer):
+        """Highest transaction id the consumer has processed, or None if it never ran"""
+        with self.connection() as conn:
+            row = conn.execute(
+                'SELECT last_id FROM consumer_offsets WHERE consumer = ?', (consumer,)
+            ).fetchone()
+            return row[0] if row else None
+    
+    def set_consumer_offset(self, consumer, last_id):
+        """Advance the consumer's offset; it never moves backwards"""
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT INTO consumer_offsets (consumer, last_id, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (consumer) DO UPDATE SET
+                    last_id = MAX(last_id, excluded.last_id),
+                    updated_at = excluded.updated_at
+            ''', (consumer, last_id))
+    
+    def commit_consumer_batch(self, consumer, expected, last_id, anomalies):
+        """Log a batch's anomalies and move the offset from ``expected`` to ``last_id`` atomically.
+
+        Runs under BEGIN IMMEDIATE, so consumers in different worker
+        processes commit one at a time. If the offset is no longer
+        ``expected``, another consumer already handled the batch: nothing is
+        written and False is returned.
+        """
+        with self.connection() as conn:
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT last_id FROM consumer_offsets WHERE consumer = ?', (consumer,)
+            ).fetchone()
+            if (row[0] if row else 0) != expected:
+                return False
+            self.log_anomalies(anomalies)
+            self.set_consumer_offset(consumer, last_id)
+            return True
+    
+    def get_max_transaction_id(self):
+        with self.connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+    
+    def get_transactions_after(self, last_id, limit=1000):
+        """Next ``limit`` transactions with id > last_id and a day number, in id order.
+
+        Columns are id, user_id, day, ds (datetime64), amount, category,
+        category_id and type.
+        """
+        import numpy as np
+        import pandas as pd
+        with self.connection() as conn:
+            columns = self.column_reader.read(conn, [
+                ('id', 'id', 'int64'),
+                ('user_id', 'user_id', 'int64'),
+                ('day', 'day', 'int32'),
+                ('amount', 'amount', 'float64'),
+                ('category_id', 'category_id', 'int64'),
+                ('type', 'type', 'text'),
+            ], '''(
+                SELECT * FROM transactions
+                WHERE id > ? AND day IS NOT NULL
+                ORDER BY id
+                LIMIT ?
+            )''', (last_id, limit))
+            category_ids, codes = np.unique(columns['category_id'], return_inverse=True)
+            names = self.categories.names(conn, category_ids.tolist())
+        
+        order = np.argsort(columns['id'])
+        type_codes, types = columns['type']
+        return pd.DataFrame({
+            'id': columns['id'][order],
+            'user_id': columns['user_id'][order],
+            'day': columns['day'][order],
+            'ds': days_to_datetime(columns['day'][order]),
+            'amount': columns['amount'][order],
+            'category': np.array([names[i] for i in category_ids.tolist()], dtype=object)[codes[order]],
+            'category_id': columns['category_id'][order],
+            'type': np.array(types, dtype=object)[type_codes[order]]
+        })
+    
+    def create_job(self, job_id, kind, user_id, params, dedupe_key):
+        """Queue a job; returns the id of an active job with the same dedupe key if there is one"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO jobs (id, kind, user_id, params, dedupe_key, status)
+                VALUES (?, ?, ?, ?, ?, 'queued')
+                ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running') DO NOTHING
+            ''', (job_id, kind, user_id, params, dedupe_key))
+            if cursor.rowcount:
+                return job_id
+            row = conn.execute('''
+                SELECT id FROM jobs
+                WHERE dedupe_key = ? AND status IN ('queued', 'running')
+            ''', (dedupe_key,)).fetchone()
+            return row[0] if row else None
+    
+    def start_job(self, job_id):
+        with self.connection() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (job_id,))
+    
+    def finish_job(self, job_id, result=None, error=None):
+        """Store a JSON-encoded result, or the error message if the job failed"""
+        with self.connection() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', ('failed' if error is not None else 'done', result, error, job_id))
+    
+    def get_job(self, job_id):
+        with self.connection() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            return dict(row) if row else None
+    
+    def fail_interrupted_jobs(self):
+        """Mark jobs a previous process left queued or running as failed"""
+        with self.connection() as conn:
+            return conn.execute('''
+                UPDATE jobs SET status = 'failed', error = 'Interrupted by restart',
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE status IN ('queued', 'running')
+            ''').rowcount
     
     def add_financial_goal(self, user_id, goal_name, target_amount, deadline=None):
         """Add financial goal"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO financial_goals (user_id, goal_name, target_amount, deadline)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, goal_name, target_amount, deadline))
-        conn.commit()
-        goal_id = cursor.lastrowid
-        conn.close()
-        return goal_id
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO financial_goals (user_id, goal_name, target_amount, deadline)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, goal_name, target_amount, deadline))
+            return cursor.lastrowid
     
     def get_user_goals(self, user_id):
         """Get all goals for user"""
-        conn = self.get_connection()
+        import pandas as pd
         query = 'SELECT * FROM financial_goals WHERE user_id = ?'
-        df = pd.read_sql_query(query, conn, params=(user_id,))
-        conn.close()
-        return df
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn, params=(user_id,))
     
     def reset_database(self):
         """Delete and recreate database - USE CAREFULLY"""
+        self.pool.close_all()
+        # Data versions and category ids restart in the new file
+        self.history_cache.clear()
+        self.categories.clear()
         if os.path.exists(self.db_path):
             os.remove(self.db_path)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(self.db_path + suffix):
+                    os.remove(self.db_path + suffix)
             print(f"Database {self.db_path} deleted")
         self.init_db()
@@ -0,0 +1,95 @@
+import threading
+from datetime import datetime
+
+# numpy and pandas are imported inside the functions that build arrays, like
+# database.py does, so importing the app stays cheap
+
+# Attributes CalendarDimension holds for every day
+CALENDAR_FIELDS = ('day_of_week', 'day_of_month', 'week', 'month', 'year', 'week_start')
+
+def to_day(date):
+    """'YYYY-MM-DD' as days since 1970-01-01"""
+    import numpy as np
+    return int(np.datetime64(date, 'D').astype(np.int64))
+
+def iso_date(date):
+    """``date`` as 'YYYY-MM-DD', padding a single-digit month or day; raises ValueError otherwise"""
+    try:
+        return datetime.strptime(str(date).strip(), '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"Invalid date {date!r}, expected YYYY-MM-DD")
+
+class CalendarDimension:
+    """Calendar attributes of day numbers, precomputed once and looked up by index.
+
+    Day numbers are days since 1970-01-01, as stored in transactions.day.
+    For each day in the span the dimension holds:
+
+      day_of_week   0 = Monday ... 6 = Sunday, as pandas' dayofweek
+      day_of_month  1-31
+      week          ISO week number
+      month         1-12
+      year
+      week_start    day number of that week's Monday
+
+    so feature code indexes arrays instead of building datetimes and
+    parsing them. The span grows to cover days outside it on first sight.
+    """
+
+    def __init__(self, first='2000-01-01', last='2039-12-31'):
+        self._span = (to_day(first), to_day(last))
+        self._first = None
+        self._arrays = None
+        self._lock = threading.Lock()
+
+    def _build(self, first, last):
+        import numpy as np
+        import pandas as pd
+        days = np.arange(first, last + 1, dtype=np.int64)
+        dates = days.astype('datetime64[D]')
+        months = dates.astype('datetime64[M]')
+        day_of_week = ((days + 3) % 7).astype(np.int8)  # 1970-01-01 was a Thursday
+        self._arrays = {
+            'day_of_week': day_of_week,
+            'day_of_month': ((dates - months).astype(np.int64) + 1).astype(np.int8),
+            'week': pd.DatetimeIndex(dates).isocalendar()['week'].to_numpy(dtype=np.int8),
+            'month': (months.astype(np.int64) % 12 + 1).astype(np.int8),
+            'year': (dates.astype('datetime64[Y]').astype(np.int64) + 1970).astype(np.int16),
+            'week_start': (days - day_of_week).astype(np.int32),
+        }
+        self._first = first
+        self._span = (first, last)
+
+    def lookup(self, days, fields=CALENDAR_FIELDS):
+        """{field: array} of calendar attributes for an array of day numbers.
+
+        Missing days (NaN or None, from a NULL transactions.day) get -1 in
+        every field.
+        """
+        import numpy as np
+        days = np.asarray(days)
+        missing = None
+        if days.dtype.kind not in 'iu':
+            days = days.astype(np.float64)
+            missing = np.isnan(days)
+            days = np.where(missing, 0, days)
+        days = days.astype(np.int64)
+        if missing is not None and missing.any():
+            present = self.lookup(days[~missing], fields)
+            result = {}
+            for field in fields:
+                result[field] = np.full(len(days), -1, dtype=present[field].dtype)
+                result[field][~missing] = present[field]
+            return result
+        with self._lock:
+            first, last = self._span
+            if len(days):
+                first, last = min(first, int(days.min())), max(last, int(days.max()))
+            if self._arrays is None or (first, last) != self._span:
+                self._build(first, last)
+            arrays, offset = self._arrays, self._first
+        index = days - offset
+        return {field: arrays[field][index] for field in fields}
+
+# Shared by every caller in the process; built on first lookup
+CALENDAR = CalendarDimension()
@@ -0,0 +1,338 @@
+from collections import OrderedDict
+import sys
+import threading
+
+# numpy and pandas are imported inside the methods that build arrays and
+# frames, like database.py does, so importing the app stays cheap
+
+from app.models.columnar import days_to_datetime
+from app.models.dates import to_day
+
+TRANSACTION_TYPES = ('income', 'expense')
+HISTORY_COLUMNS = ('id', 'user_id', 'date', 'day', 'amount', 'category', 'category_id', 'type')
+# Derived from the stored day numbers: 'ds' is the date as datetime64
+DERIVED_COLUMNS = ('ds',)
+
+# ColumnReader columns for one user's history
+HISTORY_READ_COLUMNS = [
+    ('id', 'id', 'int64'),
+    ('day', 'day', 'int32'),
+    ('amount', 'amount', 'float64'),
+    ('category_id', 'category_id', 'int64'),
+    ('expense', "type = 'expense'", 'bool'),
+]
+
+class UserHistory:
+    """One user's transactions as column arrays, newest first (date DESC, id DESC).
+
+    Dates are int32 day numbers, categories and types are codes into small
+    dictionaries, amounts are float64: about 25 bytes a row, against several
+    hundred for a DataFrame of Python strings. ``categories`` holds the
+    names and ``category_ids`` the stable category ids of the user's codes.
+    Instances are never modified; write-through builds a new one, so
+    readers holding an entry stay consistent.
+    """
+
+    __slots__ = ('user_id', 'version', 'ids', 'days', 'amounts', 'category_codes',
+                 'categories', 'category_ids', 'type_codes')
+
+    def __init__(self, user_id, version, ids, days, amounts, category_codes, categories, category_ids,
+                 type_codes):
+        self.user_id = user_id
+        self.version = version
+        self.ids = ids
+        self.days = days
+        self.amounts = amounts
+        self.category_codes = category_codes
+        self.categories = categories
+        self.category_ids = category_ids
+        self.type_codes = type_codes
+
+    @classmethod
+    def from_rows(cls, user_id, version, rows, categories=(), category_ids=()):
+        """Build from (id, date, amount, category, type, category_id) rows already in history order.
+
+        Raises ValueError for dates that are not 'YYYY-MM-DD'.
+        """
+        import numpy as np
+        n = len(rows)
+        mapping = {category_id: code for code, category_id in enumerate(category_ids)}
+        names = list(categories)
+        type_map = {txn_type: code for code, txn_type in enumerate(TRANSACTION_TYPES)}
+        ids, dates, amounts, category_values, types, id_values = zip(*rows) if n else ((),) * 6
+
+        def code(category_id, name):
+            if category_id not in mapping:
+                mapping[category_id] = len(mapping)
+                names.append(name)
+            return mapping[category_id]
+
+        try:
+            type_codes = np.fromiter((type_map[t] for t in types), np.uint8, n)
+        except KeyError as e:
+            raise ValueError(f"Unknown transaction type {e.args[0]!r}")
+        return cls(
+            user_id,
+            version,
+            np.fromiter(ids, np.int64, n),
+            np.array(dates, dtype='datetime64[D]').astype(np.int32),
+            np.fromiter(amounts, np.float64, n),
+            np.fromiter((code(i, c) for i, c in zip(id_values, category_values)), np.int32, n),
+            names,
+            np.fromiter(mapping, np.int64, len(mapping)),
+            type_codes
+        )
+
+    @classmethod
+    def from_columns(cls, user_id, version, columns, category_names):
+        """Build from a ColumnReader result of HISTORY_READ_COLUMNS, in any row order.
+
+        ``category_names`` maps category ids to names.
+        """
+        import numpy as np
+        ids, days = columns['id'], columns['day']
+        category_ids, codes = np.unique(columns['category_id'], return_inverse=True)
+        # Newest first: by day, then id, both descending
+        order = np.lexsort((ids, days))[::-1]
+        return cls(user_id, version, ids[order], days[order], columns['amount'][order],
+                   codes.astype(np.int32)[order], [category_names[i] for i in category_ids.tolist()],
+                   category_ids, columns['expense'][order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        arrays = (self.ids, self.days, self.amounts, self.category_codes, self.category_ids, self.type_codes)
+        return sum(a.nbytes for a in arrays) + sum(sys.getsizeof(c) for c in self.categories)
+
+    def with_rows(self, rows, version):
+        """A copy with (id, date, amount, category, type, category_id) rows merged in.
+
+        Rows whose id is already present are skipped: a concurrent load may
+        have read them before this write-through ran.
+        """
+        import numpy as np
+        added = UserHistory.from_rows(self.user_id, version, rows, self.categories, self.category_ids)
+        ids, days, amounts = self.ids, self.days, self.amounts
+        category_codes, type_codes = self.category_codes, self.type_codes
+        for i in range(len(added)):
+            new_id, day = added.ids[i], added.days[i]
+            if (ids == new_id).any():
+                continue
+            # Newest first: rows before it have a later day, or the same day and a higher id
+            at = int(np.count_nonzero((days > day) | ((days == day) & (ids > new_id))))
+            ids = np.insert(ids, at, new_id)
+            days = np.insert(days, at, day)
+            amounts = np.insert(amounts, at, added.amounts[i])
+            category_codes = np.insert(category_codes, at, added.category_codes[i])
+            type_codes = np.insert(type_codes, at, added.type_codes[i])
+        return UserHistory(self.user_id, version, ids, days, amounts, category_codes,
+                           added.categories, added.category_ids, type_codes)
+
+    def without(self, transaction_id, version):
+        """A copy without the given transaction"""
+        keep = self.ids != transaction_id
+        return UserHistory(
+            self.user_id, version, self.ids[keep], self.days[keep], self.amounts[keep],
+            self.category_codes[keep], self.categories, self.category_ids, self.type_codes[keep]
+        )
+
+    def mask(self, start_date=None, end_date=None, category_id=None, txn_type=None):
+        """Boolean row mask for the filters get_user_history accepts, or None for all rows"""
+        import numpy as np
+        mask = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if start_date:
+            mask = both(mask, self.days >= to_day(start_date))
+        if end_date:
+            mask = both(mask, self.days <= to_day(end_date))
+        if category_id is not None:
+            codes = np.flatnonzero(self.category_ids == category_id)
+            mask = both(mask, self.category_codes == (codes[0] if len(codes) else -1))
+        if txn_type:
+            code = TRANSACTION_TYPES.index(txn_type) if txn_type in TRANSACTION_TYPES else 255
+            mask = both(mask, self.type_codes == np.uint8(code))
+        return mask
+
+    def _column(self, name, rows):
+        """Column values for ``rows`` (a mask, slice or None) in their public form"""
+        import numpy as np
+        select = (lambda a: a) if rows is None else (lambda a: a[rows])
+        if name == 'id':
+            return select(self.ids)
+        if name == 'user_id':
+            return np.full(len(select(self.ids)), self.user_id, dtype=np.int64)
+        if name == 'amount':
+            return select(self.amounts)
+        if name == 'day':
+            return select(self.days).astype(np.int64)
+        if name == 'ds':
+            return days_to_datetime(select(self.days))
+        if name == 'date':
+            # Format each distinct day once
+            uniques, inverse = np.unique(select(self.days), return_inverse=True)
+            strings = np.datetime_as_string(uniques.astype('datetime64[D]')).astype(object)
+            return strings[inverse]
+        if name == 'category':
+            return np.array(self.categories, dtype=object)[select(self.category_codes)]
+        if name == 'category_id':
+            return self.category_ids[select(self.category_codes)]
+        if name == 'type':
+            return np.array(TRANSACTION_TYPES, dtype=object)[select(self.type_codes)]
+        raise ValueError(f"Unknown field: {name}")
+
+    def to_frame(self, columns=HISTORY_COLUMNS, rows=None):
+        """DataFrame shaped like get_user_history's: categorical category/type columns"""
+        import numpy as np
+        import pandas as pd
+        select = (lambda a: a) if rows is None else (lambda a: a[rows])
+        data = {}
+        for name in columns:
+            if name == 'category':
+                # Sorted categories, so codes match a freshly read frame
+                order = np.argsort(np.array(self.categories, dtype=object)) if self.categories else np.array([], int)
+                remap = np.empty(len(order), dtype=np.int32)
+                remap[order] = np.arange(len(order), dtype=np.int32)
+                codes = remap[select(self.category_codes)] if len(order) else select(self.category_codes)
+                categorical = pd.Categorical.from_codes(codes, [self.categories[i] for i in order])
+                # Only the categories present, as astype('category') would give
+                data[name] = categorical.remove_unused_categories()
+            elif name == 'type':
+                present = sorted({TRANSACTION_TYPES[c] for c in np.unique(select(self.type_codes))})
+                data[name] = pd.Categorical(self._column('type', rows), categories=present)
+            else:
+                data[name] = self._column(name, rows)
+        return pd.DataFrame(data, columns=list(columns))
+
+    def iter_rows(self, fields, after=None, limit=None):
+        """Rows as dicts in history order, starting after the (date, id) cursor"""
+        start = 0
+        if after is not None:
+            day, last_id = to_day(after[0]), int(after[1])
+            later = (self.days < day) | ((self.days == day) & (self.ids < last_id))
+            start = int(later.argmax()) if later.any() else len(self.ids)
+        stop = len(self.ids) if limit is None else min(len(self.ids), start + limit)
+        window = slice(start, stop)
+        columns = [self._column(name, window).tolist() for name in fields]
+        for values in zip(*columns):
+            yield dict(zip(fields, values))
+
+class HistoryCache:
+    """Process-wide, memory-bounded LRU of UserHistory entries keyed by user id.
+
+    Each entry carries the user's data version from when it was loaded, and
+    a lookup with any other version is a miss. Writes from other processes
+    or plain SQL are therefore never served stale. Writes through this
+    process's Database are applied to the entry instead of dropping it.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.write_throughs = 0
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None and entry.version != version:
+                self._remove(user_id)
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+    def put(self, entry):
+        size = entry.nbytes
+        with self._lock:
+            self._remove(entry.user_id)
+            if size > self.max_bytes:
+                return
+            self._data[entry.user_id] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, user_id):
+        entry = self._data.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _update(self, user_id, new_version, change):
+        """Apply ``change(entry)`` when the entry is exactly one write behind, else drop it"""
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return
+            if entry.version != new_version - 1:
+                self._remove(user_id)
+                self.invalidations += 1
+                return
+        try:
+            updated = change(entry)
+        except ValueError:
+            self.invalidate(user_id)
+            return
+        with self._lock:
+            # Skip if another write replaced the entry meanwhile
+            if self._data.get(user_id) is entry:
+                self._remove(user_id)
+                self._data[user_id] = updated
+                self._bytes += updated.nbytes
+                self.write_throughs += 1
+
+    def apply_insert(self, user_id, row, new_version):
+        """Write-through of one inserted (id, date, amount, category, type, category_id) row"""
+        self._update(user_id, new_version, lambda entry: entry.with_rows([row], new_version))
+
+    def apply_delete(self, user_id, transaction_id, new_version):
+        """Write-through of one deleted transaction"""
+        self._update(user_id, new_version, lambda entry: entry.without(transaction_id, new_version))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if user_id in self._data:
+                self._remove(user_id)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            rows = sum(len(entry) for entry in self._data.values())
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'rows': rows,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'bytes_per_row': round(self._bytes / rows, 2) if rows else 0.0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'write_throughs': self.write_throughs,
+            }
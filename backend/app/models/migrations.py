@@ -0,0 +1,378 @@
+import time
+
+from app.models.columnar import day_number
+from app.models.dates import iso_date
+
+# Ordered schema upgrades for databases created by older versions of the app.
+# Each migration is recorded in schema_version once applied, so it runs once
+# per database. A fresh database gets the current schema from
+# Database._create_tables and is stamped with every version instead, so
+# _create_tables must include each migration's result. Migrations must be
+# idempotent: older databases may already have some of what they add.
+MIGRATIONS = []
+
+CATEGORIES_TABLE = '''
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY,
+        key TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL
+    )
+'''
+
+# Rows written without a category_id (plain SQL, older code) or with their
+# category text changed get the id here, and the display spelling, which the
+# rollup triggers follow. Database.add_transaction(s) set both directly.
+CATEGORY_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_category_id_insert
+    AFTER INSERT ON transactions
+    WHEN NEW.category_id IS NULL
+    BEGIN
+        INSERT INTO categories (key, name) VALUES (lower(trim(NEW.category)), trim(NEW.category))
+        ON CONFLICT (key) DO NOTHING;
+        UPDATE transactions
+        SET (category_id, category) = (
+            SELECT id, name FROM categories WHERE key = lower(trim(NEW.category))
+        )
+        WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_category_id_update
+    AFTER UPDATE OF category ON transactions
+    WHEN NEW.category != OLD.category
+    BEGIN
+        INSERT INTO categories (key, name) VALUES (lower(trim(NEW.category)), trim(NEW.category))
+        ON CONFLICT (key) DO NOTHING;
+        UPDATE transactions
+        SET (category_id, category) = (
+            SELECT id, name FROM categories WHERE key = lower(trim(NEW.category))
+        )
+        WHERE id = NEW.id;
+    END
+    ''',
+]
+
+# transactions.day is the date as days since 1970-01-01, kept by the app on
+# insert and here for rows written without it or with their date changed
+DAY_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_day_insert
+    AFTER INSERT ON transactions
+    WHEN NEW.day IS NULL
+    BEGIN
+        UPDATE transactions SET day = {day_number('NEW.date')} WHERE id = NEW.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_day_update
+    AFTER UPDATE OF date ON transactions
+    WHEN NEW.date IS NOT OLD.date
+    BEGIN
+        UPDATE transactions SET day = {day_number('NEW.date')} WHERE id = NEW.id;
+    END
+    ''',
+]
+
+TRANSACTION_INDEXES = [
+    # Date ranges and keyset pages of one user's transactions
+    '''
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_day
+    ON transactions(user_id, day)
+    ''',
+    # Per-user reads by type and day answered from the index alone
+    '''
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_type_day
+    ON transactions(user_id, type, day, amount, category_id)
+    ''',
+    # Daily expense totals in group order, without the income rows
+    '''
+    CREATE INDEX IF NOT EXISTS idx_transactions_expense_daily
+    ON transactions(user_id, category_id, day, amount) WHERE type = 'expense'
+    ''',
+]
+
+CONSUMER_OFFSETS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS consumer_offsets (
+        consumer TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Insert-event consumers. Their offsets are recorded with the schema, so rows
+# inserted before a consumer first runs are still read by it.
+ANOMALY_CONSUMER = 'anomaly_scorer'
+CONSUMERS = (ANOMALY_CONSUMER,)
+
+def migration(version, description):
+    """Register ``func(conn)`` as schema version ``version``"""
+    def register(func):
+        assert not MIGRATIONS or version == MIGRATIONS[-1][0] + 1, "migration versions must be consecutive"
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+def table_exists(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+def column_names(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+@migration(1, 'anomalies.model_version, keeping one row per transaction')
+def _anomaly_model_version(conn):
+    if not table_exists(conn, 'anomalies') or 'model_version' in column_names(conn, 'anomalies'):
+        return
+    conn.execute('ALTER TABLE anomalies ADD COLUMN model_version INTEGER NOT NULL DEFAULT 0')
+    # Keep the newest row per transaction, dated at its first detection
+    conn.execute('''
+        UPDATE anomalies
+        SET detected_at = (
+            SELECT MIN(d.detected_at) FROM anomalies d
+            WHERE d.transaction_id = anomalies.transaction_id
+        )
+        WHERE id IN (SELECT MAX(id) FROM anomalies GROUP BY transaction_id)
+    ''')
+    cursor = conn.execute('''
+        DELETE FROM anomalies
+        WHERE id NOT IN (SELECT MAX(id) FROM anomalies GROUP BY transaction_id)
+    ''')
+    print(f"Removed {cursor.rowcount} duplicate anomaly rows")
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_anomalies_transaction_version
+        ON anomalies(transaction_id, model_version)
+    ''')
+
+@migration(2, 'idx_transactions_user_date, missing from databases whose tables predate it')
+def _user_date_index(conn):
+    if table_exists(conn, 'transactions'):
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, date)')
+
+@migration(3, 'covering index for per-user reads by type and date')
+def _user_type_date_index(conn):
+    if table_exists(conn, 'transactions'):
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_user_type_date
+            ON transactions(user_id, type, date, amount, category)
+        ''')
+
+@migration(4, 'partial index of expenses for daily totals')
+def _expense_daily_index(conn):
+    if table_exists(conn, 'transactions'):
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_expense_daily
+            ON transactions(user_id, category, date, amount) WHERE type = 'expense'
+        ''')
+
+@migration(5, 'idx_anomalies_detected_at for recent-anomaly lists')
+def _anomaly_detected_at_index(conn):
+    if table_exists(conn, 'anomalies'):
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_anomalies_detected_at ON anomalies(detected_at)')
+
+@migration(6, 'categories dictionary and transactions.category_id')
+def _category_ids(conn):
+    from app.models.categories import normalize_category
+    conn.execute(CATEGORIES_TABLE)
+    if not table_exists(conn, 'transactions'):
+        return
+    if 'category_id' not in column_names(conn, 'transactions'):
+        conn.execute('ALTER TABLE transactions ADD COLUMN category_id INTEGER REFERENCES categories(id)')
+
+    # Oldest spelling of each category first, so it becomes the display name
+    spellings = [row[0] for row in conn.execute('''
+        SELECT category FROM transactions WHERE category_id IS NULL
+        GROUP BY category ORDER BY MIN(id)
+    ''')]
+    for text in spellings:
+        name = normalize_category(text)
+        conn.execute('''
+            INSERT INTO categories (key, name) VALUES (lower(?), ?)
+            ON CONFLICT (key) DO NOTHING
+        ''', (name, name))
+        category_id, display = conn.execute(
+            'SELECT id, name FROM categories WHERE key = lower(?)', (name,)
+        ).fetchone()
+        conn.execute(
+            'UPDATE transactions SET category_id = ? WHERE category = ? AND category_id IS NULL',
+            (category_id, text)
+        )
+        if text != display:
+            # Variants take the display name; the rollup triggers move their totals
+            conn.execute('UPDATE transactions SET category = ? WHERE category = ?', (display, text))
+    if spellings:
+        print(f"Mapped {len(spellings)} category spellings to "
+              f"{conn.execute('SELECT COUNT(*) FROM categories').fetchone()[0]} categories")
+    for statement in CATEGORY_TRIGGERS:
+        conn.execute(statement)
+
+@migration(7, 'per-user and daily expense indexes keyed on category_id')
+def _category_id_indexes(conn):
+    if not table_exists(conn, 'transactions'):
+        return
+    conn.execute('DROP INDEX IF EXISTS idx_transactions_user_type_date')
+    conn.execute('DROP INDEX IF EXISTS idx_transactions_expense_daily')
+    conn.execute('''
+        CREATE INDEX idx_transactions_user_type_date
+        ON transactions(user_id, type, date, amount, category_id)
+    ''')
+    conn.execute('''
+        CREATE INDEX idx_transactions_expense_daily
+        ON transactions(user_id, category_id, date, amount) WHERE type = 'expense'
+    ''')
+
+@migration(8, 'transactions.day, the date as days since 1970-01-01')
+def _day_column(conn):
+    if not table_exists(conn, 'transactions'):
+        return
+    if 'day' not in column_names(conn, 'transactions'):
+        conn.execute('ALTER TABLE transactions ADD COLUMN day INTEGER')
+    pad_dates(conn)
+    conn.execute(f"UPDATE transactions SET day = {day_number('date')} WHERE day IS NULL")
+    for statement in DAY_TRIGGERS:
+        conn.execute(statement)
+
+@migration(9, 'per-user, covering and daily expense indexes keyed on day')
+def _day_indexes(conn):
+    if not table_exists(conn, 'transactions'):
+        return
+    for name in ('idx_transactions_user_date', 'idx_transactions_user_type_date',
+                 'idx_transactions_expense_daily'):
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    for statement in TRANSACTION_INDEXES:
+        conn.execute(statement)
+
+@migration(10, 'consumer offsets recorded with the schema instead of on first consumer run')
+def _consumer_offsets(conn):
+    conn.execute(CONSUMER_OFFSETS_TABLE)
+    init_consumer_offsets(conn)
+
+def init_consumer_offsets(conn):
+    """Start consumers without an offset at the newest transaction; existing offsets are kept"""
+    start = 0
+    if table_exists(conn, 'transactions'):
+        start = conn.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+    conn.executemany(
+        'INSERT INTO consumer_offsets (consumer, last_id) VALUES (?, ?) ON CONFLICT (consumer) DO NOTHING',
+        [(consumer, start) for consumer in CONSUMERS]
+    )
+
+@migration(11, 'unpadded dates rewritten as YYYY-MM-DD, with their day numbers and rollup months')
+def _padded_dates(conn):
+    if not table_exists(conn, 'transactions'):
+        return
+    pad_dates(conn)
+    conn.execute(f"UPDATE transactions SET day = {day_number('date')} WHERE day IS NULL")
+
+def pad_dates(conn):
+    """Rewrite dates stored unpadded ('2024-4-5') as 'YYYY-MM-DD'.
+
+    julianday() and the rollup month, substr(date, 1, 7), only read the
+    padded form, so such rows had no day number and a month like '2024-4-'.
+    The rollup of every affected user is rebuilt. Dates that still cannot be
+    parsed are reported; those rows stay out of the day-based reads.
+    """
+    padded, unparseable = [], []
+    for txn_id, user_id, date in conn.execute('''
+        SELECT id, user_id, date FROM transactions
+        WHERE date IS NULL OR julianday(date) IS NULL
+           OR date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+    ''').fetchall():
+        try:
+            padded.append((iso_date(date), txn_id, user_id))
+        except ValueError:
+            unparseable.append((txn_id, date))
+
+    conn.executemany('UPDATE transactions SET date = ? WHERE id = ?', [(date, txn_id) for date, txn_id, _ in padded])
+    user_ids = [(user_id,) for user_id in sorted({user_id for _, _, user_id in padded})]
+    if user_ids and table_exists(conn, 'user_aggregates'):
+        conn.executemany('DELETE FROM user_aggregates WHERE user_id = ?', user_ids)
+        conn.executemany('''
+            INSERT INTO user_aggregates (user_id, type, category, month, total, txn_count)
+            SELECT user_id, type, category, substr(date, 1, 7), SUM(amount), COUNT(*)
+            FROM transactions
+            WHERE user_id = ?
+            GROUP BY user_id, type, category, substr(date, 1, 7)
+        ''', user_ids)
+    if padded:
+        print(f"Padded {len(padded)} dates to YYYY-MM-DD for {len(user_ids)} users")
+    for txn_id, date in unparseable:
+        print(f"Transaction {txn_id} has an unparseable date {date!r}; it is left out of day-based reads")
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def schema_version(conn):
+    """Highest applied migration, 0 for a database that has never been migrated"""
+    if not table_exists(conn, 'schema_version'):
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+def pending_migrations(conn, target=None):
+    """(version, description) of migrations not yet applied, in order"""
+    current = schema_version(conn)
+    target = LATEST_VERSION if target is None else target
+    return [(version, description) for version, description, _ in MIGRATIONS
+            if current < version <= target]
+
+def run_migrations(conn, target=None, analyze=True):
+    """Apply pending migrations, each in its own transaction; returns (version, description, seconds).
+
+    Every migration takes the write lock (BEGIN IMMEDIATE) and re-checks
+    the version under it, so workers starting together apply each one once.
+    After any migration, ANALYZE refreshes the planner statistics the new
+    indexes need.
+    """
+    conn.commit()
+    ensure_version_table(conn)
+    target = LATEST_VERSION if target is None else target
+    applied = []
+    for version, description, func in MIGRATIONS:
+        if version > target:
+            break
+        if schema_version(conn) >= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            start = time.perf_counter()
+            func(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)', (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description, time.perf_counter() - start))
+        print(f"Applied migration {version}: {description}")
+
+    if applied and analyze:
+        conn.execute('ANALYZE')
+        conn.commit()
+    return applied
+
+def stamp(conn):
+    """Record every migration as applied, for a database created with the current schema"""
+    ensure_version_table(conn)
+    conn.executemany(
+        'INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)',
+        [(version, description) for version, description, _ in MIGRATIONS]
+    )
+    conn.commit()
+
+def optimize(conn):
+    """Let SQLite refresh statistics that have gone stale, bounded to a quick sample"""
+    conn.execute('PRAGMA analysis_limit=400')
+    conn.execute('PRAGMA optimize')
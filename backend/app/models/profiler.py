@@ -0,0 +1,229 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+def normalize_sql(sql):
+    """Collapse whitespace so the same statement aggregates under one key"""
+    return ' '.join(sql.split())
+
+def params_shape(params):
+    """Types of the bound parameters, e.g. '(int, str)' or '{user_id: int}'"""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in params.items()) + '}'
+    try:
+        return '(' + ', '.join(type(v).__name__ for v in params) + ')'
+    except TypeError:
+        return type(params).__name__
+
+def plan_summary(plan):
+    """Index names and full-table scans found in EXPLAIN QUERY PLAN details"""
+    indexes = set()
+    scans = set()
+    for detail in plan:
+        match = re.search(r'USING (?:COVERING )?INDEX (\w+)', detail)
+        if match:
+            indexes.add(match.group(1))
+        elif 'PRIMARY KEY' in detail:
+            indexes.add('PRIMARY KEY')
+        elif detail.startswith('SCAN ') and 'USING' not in detail:
+            scans.add(detail.split()[1])
+    return sorted(indexes), sorted(scans)
+
+class QueryProfiler:
+    """Opt-in timing of every statement run through the connection pool.
+
+    ``connection_factory()`` returns a ``sqlite3.Connection`` subclass for
+    ``sqlite3.connect(factory=...)``. Each statement is timed from execute
+    through the last fetch, with its row count (rows fetched for SELECTs,
+    rows changed otherwise) and the shape of its parameters. Statements
+    slower than ``threshold_ms`` are logged with their EXPLAIN QUERY PLAN.
+
+    With ``log_path`` set, every statement is appended to that JSONL file
+    (slow ones marked and carrying the plan) for query_report.py.
+    """
+
+    def __init__(self, db_path, threshold_ms=50.0, log_path=None, log_all=True):
+        self.db_path = db_path
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.log_all = log_all
+        self._stats = {}
+        self._plans = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._log = open(log_path, 'a', buffering=1) if log_path else None
+
+    def connection_factory(self):
+        profiler = self
+
+        class ProfiledConnection(sqlite3.Connection):
+            def cursor(self, factory=None):
+                return super().cursor(factory or ProfiledCursor)
+
+            def execute(self, sql, parameters=()):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, parameters):
+                return self.cursor().executemany(sql, parameters)
+
+        class ProfiledCursor(sqlite3.Cursor):
+            _record = None
+
+            def execute(self, sql, parameters=()):
+                self._finish()
+                start = time.perf_counter()
+                try:
+                    return super().execute(sql, parameters)
+                finally:
+                    self._record = [sql, params_shape(parameters), parameters, 0,
+                                    time.perf_counter() - start, False]
+
+            def executemany(self, sql, seq_of_parameters):
+                self._finish()
+                if not isinstance(seq_of_parameters, (list, tuple)):
+                    seq_of_parameters = list(seq_of_parameters)
+                shape = (f"{len(seq_of_parameters)} x {params_shape(seq_of_parameters[0])}"
+                         if seq_of_parameters else '0 x ()')
+                start = time.perf_counter()
+                try:
+                    return super().executemany(sql, seq_of_parameters)
+                finally:
+                    self._record = [sql, shape, None, 0, time.perf_counter() - start, True]
+
+            def _timed_fetch(self, method, *args):
+                start = time.perf_counter()
+                result = method(*args)
+                if self._record is not None:
+                    self._record[4] += time.perf_counter() - start
+                return result
+
+            def fetchone(self):
+                row = self._timed_fetch(super().fetchone)
+                if row is None:
+                    self._finish()
+                elif self._record is not None:
+                    self._record[3] += 1
+                return row
+
+            def fetchmany(self, size=None):
+                size = self.arraysize if size is None else size
+                rows = self._timed_fetch(super().fetchmany, size)
+                if self._record is not None:
+                    self._record[3] += len(rows)
+                if len(rows) < size:
+                    self._finish()
+                return rows
+
+            def fetchall(self):
+                rows = self._timed_fetch(super().fetchall)
+                if self._record is not None:
+                    self._record[3] += len(rows)
+                self._finish()
+                return rows
+
+            def __next__(self):
+                try:
+                    row = self._timed_fetch(super().__next__)
+                except StopIteration:
+                    self._finish()
+                    raise
+                if self._record is not None:
+                    self._record[3] += 1
+                return row
+
+            def close(self):
+                self._finish()
+                super().close()
+
+            def __del__(self):
+                self._finish()
+
+            def _finish(self):
+                record, self._record = self._record, None
+                if record is None:
+                    return
+                sql, shape, parameters, rows, seconds, many = record
+                if rows == 0 and self.rowcount > 0:
+                    rows = self.rowcount
+                profiler.record(sql, shape, parameters, rows, seconds, many)
+
+        return ProfiledConnection
+
+    def record(self, sql, shape, parameters, rows, seconds, many=False):
+        key = normalize_sql(sql)
+        ms = seconds * 1000
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+            stats['count'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            stats['rows'] += rows
+
+        slow = ms >= self.threshold_ms
+        if not slow and not (self._log and self.log_all):
+            return
+
+        entry = {
+            'ts': time.time(),
+            'sql': key,
+            'params': shape,
+            'rows': rows,
+            'ms': round(ms, 3),
+            'slow': slow
+        }
+        if slow:
+            entry['plan'] = self.explain(key, None if many else parameters)
+            print(f"Slow query ({ms:.1f} ms, {rows} rows): {key[:200]}")
+            for detail in entry['plan']:
+                print(f"    {detail}")
+        if self._log:
+            with self._lock:
+                self._log.write(json.dumps(entry) + '\n')
+
+    def explain(self, sql, parameters=None):
+        """EXPLAIN QUERY PLAN details for a statement, cached per statement text"""
+        plan = self._plans.get(sql)
+        if plan is not None:
+            return plan
+        if parameters is None:
+            # Plans do not depend on the values; NULLs stand in for the bindings
+            parameters = (None,) * sql.count('?')
+        try:
+            # A side connection, so explaining never disturbs an open cursor
+            # (never one inherited across fork)
+            pid, conn = getattr(self._local, 'conn', (None, None))
+            if pid != os.getpid():
+                conn = sqlite3.connect(self.db_path)
+                self._local.conn = (os.getpid(), conn)
+            plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+        except sqlite3.Error as e:
+            plan = [f'(no plan: {e})']
+        self._plans[sql] = plan
+        return plan
+
+    def top_queries(self, limit=20):
+        """Statements ordered by total time"""
+        with self._lock:
+            items = [dict(stats, sql=sql) for sql, stats in self._stats.items()]
+        items.sort(key=lambda item: -item['total_ms'])
+        for item in items[:limit]:
+            item['avg_ms'] = round(item['total_ms'] / item['count'], 3)
+            item['total_ms'] = round(item['total_ms'], 3)
+            item['max_ms'] = round(item['max_ms'], 3)
+        return items[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,53 @@
+from app.models.history_cache import HISTORY_COLUMNS
+
+class UserDataSnapshot:
+    """One user's data, read at most once per request and shared by every consumer.
+
+    The rollup rows and data version are read eagerly (O(categories)); the
+    transaction history is only loaded when a consumer first needs it, as a
+    compact columnar frame with categorical columns and dates parsed once.
+    """
+
+    def __init__(self, db, user_id):
+        self.db = db
+        self.user_id = user_id
+        self._transactions = None
+        self._expenses = None
+
+        with db.connection():
+            self.data_version = db.get_data_version(user_id)
+            self._aggregates = db.get_user_aggregates(user_id)
+
+    @property
+    def balance(self):
+        return sum(total if txn_type == 'income' else -total
+                   for txn_type, _, _, total, _ in self._aggregates)
+
+    @property
+    def categories(self):
+        return sorted({category for _, category, _, _, _ in self._aggregates})
+
+    def category_totals(self, txn_type='expense', month=None):
+        totals = {}
+        for row_type, category, row_month, total, _ in self._aggregates:
+            if row_type == txn_type and (month is None or row_month == month):
+                totals[category] = totals.get(category, 0) + total
+        return totals
+
+    def monthly_total(self, month, txn_type='expense'):
+        return sum(self.category_totals(txn_type, month).values())
+
+    @property
+    def transactions(self):
+        """Full history, newest first, loaded on first access; ``ds`` is the parsed date"""
+        if self._transactions is None:
+            self._transactions = self.db.get_user_history(self.user_id, HISTORY_COLUMNS + ('ds',))
+        return self._transactions
+
+    @property
+    def expenses(self):
+        """Expense rows with a parsed ``ds`` datetime column"""
+        if self._expenses is None:
+            df = self.transactions
+            self._expenses = df[df['type'] == 'expense'].copy()
+        return self._expenses
@@ -1,6 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app
 import sqlite3
-from datetime import datetime
 import hashlib
 
 auth_bp = Blueprint('auth', __name__)
@@ -18,20 +17,18 @@ def register():
         return jsonify({'error': 'username, email, and password required'}), 400
     
     try:
-        conn = current_app.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Hash password
-        password_hash = hash_password(data['password'])
-        
-        cursor.execute('''
-            INSERT INTO users (username, email, password_hash)
-            VALUES (?, ?, ?)
-        ''', (data['username'], data['email'], password_hash))
-        
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
+        with current_app.db.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Hash password
+            password_hash = hash_password(data['password'])
+            
+            cursor.execute('''
+                INSERT INTO users (username, email, password_hash)
+                VALUES (?, ?, ?)
+            ''', (data['username'], data['email'], password_hash))
+            
+            user_id = cursor.lastrowid
         
         return jsonify({
             'user_id': user_id,
@@ -54,19 +51,17 @@ def login():
         return jsonify({'error': 'username and password required'}), 400
     
     try:
-        conn = current_app.db.get_connection()
-        cursor = conn.cursor()
-        
         password_hash = hash_password(data['password'])
         
-        cursor.execute('''
-            SELECT id, username, email, created_at 
-            FROM users 
-            WHERE username = ? AND password_hash = ?
-        ''', (data['username'], password_hash))
-        
-        user = cursor.fetchone()
-        conn.close()
+        with current_app.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, username, email, created_at 
+                FROM users 
+                WHERE username = ? AND password_hash = ?
+            ''', (data['username'], password_hash))
+            
+            user = cursor.fetchone()
         
         if not user:
             return jsonify({'error': 'Invalid username or password'}), 401
@@ -86,17 +81,15 @@ def login():
 def get_user(user_id):
     """Get user info by ID"""
     try:
-        conn = current_app.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, username, email, created_at 
-            FROM users 
-            WHERE id = ?
-        ''', (user_id,))
-        
-        user = cursor.fetchone()
-        conn.close()
+        with current_app.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, username, email, created_at 
+                FROM users 
+                WHERE id = ?
+            ''', (user_id,))
+            
+            user = cursor.fetchone()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -115,12 +108,10 @@ def get_user(user_id):
 def list_users():
     """List all users"""
     try:
-        conn = current_app.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, username, email, created_at FROM users')
-        users = cursor.fetchall()
-        conn.close()
+        with current_app.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, username, email, created_at FROM users')
+            users = cursor.fetchall()
         
         return jsonify([{
             'id': user['id'],
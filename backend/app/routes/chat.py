@@ -1,16 +1,17 @@
-from flask import Blueprint, request, jsonify
-from app.models.database import Database
-from app.intelligence.forecasting import ExpenseForecaster
-from app.intelligence.anomaly_detector import AnomalyDetector
-from app.utils.chatterbox_client import ChatterboxClient
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from app.models.snapshot import UserDataSnapshot
+from app.utils.encoding import json_default
+from app.utils.intent_classifier import classify_intent
+import asyncio
 import json
+import time
+from datetime import datetime
 
 chat_bp = Blueprint('chat', __name__)
 
-db = Database()
-forecaster = ExpenseForecaster(db)
-anomaly_detector = AnomalyDetector(db)
-chatterbox = ChatterboxClient()
+def services():
+    """The app's lazily built forecaster, detector, model client and caches"""
+    return current_app.services
 
 @chat_bp.route('/chat', methods=['POST'])
 def chat():
@@ -18,52 +19,163 @@ def chat():
     user_id = data['user_id']
     message = data['message']
     
+    # Everything below reads the user's data through this one snapshot
+    snapshot = UserDataSnapshot(current_app.db, user_id)
+    
     # Get user context
-    context = get_user_context(user_id)
+    context = get_user_context(user_id, snapshot)
+    
+    intent_obj = resolve_intent(message, context, snapshot)
+    if intent_obj is None:
+        return jsonify({'error': 'Failed to parse intent'}), 400
+    
+    # Route based on intent
+    intent = intent_obj.get('intent')
+    result, meta = run_intent(intent_obj, user_id, snapshot)
+    
+    # Generate natural language response
+    response_text = services().chatterbox.generate_response(result, message)
+    
+    return jsonify({
+        'intent': intent,
+        'data': result,
+        'response': response_text,
+        **meta
+    })
+
+@chat_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Server-sent events: intent, then data, then response tokens as they arrive"""
+    data = request.json
+    user_id = data['user_id']
+    message = data['message']
+    
+    def generate():
+        # Sent before any work so clients see the first byte immediately
+        yield ': stream open\n\n'
+        
+        snapshot = UserDataSnapshot(current_app.db, user_id)
+        context = get_user_context(user_id, snapshot)
+        
+        intent_obj = resolve_intent(message, context, snapshot)
+        if intent_obj is None:
+            yield _sse('error', {'error': 'Failed to parse intent'})
+            return
+        
+        intent = intent_obj.get('intent')
+        yield _sse('intent', {'intent': intent})
+        
+        result, meta = run_intent(intent_obj, user_id, snapshot)
+        yield _sse('data', result)
+        
+        tokens = []
+        try:
+            for token in services().chatterbox.stream_response(result, message):
+                tokens.append(token)
+                yield _sse('token', {'token': token})
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+            return
+        
+        yield _sse('done', {'intent': intent, 'response': ''.join(tokens), **meta})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, default=json_default)}\n\n"
+
+def resolve_intent(message, context, snapshot):
+    """Parsed intent dict via rules, cache or the model; None if unparseable"""
+    response_cache = services().response_cache
+    
+    # Obvious phrasings skip the model entirely
+    intent_obj = classify_intent(message, context['categories'])
+    if intent_obj is not None:
+        response_cache.record_rule_hit()
+        return intent_obj
     
-    # Process with Chatterbox
-    intent_data = chatterbox.process_query(message, context)
+    intent_data = response_cache.get(message, context)
+    from_cache = intent_data is not None
+    if not from_cache:
+        # Process with Chatterbox while the history loads in the background
+        started = time.perf_counter()
+        intent_data = asyncio.run(_process_with_prefetch(services().chatterbox, message, context, snapshot))
+        latency = time.perf_counter() - started
     
     try:
         intent_obj = json.loads(intent_data.get('response', '{}'))
     except:
-        return jsonify({'error': 'Failed to parse intent'}), 400
+        return None
     
-    # Route based on intent
+    if not from_cache:
+        response_cache.put(message, context, intent_data, latency)
+    return intent_obj
+
+def run_intent(intent_obj, user_id, snapshot):
+    """Return (result, meta); meta names the refresh job when the result is stale"""
     intent = intent_obj.get('intent')
     
     if intent == 'forecast':
+        forecaster = services().forecaster
         days = intent_obj.get('time_range', 30)
         category = intent_obj.get('category')
-        result = forecaster.forecast_expenses(user_id, days, category)
+        result, fresh = forecaster.cached_forecast(user_id, days, category, snapshot.data_version)
+        if result is None:
+            # Nothing to show yet: the first forecast is computed inline
+            return forecaster.forecast_expenses(user_id, days, category, snapshot=snapshot), {}
+        if not fresh:
+            # Answer from the previous forecast while a new one is fitted
+            job = services().job_queue.submit('forecast', user_id, {'days_ahead': days, 'category': category})
+            return result, {'stale': True, 'refresh_job_id': job['id']}
+        return result, {}
         
     elif intent == 'anomaly_check':
-        result = anomaly_detector.detect_anomalies(user_id)
+        return services().anomaly_detector.detect_anomalies(user_id, snapshot=snapshot), {}
         
     elif intent == 'spending_summary':
-        df = db.get_user_transactions(user_id)
-        result = {
-            'total_spent': df[df['type'] == 'expense']['amount'].sum(),
-            'by_category': df[df['type'] == 'expense'].groupby('category')['amount'].sum().to_dict()
-        }
-    
-    else:
-        result = {'message': 'Intent not recognized'}
+        by_category = snapshot.category_totals('expense')
+        return {
+            'total_spent': sum(by_category.values()),
+            'by_category': by_category
+        }, {}
     
-    # Generate natural language response
-    response_text = chatterbox.generate_response(result, message)
-    
-    return jsonify({
-        'intent': intent,
-        'data': result,
-        'response': response_text
-    })
+    return {'message': 'Intent not recognized'}, {}
+
+@chat_bp.route('/chat/stats', methods=['GET'])
+def chat_stats():
+    # Only report services already built; asking for stats should not load them
+    svc = services()
+    loaded = svc.loaded()
+    stats = {'loaded': loaded}
+    if 'forecaster' in loaded:
+        stats['forecast_cache'] = svc.forecaster.cache_stats()
+    for name, key in (('chatterbox', 'chatterbox'), ('response_cache', 'intent_cache'),
+                      ('job_queue', 'jobs'), ('anomaly_consumer', 'anomaly_consumer')):
+        if name in loaded:
+            stats[key] = getattr(svc, name).stats()
+    return jsonify(stats)
+
+async def _process_with_prefetch(chatterbox, message, context, snapshot):
+    """Overlap the intent round trip with loading the history most intents need"""
+    intent_data, _ = await asyncio.gather(
+        chatterbox.aprocess_query(message, context),
+        asyncio.to_thread(lambda: snapshot.expenses)
+    )
+    return intent_data
 
-def get_user_context(user_id):
-    df = db.get_user_transactions(user_id)
+def get_user_context(user_id, snapshot=None):
+    db = current_app.db
+    if snapshot is None:
+        snapshot = UserDataSnapshot(db, user_id)
+    current_month = datetime.now().strftime('%Y-%m')
     return {
-        'balance': df[df['type'] == 'income']['amount'].sum() - df[df['type'] == 'expense']['amount'].sum(),
-        'monthly_spending': df[df['type'] == 'expense']['amount'].tail(30).sum(),
-        'anomaly_count': len(anomaly_detector.detect_anomalies(user_id)),
-        'categories': df['category'].unique().tolist()
+        'balance': snapshot.balance,
+        'monthly_spending': snapshot.monthly_total(current_month, 'expense'),
+        # Stored results from the last detection run, not a fresh model fit
+        'anomaly_count': db.count_anomalies(user_id),
+        'categories': snapshot.categories
     }
@@ -0,0 +1,46 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.utils.jobs import UnknownJobKind
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    """Queue a job: {"kind": "forecast" | "anomaly_check", "user_id": 1, "params": {...}}"""
+    try:
+        data = request.json or {}
+        if 'kind' not in data or 'user_id' not in data:
+            return jsonify({'error': 'kind and user_id are required'}), 400
+        params = data.get('params') or {}
+        if not isinstance(params, dict):
+            return jsonify({'error': 'params must be an object'}), 400
+
+        job = current_app.services.job_queue.submit(data['kind'], data['user_id'], params)
+        return jsonify(job), 202
+    except UnknownJobKind as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/stats', methods=['GET'])
+def job_stats():
+    return jsonify(current_app.services.job_queue.stats())
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status"""
+    job = current_app.services.job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@jobs_bp.route('/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Job result once done; 202 while still queued or running"""
+    job = current_app.services.job_queue.get(job_id, include_result=True)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'id': job_id, 'status': 'failed', 'error': job['error']}), 500
+    if job['status'] != 'done':
+        return jsonify({'id': job_id, 'status': job['status']}), 202
+    return jsonify({'id': job_id, 'status': 'done', 'result': job['result']})
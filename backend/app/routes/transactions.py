@@ -1,7 +1,53 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+import base64
+import csv
+import io
+import json
+from itertools import islice
+from app.models.dates import iso_date
 
 transactions_bp = Blueprint('transactions', __name__)
 
+BULK_CHUNK_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+def _encode_cursor(row):
+    raw = json.dumps([row['date'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date, txn_id = json.loads(base64.urlsafe_b64decode(padded))
+        return iso_date(date), int(txn_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def _iter_bulk_rows():
+    """Yield transaction rows from a JSON, CSV or NDJSON request body"""
+    content_type = (request.mimetype or '').lower()
+    
+    if content_type in ('text/csv', 'application/csv'):
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        yield from csv.DictReader(stream)
+    elif content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8')
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('transactions')
+        if not isinstance(data, list):
+            raise ValueError('Expected a JSON array of transactions')
+        yield from data
+
 @transactions_bp.route('', methods=['POST'])
 def add_transaction():
     """Add new transaction"""
@@ -26,29 +72,101 @@ def add_transaction():
             'status': 'success',
             'message': 'Transaction added successfully'
         }), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@transactions_bp.route('/bulk', methods=['POST'])
+def add_transactions_bulk():
+    """Add many transactions from a JSON array, CSV or NDJSON upload"""
+    user_id = request.args.get('user_id', type=int)
+    inserted = 0
+    errors = []
+    offset = 0
+    
+    try:
+        rows = _iter_bulk_rows()
+        # Streamed bodies are committed chunk by chunk so memory stays flat
+        while True:
+            chunk = list(islice(rows, BULK_CHUNK_SIZE))
+            if not chunk:
+                break
+            result = current_app.db.add_transactions(chunk, user_id=user_id)
+            inserted += result['inserted']
+            errors.extend({'index': e['index'] + offset, 'error': e['error']} for e in result['errors'])
+            offset += len(chunk)
+    except ValueError as e:
+        # A bad body part-way through: the earlier chunks are committed, so the
+        # response says where saving stopped and the client resends from there
+        errors.append({'index': offset, 'error': f"{e}; rows from index {offset} on were not saved"})
+    except Exception as e:
+        return jsonify({'error': str(e), 'inserted': inserted}), 500
+    
+    if errors and not inserted:
+        status = 400
+    elif errors:
+        status = 207
+    else:
+        status = 201
+    
+    return jsonify({
+        'status': 'success' if not errors else 'partial' if inserted else 'failed',
+        'inserted': inserted,
+        'failed': len(errors),
+        'errors': errors
+    }), status
+
 @transactions_bp.route('/<int:user_id>', methods=['GET'])
 def get_user_transactions(user_id):
-    """Get all transactions for a user"""
+    """Get transactions for a user, newest first.
+
+    Query parameters:
+        limit   page size (max 1000); omit to return the full history
+        after   cursor from a previous page's next_cursor
+        fields  comma-separated columns to return (id and date always included)
+        format  'ndjson' to stream one JSON object per line
+    """
     try:
-        df = current_app.db.get_user_transactions(user_id)
+        limit = request.args.get('limit', type=int)
+        if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+        
+        after = request.args.get('after')
+        after = _decode_cursor(after) if after else None
+        
+        fields = request.args.get('fields')
+        fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
         
-        if df.empty:
-            return jsonify({
-                'user_id': user_id,
-                'transactions': [],
-                'count': 0
-            }), 200
+        rows = current_app.db.iter_user_transactions(user_id, fields=fields, after=after, limit=limit)
+        # Pull the first row now so bad field names surface as a 400, not mid-stream
+        first = next(rows, None)
         
-        transactions = df.to_dict('records')
+        if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+            def generate():
+                if first is None:
+                    return
+                yield json.dumps(first) + '\n'
+                for row in rows:
+                    yield json.dumps(row) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        transactions = [] if first is None else [first]
+        transactions.extend(rows)
+        
+        next_cursor = None
+        if limit is not None and len(transactions) == limit:
+            next_cursor = _encode_cursor(transactions[-1])
         
         return jsonify({
             'user_id': user_id,
             'transactions': transactions,
-            'count': len(transactions)
+            'count': len(transactions),
+            'next_cursor': next_cursor
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -56,22 +174,9 @@ def get_user_transactions(user_id):
 def delete_transaction(transaction_id):
     """Delete a transaction by ID"""
     try:
-        conn = current_app.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Check if transaction exists
-        cursor.execute('SELECT id, user_id FROM transactions WHERE id = ?', (transaction_id,))
-        transaction = cursor.fetchone()
-        
-        if not transaction:
-            conn.close()
+        if not current_app.db.delete_transaction(transaction_id):
             return jsonify({'error': 'Transaction not found'}), 404
         
-        # Delete transaction
-        cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
-        conn.commit()
-        conn.close()
-        
         return jsonify({
             'id': transaction_id,
             'status': 'success',
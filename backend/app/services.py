@@ -0,0 +1,145 @@
+import threading
+
+class Services:
+    """The app's intelligence services, built on first use.
+
+    Constructing them imports pandas, scikit-learn and (for long histories)
+    Prophet, which takes seconds; auth and transaction traffic never pays
+    for that. ``warm_up`` builds everything ahead of the first chat request
+    and starts the incremental anomaly scorer, which otherwise starts on the
+    first insert event.
+    """
+
+    names = ('forecaster', 'anomaly_detector', 'chatterbox', 'response_cache',
+             'job_queue', 'anomaly_consumer')
+
+    def __init__(self, db, config):
+        self.db = db
+        self.config = config
+        self._instances = {}
+        self._lock = threading.RLock()
+        self._consumer_starting = False
+
+    def _get(self, name, factory):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+        return instance
+
+    @property
+    def forecaster(self):
+        def build():
+            from app.intelligence.forecasting import ExpenseForecaster
+            return ExpenseForecaster(
+                self.db,
+                engine=self.config['FORECAST_ENGINE'],
+                prophet_min_points=self.config['PROPHET_MIN_POINTS']
+            )
+        return self._get('forecaster', build)
+
+    @property
+    def anomaly_detector(self):
+        def build():
+            from app.intelligence.anomaly_detector import AnomalyDetector
+            return AnomalyDetector(self.db, contamination=self.config['ANOMALY_CONTAMINATION'])
+        return self._get('anomaly_detector', build)
+
+    @property
+    def chatterbox(self):
+        def build():
+            from app.utils.chatterbox_client import ChatterboxClient
+            return ChatterboxClient(self.config['CHATTERBOX_URL'])
+        return self._get('chatterbox', build)
+
+    @property
+    def response_cache(self):
+        def build():
+            from app.utils.response_cache import ResponseCache
+            return ResponseCache(self.db)
+        return self._get('response_cache', build)
+
+    @property
+    def job_queue(self):
+        def build():
+            from app.utils.jobs import JobQueue
+            queue = JobQueue(self.db)
+            # Handlers resolve the services when the job runs, not when queued
+            queue.register('forecast', lambda user_id, days_ahead=30, category=None:
+                           self.forecaster.forecast_expenses(user_id, days_ahead, category))
+            queue.register('anomaly_check', lambda user_id:
+                           self.anomaly_detector.detect_anomalies(user_id))
+            return queue
+        return self._get('job_queue', build)
+
+    @property
+    def anomaly_consumer(self):
+        def build():
+            from app.intelligence.anomaly_consumer import AnomalyConsumer
+            consumer = AnomalyConsumer(self.db, self.anomaly_detector)
+            # Catches up from its stored offset before waiting for events
+            consumer.start()
+            return consumer
+        return self._get('anomaly_consumer', build)
+
+    def notify_insert(self, user_ids):
+        """Database insert subscriber: wake the scorer, starting it off-request if needed"""
+        consumer = self._instances.get('anomaly_consumer')
+        if consumer is not None:
+            consumer.notify(user_ids)
+            return
+        with self._lock:
+            if self._consumer_starting:
+                return
+            self._consumer_starting = True
+        # Starting replays everything past the offset, so no event is lost
+        threading.Thread(target=lambda: self.anomaly_consumer, name='services-start', daemon=True).start()
+
+    def import_modules(self):
+        """Import the heavy libraries without building anything or starting threads.
+
+        Safe before fork: under gunicorn --preload the master imports them
+        once and workers share the loaded code copy-on-write.
+        """
+        import app.intelligence.forecasting  # noqa: F401
+        import app.intelligence.anomaly_detector  # noqa: F401
+        import app.intelligence.anomaly_consumer  # noqa: F401
+        import app.utils.chatterbox_client  # noqa: F401
+        if self.config['FORECAST_ENGINE'] in ('auto', 'prophet'):
+            try:
+                import prophet  # noqa: F401
+            except ImportError:
+                pass
+
+    def warm_up(self, background=True):
+        """Build every service now instead of on first use (starts threads: call after fork)"""
+        def run():
+            self.import_modules()
+            for name in self.names:
+                getattr(self, name)
+            print("✓ Services warmed up")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='services-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """Stop the scorer, drain the job queue and close the model client"""
+        with self._lock:
+            instances, self._instances = self._instances, {}
+        if 'anomaly_consumer' in instances:
+            instances['anomaly_consumer'].stop()
+        if 'job_queue' in instances:
+            instances['job_queue'].shutdown(wait=True)
+        if 'chatterbox' in instances:
+            instances['chatterbox'].close()
+
+    def loaded(self):
+        """Names of the services built so far"""
+        return [name for name in self.names if name in self._instances]
@@ -1,34 +1,205 @@
+import asyncio
+import json
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.utils.metrics import CHATTERBOX_SECONDS
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without a network call while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Stops calling a failing service for ``reset_timeout`` seconds.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast. Once the timeout passes a single trial call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
 
 class ChatterboxClient:
-    def __init__(self, base_url="http://127.0.0.1:4123"):
+    def __init__(self, base_url="http://127.0.0.1:4123", timeout=10, pool_size=10,
+                 retries=2, backoff_factor=0.3, failure_threshold=5, reset_timeout=30.0):
         self.base_url = base_url
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # Keep-alive connections to the model service, shared across threads.
+        # Only failed connects and 502-504s are retried: after a read timeout
+        # the service may still be answering, and a POST must not be re-sent
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'POST'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Shared by request threads and the prefetch executor
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _post(self, path, payload, stream=False):
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(f"Chatterbox circuit open, skipping {path}")
+
+        with self._lock:
+            self.requests += 1
+        start = time.perf_counter()
+        try:
+            r = self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                timeout=self.timeout,
+                stream=stream
+            )
+            r.raise_for_status()
+        except requests.RequestException as e:
+            with self._lock:
+                self.failures += 1
+            # A 4xx is the caller's fault and proves the service is up: only
+            # connection errors, timeouts and 5xx responses trip the breaker
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code < 500:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            CHATTERBOX_SECONDS.observe(time.perf_counter() - start, path, 'error')
+            raise
+
+        # For streams this is the time to the response headers
+        CHATTERBOX_SECONDS.observe(time.perf_counter() - start, path, 'ok')
+        self.breaker.record_success()
+        return r
 
     def process_query(self, message, context):
         payload = {
             "input": message,
             "context": context
         }
-
-        r = requests.post(
-            f"{self.base_url}/chat",
-            json=payload,
-            timeout=10
-        )
-        r.raise_for_status()
-        return r.json()
+        return self._post("/chat", payload).json()
 
     def generate_response(self, result, message):
         payload = {
             "input": message,
             "data": result
         }
+        return self._post("/respond", payload).json().get("response", "")
 
-        r = requests.post(
-            f"{self.base_url}/respond",
-            json=payload,
-            timeout=10
-        )
-        r.raise_for_status()
-        return r.json().get("response", "")
+    def stream_response(self, result, message):
+        """Yield response text chunks as the service produces them.
+
+        Understands server-sent events and newline-delimited JSON chunks
+        carrying a "token" (or "response") field. A service that answers
+        with a single JSON body yields its whole response once.
+        """
+        payload = {
+            "input": message,
+            "data": result,
+            "stream": True
+        }
+        r = self._post("/respond", payload, stream=True)
+        with r:
+            content_type = r.headers.get('Content-Type', '')
+            if 'text/event-stream' not in content_type and 'ndjson' not in content_type:
+                yield r.json().get("response", "")
+                return
+
+            # iter_lines only decodes when an encoding is known
+            r.encoding = r.encoding or 'utf-8'
+            for line in r.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                if line.startswith('data:'):
+                    # SSE strips exactly one space after the colon
+                    line = line[6:] if line.startswith('data: ') else line[5:]
+                elif line.startswith((':', 'event:', 'id:', 'retry:')):
+                    continue
+                if line == '[DONE]':
+                    return
+                try:
+                    chunk = json.loads(line)
+                except ValueError:
+                    yield line
+                    continue
+                if isinstance(chunk, dict):
+                    text = chunk.get("token", chunk.get("response", ""))
+                    if text:
+                        yield text
+                else:
+                    yield str(chunk)
+
+    async def aprocess_query(self, message, context):
+        """process_query on a worker thread, so it can overlap other work"""
+        return await asyncio.to_thread(self.process_query, message, context)
+
+    async def agenerate_response(self, result, message):
+        return await asyncio.to_thread(self.generate_response, result, message)
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                'requests': self.requests,
+                'failures': self.failures,
+                'rejected_by_breaker': self.rejected,
+            }
+        counters['circuit_state'] = self.breaker.state
+        return counters
 
+    def close(self):
+        self.session.close()
@@ -0,0 +1,6 @@
+def json_default(value):
+    """``json.dumps`` fallback for analysis results: NumPy/pandas scalars, dates and the rest as text"""
+    # NumPy scalars from pandas results
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
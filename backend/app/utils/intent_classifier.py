@@ -0,0 +1,46 @@
+import re
+
+FORECAST_PATTERN = re.compile(
+    r"\b(forecast\w*|predict\w*|projected|projections?|will i spend|expect(ed)? to spend|"
+    r"going to spend|next (week|month|\d+ days?))\b"
+)
+ANOMALY_PATTERN = re.compile(
+    r"\b(unusual|anomal\w*|suspicious|weird|strange|odd|outliers?|fraud\w*|unexpected)\b"
+)
+SUMMARY_PATTERN = re.compile(
+    r"\b(how much (did|have) i (spend|spent)|(my )?spending (summary|breakdown)|"
+    r"where (did|does) my money go|what did i spend|total spen(t|ding)|breakdown|summary)\b"
+)
+DAYS_PATTERN = re.compile(r"\bnext (\d+) days?\b")
+
+def classify_intent(message, categories=None):
+    """Recognize obvious phrasings without calling the LLM.
+
+    Returns an intent dict shaped like the model's parsed response, or None
+    when the message is ambiguous and should go to the model.
+    """
+    text = ' '.join(message.lower().split())
+    matches = [
+        name for name, pattern in (
+            ('forecast', FORECAST_PATTERN),
+            ('anomaly_check', ANOMALY_PATTERN),
+            ('spending_summary', SUMMARY_PATTERN)
+        ) if pattern.search(text)
+    ]
+    if len(matches) != 1:
+        return None
+
+    intent = {'intent': matches[0]}
+    if matches[0] == 'forecast':
+        days = DAYS_PATTERN.search(text)
+        if days:
+            intent['time_range'] = int(days.group(1))
+        elif 'next week' in text:
+            intent['time_range'] = 7
+        else:
+            intent['time_range'] = 30
+
+        named = [c for c in (categories or []) if re.search(rf"\b{re.escape(c.lower())}\b", text)]
+        if len(named) == 1:
+            intent['category'] = named[0]
+    return intent
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import traceback
+import uuid
+from app.utils.encoding import json_default
+
+class UnknownJobKind(ValueError):
+    """Raised when submitting a job kind with no registered handler"""
+
+class JobQueue:
+    """In-process background jobs, tracked in the jobs table.
+
+    Handlers are registered per job kind and called as
+    ``handler(user_id, **params)`` on a worker thread; their JSON-encodable
+    return value becomes the job result. Submitting a job identical to one
+    still queued or running (same kind, user and params) returns the
+    existing job instead of queueing another.
+    """
+
+    def __init__(self, db, max_workers=2):
+        self.db = db
+        self.handlers = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._queued = set()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    @staticmethod
+    def dedupe_key(kind, user_id, params):
+        return json.dumps([kind, user_id, params], sort_keys=True, separators=(',', ':'))
+
+    def submit(self, kind, user_id=None, params=None):
+        """Queue a job and return its status dict"""
+        if kind not in self.handlers:
+            raise UnknownJobKind(f"Unknown job kind: {kind}")
+        params = params or {}
+
+        job_id = uuid.uuid4().hex
+        existing = None
+        while existing is None:
+            # None means the duplicate finished between our insert and lookup: retry
+            existing = self.db.create_job(
+                job_id, kind, user_id, json.dumps(params), self.dedupe_key(kind, user_id, params)
+            )
+        with self._lock:
+            self.submitted += 1
+            if existing == job_id:
+                self._queued.add(job_id)
+                self.executor.submit(self._run, job_id, kind, user_id, params)
+            else:
+                self.deduplicated += 1
+        return self.get(existing)
+
+    def _run(self, job_id, kind, user_id, params):
+        with self._lock:
+            self._queued.discard(job_id)
+        self.db.start_job(job_id)
+        try:
+            result = self.handlers[kind](user_id, **params)
+            self.db.finish_job(job_id, result=json.dumps(result, default=json_default))
+        except Exception as e:
+            print(f"Job {job_id} ({kind}) failed: {e}")
+            traceback.print_exc()
+            self.db.finish_job(job_id, error=str(e))
+            with self._lock:
+                self.failed += 1
+            return
+        with self._lock:
+            self.completed += 1
+
+    def get(self, job_id, include_result=False):
+        """Job status dict, or None for an unknown id"""
+        job = self.db.get_job(job_id)
+        if job is None:
+            return None
+        job['params'] = json.loads(job['params'])
+        result = job.pop('result')
+        job.pop('dedupe_key')
+        if include_result:
+            job['result'] = json.loads(result) if result is not None else None
+        return job
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'completed': self.completed,
+                'failed': self.failed,
+                'kinds': sorted(self.handlers)
+            }
+
+    def shutdown(self, wait=True):
+        """Let running jobs finish; jobs not yet started are cancelled and marked failed"""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            cancelled, self._queued = self._queued, set()
+        for job_id in cancelled:
+            self.db.finish_job(job_id, error='Cancelled at shutdown')
@@ -0,0 +1,298 @@
+"""
+Prometheus text-format metrics without the client library.
+
+Histograms and counters are recorded in-process and rendered at /metrics.
+Values that are already counted elsewhere (cache and pool statistics) are
+not recorded twice: ``register_stats`` reads them from the owning object's
+``stats()`` at scrape time, so they cost nothing on the request path.
+
+Under gunicorn every worker keeps its own registry; a scrape reports the
+worker that served it (its pid is exported as ``process_pid``).
+"""
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+import inspect
+import os
+import threading
+import time
+
+# Upper bounds in seconds; +Inf is implicit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Switched off, the wrappers call straight through (used by the overhead benchmark)
+enabled = True
+
+def set_enabled(value):
+    global enabled
+    enabled = bool(value)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+
+    def register_collector(self, collector):
+        """``collector()`` returns [(name, type, help, [(labels dict, value), ...]), ...]"""
+        with self._lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics):
+            lines.extend(metric.render())
+        for collector in list(self.collectors):
+            try:
+                families = collector() or []
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    label_text = _format_labels(list(labels), list(labels.values()))
+                    lines.append(f'{name}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        # Observations land here first: deque.append is atomic, so the hot
+        # path takes no lock; they are folded into buckets in batches
+        self._pending = deque()
+        registry.register(self)
+
+    def observe(self, value, *labels):
+        pending = self._pending
+        pending.append((labels, value))
+        if len(pending) >= 256:
+            self._fold()
+
+    def _fold(self):
+        buckets = self.buckets
+        pending = self._pending
+        with self._lock:
+            for _ in range(len(pending)):
+                try:
+                    labels, value = pending.popleft()
+                except IndexError:
+                    break
+                series = self._series.get(labels)
+                if series is None:
+                    series = self._series[labels] = [0] * (len(buckets) + 1) + [0.0]
+                series[bisect_left(buckets, value)] += 1
+                series[-1] += value
+
+    def time(self, *labels):
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self, labels)
+
+    def snapshot(self):
+        """{labels: (count, sum)} for every series"""
+        self._fold()
+        with self._lock:
+            return {labels: (sum(series[:-1]), series[-1]) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        self._fold()
+        with self._lock:
+            series_list = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in series_list:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if enabled:
+            self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+def timed(histogram, *labels):
+    """Decorator observing each call's duration in ``histogram``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+        return wrapper
+    return decorator
+
+def instrument_methods(histogram, exclude=()):
+    """Class decorator timing every public method, labelled by method name.
+
+    Generator methods are skipped: timing them would only measure creating
+    the generator.
+    """
+    def decorator(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not inspect.isfunction(func):
+                continue
+            if inspect.isgeneratorfunction(func):
+                continue
+            setattr(cls, name, timed(histogram, name)(func))
+        return cls
+    return decorator
+
+def register_stats(prefix, documentation, stats, counters=(), gauges=(), registry=REGISTRY):
+    """Export keys of a ``stats()`` dict at scrape time.
+
+    ``stats`` is called on every scrape and may return None when the
+    object does not exist yet. ``counters`` become ``{prefix}_{key}_total``,
+    ``gauges`` become ``{prefix}_{key}``.
+    """
+    def collect():
+        values = stats()
+        if values is None:
+            return []
+        families = []
+        for key in counters:
+            families.append((f'{prefix}_{key}_total', 'counter', f'{documentation}: {key}',
+                             [({}, values.get(key, 0))]))
+        for key in gauges:
+            families.append((f'{prefix}_{key}', 'gauge', f'{documentation}: {key}',
+                             [({}, values.get(key, 0))]))
+        return families
+    registry.register_collector(collect)
+
+# Shared instruments
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Time from request start until the response is returned (headers, for streams)',
+    ('blueprint', 'endpoint', 'method', 'status')
+)
+DB_METHOD_SECONDS = Histogram(
+    'db_method_duration_seconds', 'Database method call duration', ('method',)
+)
+ANOMALY_SECONDS = Histogram(
+    'anomaly_detector_duration_seconds', 'AnomalyDetector stage duration', ('stage',)
+)
+FORECAST_SECONDS = Histogram(
+    'forecast_duration_seconds', 'ExpenseForecaster stage duration', ('stage', 'engine')
+)
+CHATTERBOX_SECONDS = Histogram(
+    'chatterbox_request_duration_seconds', 'Chatterbox call duration including retries',
+    ('path', 'outcome')
+)
+JSON_SECONDS = Histogram(
+    'json_serialize_duration_seconds', 'Time spent encoding JSON responses', (),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+)
+
+REGISTRY.register_collector(lambda: [
+    ('process_pid', 'gauge', 'Process id of the worker that served this scrape', [({}, os.getpid())])
+])
+
+def init_app(app):
+    """Time every request by endpoint, time JSON encoding and serve /metrics"""
+    from flask import Response, g, request
+    from flask.json.provider import DefaultJSONProvider
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            if not enabled:
+                return super().dumps(obj, **kwargs)
+            start = time.perf_counter()
+            try:
+                return super().dumps(obj, **kwargs)
+            finally:
+                JSON_SECONDS.observe(time.perf_counter() - start)
+
+    app.json_provider_class = TimedJSONProvider
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None and enabled:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                request.blueprint or '',
+                request.endpoint or 'unmatched',
+                request.method,
+                str(response.status_code)
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
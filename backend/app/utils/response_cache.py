@@ -0,0 +1,109 @@
+import hashlib
+import json
+import re
+import threading
+from app.models.categories import normalize_category
+from app.utils.cache import LRUCache
+
+def normalize_message(message):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    text = re.sub(r'\s+', ' ', message.lower()).strip()
+    return text.rstrip('?!. ')
+
+# Context fields that change how a message parses into an intent. Balance,
+# monthly spending and anomaly counts change with every transaction but only
+# feed the answer, so keying on them would empty the cache on active accounts.
+INTENT_CONTEXT_KEYS = ('categories',)
+
+def context_fingerprint(context):
+    """Stable hash of the parts of the context that affect intent parsing"""
+    relevant = {key: context.get(key) for key in INTENT_CONTEXT_KEYS}
+    # Spellings of one category ('Food ', 'food') are the same category
+    if relevant['categories']:
+        relevant['categories'] = sorted({normalize_category(c).lower() for c in relevant['categories']})
+    raw = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+class ResponseCache:
+    """Exact-match cache of LLM intent responses.
+
+    Keys combine the normalized message with a fingerprint of the user's
+    category list, so a new category misses but a new transaction does not.
+    Entries live in an in-memory LRU backed by the llm_cache table; both
+    honour ``ttl`` and the table is trimmed to ``max_persisted`` entries by
+    last use.
+    """
+
+    def __init__(self, db, max_entries=1024, ttl=3600, max_persisted=10000, evict_every=100):
+        self.db = db
+        self.ttl = ttl
+        self.max_persisted = max_persisted
+        self.evict_every = evict_every
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.persisted_hits = 0
+        self.misses = 0
+        self.rule_hits = 0
+        self.llm_calls = 0
+        self.llm_time = 0.0
+        self.cached_hits = 0
+
+    @staticmethod
+    def make_key(message, context):
+        return hashlib.sha1(
+            f"{normalize_message(message)}\x00{context_fingerprint(context)}".encode()
+        ).hexdigest()
+
+    def get(self, message, context):
+        key = self.make_key(message, context)
+        response = self.memory.get(key)
+        if response is None:
+            stored = self.db.get_cached_response(key, self.ttl)
+            if stored is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            response = json.loads(stored)
+            self.memory.put(key, response)
+            with self._lock:
+                self.persisted_hits += 1
+        with self._lock:
+            self.cached_hits += 1
+        return response
+
+    def put(self, message, context, response, latency=None):
+        """Store a response; ``latency`` is the LLM round trip it took, in seconds"""
+        key = self.make_key(message, context)
+        self.memory.put(key, response)
+        self.db.save_cached_response(key, json.dumps(response))
+
+        with self._lock:
+            if latency is not None:
+                self.llm_calls += 1
+                self.llm_time += latency
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self.db.evict_cached_responses(self.max_persisted, self.ttl)
+
+    def record_rule_hit(self):
+        with self._lock:
+            self.rule_hits += 1
+
+    def stats(self):
+        with self._lock:
+            served = self.cached_hits + self.rule_hits
+            lookups = served + self.misses
+            avg_llm = self.llm_time / self.llm_calls if self.llm_calls else 0.0
+            return {
+                'cache_hits': self.cached_hits,
+                'persisted_hits': self.persisted_hits,
+                'rule_hits': self.rule_hits,
+                'misses': self.misses,
+                'hit_rate': round(served / lookups, 4) if lookups else 0.0,
+                'avg_llm_ms': round(avg_llm * 1000, 1),
+                # Each avoided call would have cost about the average round trip
+                'latency_saved_ms': round(served * avg_llm * 1000, 1),
+                'memory': self.memory.stats(),
+            }
@@ -9,15 +9,31 @@ class Config:
     
     # Database
     DATABASE_PATH = os.environ.get('DATABASE_PATH', 'finance.db')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    # Query profiling (off by default): time every statement, log slow ones
+    # with their query plan, and append every statement to DB_PROFILE_LOG
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'false').lower() in ('1', 'true', 'yes')
+    DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '50'))
+    DB_PROFILE_LOG = os.environ.get('DB_PROFILE_LOG', 'query_profile.jsonl')
+    # Per-process memory bound of the columnar user history cache
+    HISTORY_CACHE_MB = float(os.environ.get('HISTORY_CACHE_MB', '64'))
+    # Bulk column reads: auto (ADBC when installed), adbc or sqlite
+    COLUMNAR_ENGINE = os.environ.get('COLUMNAR_ENGINE', 'auto')
     
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
     # Chatterbox
     CHATTERBOX_API_KEY = os.environ.get('CHATTERBOX_API_KEY')
+    CHATTERBOX_URL = os.environ.get('CHATTERBOX_URL', 'http://127.0.0.1:4123')
     
     # Intelligence
     ANOMALY_CONTAMINATION = float(os.environ.get('ANOMALY_CONTAMINATION', '0.1'))
+    FORECAST_ENGINE = os.environ.get('FORECAST_ENGINE', 'auto')
+    PROPHET_MIN_POINTS = int(os.environ.get('PROPHET_MIN_POINTS', '100'))
+    # Build the ML services at startup instead of on the first chat request
+    WARM_UP = os.environ.get('WARM_UP', 'false').lower() in ('1', 'true', 'yes')
     FORECAST_DEFAULT_DAYS = int(os.environ.get('FORECAST_DEFAULT_DAYS', '30'))
     MIN_TRANSACTIONS_FOR_ANALYSIS = int(os.environ.get('MIN_TRANSACTIONS_FOR_ANALYSIS', '10'))
 
@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for the production server.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+Every value can be overridden from the environment (see DEPLOYMENT.md).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}")
+
+# Processes for CPU-bound model work, threads for I/O waits (Chatterbox, SSE)
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Load the app (and the ML libraries) once in the master, then fork
+preload_app = True
+
+# Forecasts can take several seconds on a cold cache
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+# On SIGTERM, workers get this long to finish in-flight requests and jobs
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth from model caches
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = 200
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+def post_fork(server, worker):
+    # With preload the app object was built in the master; drop its inherited
+    # SQLite state (the pool also checks its pid on every checkout)
+    server.app.wsgi().db.pool.reset_after_fork()
+
+def post_worker_init(worker):
+    app = worker.wsgi
+    if app.config['WARM_UP']:
+        # Threads started here live in the worker, unlike anything from the master
+        app.services.warm_up()
+
+def worker_exit(server, worker):
+    # Let running jobs finish, fail queued ones, close connections
+    app = getattr(worker, 'wsgi', None)
+    if app is not None:
+        app.shutdown()
@@ -0,0 +1,21 @@
+"""
+Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (set in gunicorn.conf.py) this module is imported once in
+the gunicorn master before the workers fork.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.factory import create_app
+
+app = create_app()
+
+# Import pandas, scikit-learn and Prophet in the master so every worker
+# shares the loaded code copy-on-write. Nothing is built and no threads are
+# started here: threads do not survive fork.
+app.services.import_modules()
+
+# No SQLite connection may cross the fork
+app.db.pool.close_all()
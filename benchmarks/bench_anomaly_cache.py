@@ -0,0 +1,99 @@
+"""
+Anomaly Model Cache Benchmark
+Compares a cold IsolationForest fit+predict with scoring against the
+persisted per-user model, on synthetic expense histories
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+import argparse
+from datetime import date, timedelta
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.models.database import Database
+from app.intelligence.anomaly_detector import AnomalyDetector
+from sklearn.ensemble import IsolationForest
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health', 'Education']
+
+def seed_user(db, username, n, seed=42):
+    rng = random.Random(seed)
+    with db.connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, '')",
+            (username, f'{username}@example.com')
+        )
+        user_id = cursor.lastrowid
+    start = date(2023, 1, 1)
+    db.add_transactions({
+        'user_id': user_id,
+        'date': (start + timedelta(days=rng.randrange(730))).isoformat(),
+        'amount': round(rng.lognormvariate(5, 0.8), 2),
+        'category': rng.choice(CATEGORIES),
+        'type': 'expense'
+    } for _ in range(n))
+    return user_id
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated history sizes')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Model = fit+predict vs predict on a cached model; detect = full detect_anomalies call")
+    print(f"{'rows':>8} {'model cold':>11} {'model cached':>13} {'speedup':>8} "
+          f"{'detect cold':>12} {'detect cached':>14} {'speedup':>8}   (ms)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Database(os.path.join(tmpdir, 'bench.db'))
+        for n in (int(x) for x in args.sizes.split(',')):
+            user_id = seed_user(db, f'user_{n}', n)
+
+            def cold():
+                # Fresh detector and no stored model: full fit every call
+                with db.connection() as conn:
+                    conn.execute('DELETE FROM anomaly_models WHERE user_id = ?', (user_id,))
+                AnomalyDetector(db).detect_anomalies(user_id)
+
+            detector = AnomalyDetector(db)
+            detector.detect_anomalies(user_id)
+
+            state = detector._models[user_id]
+            df = db.get_user_transactions(user_id)
+            features = df[['amount']].assign(
+                dow=pd.to_datetime(df['date']).dt.dayofweek,
+                cat=df['category_id'].to_numpy(dtype=float)
+            ).values
+
+            def model_cold():
+                model = IsolationForest(contamination=detector.contamination, random_state=42)
+                model.fit(features)
+                model.predict(features)
+                model.score_samples(features)
+
+            def model_cached():
+                state['model'].predict(features)
+                state['model'].score_samples(features)
+
+            model_cold_s = timed(model_cold, args.repeat)
+            model_cached_s = timed(model_cached, args.repeat)
+            cold_s = timed(cold, args.repeat)
+            cached_s = timed(lambda: detector.detect_anomalies(user_id), args.repeat)
+            print(f"{n:>8} {model_cold_s * 1000:11.1f} {model_cached_s * 1000:13.1f} "
+                  f"{model_cold_s / model_cached_s:7.1f}x {cold_s * 1000:12.1f} "
+                  f"{cached_s * 1000:14.1f} {cold_s / cached_s:7.1f}x")
+
+if __name__ == '__main__':
+    main()
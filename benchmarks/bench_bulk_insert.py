@@ -0,0 +1,79 @@
+"""
+Bulk Insert Benchmark
+Compares rows/second of the single-row Database.add_transaction path with
+the executemany-based Database.add_transactions on a scratch database
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+import argparse
+from datetime import date, timedelta
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.models.database import Database
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health', 'Education']
+
+def make_rows(n, user_id=1, seed=42):
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    return [{
+        'user_id': user_id,
+        'date': (start + timedelta(days=rng.randrange(365))).isoformat(),
+        'amount': round(rng.uniform(20, 3000), 2),
+        'category': rng.choice(CATEGORIES),
+        'type': 'expense',
+        'description': 'bench',
+        'source': 'bench'
+    } for _ in range(n)]
+
+def fresh_db(tmpdir, name):
+    path = os.path.join(tmpdir, name)
+    db = Database(path)
+    with db.connection() as conn:
+        conn.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@example.com', '')"
+        )
+    return db
+
+def bench_single(db, rows):
+    start = time.perf_counter()
+    for r in rows:
+        db.add_transaction(r['user_id'], r['date'], r['amount'], r['category'],
+                           r['type'], r['description'], r['source'])
+    return time.perf_counter() - start
+
+def bench_bulk(db, rows):
+    start = time.perf_counter()
+    result = db.add_transactions(rows)
+    elapsed = time.perf_counter() - start
+    assert result['inserted'] == len(rows), result['errors'][:5]
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,50000', help='Comma-separated row counts')
+    parser.add_argument('--single-max', type=int, default=10000,
+                        help='Largest size to run through the single-insert path')
+    args = parser.parse_args()
+    
+    print(f"{'rows':>8} {'single rows/s':>15} {'bulk rows/s':>15} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in (int(x) for x in args.sizes.split(',')):
+            rows = make_rows(n)
+            
+            single_rate = None
+            if n <= args.single_max:
+                single_rate = n / bench_single(fresh_db(tmpdir, f'single_{n}.db'), rows)
+            bulk_rate = n / bench_bulk(fresh_db(tmpdir, f'bulk_{n}.db'), rows)
+            
+            single_col = f"{single_rate:15,.0f}" if single_rate else f"{'skipped':>15}"
+            speedup = f"{bulk_rate / single_rate:8.1f}x" if single_rate else f"{'-':>9}"
+            print(f"{n:>8} {single_col} {bulk_rate:15,.0f} {speedup}")
+
+if __name__ == '__main__':
+    main()
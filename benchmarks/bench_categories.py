@@ -0,0 +1,131 @@
+"""
+Category Dictionary Benchmark
+Compares category text against integer category ids on a scratch database:
+the on-disk size of the covering per-user and partial daily-expense indexes
+keyed each way, loading a user's history into columns, daily expense totals
+grouped in SQLite, and a pandas per-category groupby like the anomaly
+reasons.
+"""
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import statistics
+import argparse
+from datetime import date, timedelta
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import pandas as pd
+from app.models.columnar import ColumnReader
+from app.models.database import Database
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health', 'Education',
+              'Groceries', 'Rent', 'Insurance', 'Subscriptions', 'Travel', 'Gifts']
+
+# The same indexes as TRANSACTION_INDEXES, keyed on the category text
+TEXT_INDEXES = {
+    'idx_text_user_type_day': '''
+        CREATE INDEX idx_text_user_type_day ON transactions(user_id, type, day, amount, category)
+    ''',
+    'idx_text_expense_daily': '''
+        CREATE INDEX idx_text_expense_daily ON transactions(user_id, category, day, amount)
+        WHERE type = 'expense'
+    ''',
+}
+
+def fill(db_path, n, users, seed=42):
+    db = Database(db_path)
+    with db.connection() as conn:
+        category_ids = {name: ids[0] for name, ids in db.categories.resolve(conn, CATEGORIES).items()}
+    db.pool.close_all()
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    conn = sqlite3.connect(db_path)
+    chunk = 100000
+    for offset in range(0, n, chunk):
+        rows = []
+        for _ in range(min(chunk, n - offset)):
+            category = rng.choice(CATEGORIES)
+            day = start + timedelta(days=rng.randrange(2000))
+            rows.append((rng.randint(1, users), day.isoformat(), (day - date(1970, 1, 1)).days,
+                         round(rng.uniform(20, 3000), 2), category, category_ids[category],
+                         'expense' if rng.random() < 0.8 else 'income'))
+        conn.executemany(
+            'INSERT INTO transactions (user_id, date, day, amount, category, category_id, type) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        conn.commit()
+    for statement in TEXT_INDEXES.values():
+        conn.execute(statement)
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn
+
+def median_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def index_bytes(conn, name):
+    return conn.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (name,)).fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10, help='History load reads the first user')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("CATEGORY DICTIONARY")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'categories.db')
+        conn = fill(db_path, args.rows, args.users)
+        print(f"{args.rows} rows, {args.users} users, {len(CATEGORIES)} categories\n")
+
+        print(f"{'index':32s} {'text MB':>9} {'id MB':>9} {'saved':>7}")
+        for text_name, id_name in (('idx_text_user_type_day', 'idx_transactions_user_type_day'),
+                                   ('idx_text_expense_daily', 'idx_transactions_expense_daily')):
+            text_mb = index_bytes(conn, text_name) / 1024 / 1024
+            id_mb = index_bytes(conn, id_name) / 1024 / 1024
+            print(f"{id_name:32s} {text_mb:9.2f} {id_mb:9.2f} {1 - id_mb / text_mb:6.0%}")
+
+        reader = ColumnReader(db_path, 'sqlite')
+        history = [('id', 'id', 'int64'), ('day', 'day', 'int32'), ('amount', 'amount', 'float64'),
+                   ('expense', "type = 'expense'", 'bool')]
+        # Each statement is answered from its own covering index
+        history_text = lambda: reader.read(conn, history + [('category', 'category', 'text')],
+                                           'transactions WHERE user_id = ?', (1,))
+        history_id = lambda: reader.read(conn, history + [('category_id', 'category_id', 'int64')],
+                                         'transactions WHERE user_id = ?', (1,))
+        daily = '''
+            SELECT user_id, {key}, day, SUM(amount) FROM transactions
+            WHERE type = 'expense' GROUP BY user_id, {key}, day
+        '''
+        daily_text = lambda: conn.execute(daily.format(key='category')).fetchall()
+        daily_id = lambda: conn.execute(daily.format(key='category_id')).fetchall()
+
+        frame = pd.read_sql_query('SELECT amount, category, category_id FROM transactions', conn)
+        frame['category'] = frame['category'].astype(object)
+        groupby_text = lambda: frame['amount'].groupby(frame['category']).transform('mean')
+        groupby_id = lambda: frame['amount'].groupby(frame['category_id']).transform('mean')
+
+        print(f"\n{'operation':28s} {'text ms':>9} {'id ms':>9} {'speedup':>8}")
+        for name, text_fn, id_fn in (('history load (1 user)', history_text, history_id),
+                                     ('daily expense totals', daily_text, daily_id),
+                                     ('pandas groupby mean', groupby_text, groupby_id)):
+            text_ms = median_time(text_fn, args.repeat) * 1000
+            id_ms = median_time(id_fn, args.repeat) * 1000
+            print(f"{name:28s} {text_ms:9.1f} {id_ms:9.1f} {text_ms / id_ms:7.1f}x")
+        conn.close()
+
+if __name__ == '__main__':
+    main()
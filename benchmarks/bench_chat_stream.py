@@ -0,0 +1,87 @@
+"""
+Chat Streaming Benchmark
+Serves the Flask app on a copy of finance.db with the Chatterbox stub
+(intent latency + paced tokens) and compares time-to-first-byte, time to
+the intent event, time to the first token and total time for the blocking
+/api/chat against /api/chat/stream.
+"""
+import sys
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+import argparse
+import http.client
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, '..', 'backend'))
+sys.path.append(BENCH_DIR)
+
+from chatterbox_stub import start_stub
+
+def timed_request(port, path, body):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    start = time.perf_counter()
+    conn.request('POST', path, body=json.dumps(body), headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+
+    marks = {}
+    buffer = b''
+    while True:
+        chunk = response.read1(65536) if hasattr(response, 'read1') else response.read(1)
+        if not chunk:
+            break
+        now = time.perf_counter() - start
+        marks.setdefault('first_byte', now)
+        buffer += chunk
+        if b'event: intent' in buffer:
+            marks.setdefault('intent', now)
+        if b'event: token' in buffer:
+            marks.setdefault('first_token', now)
+    marks['total'] = time.perf_counter() - start
+    conn.close()
+    return marks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=os.path.join(BENCH_DIR, '..', 'finance.db'))
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--intent-latency', type=float, default=0.3, help='Stub seconds per call')
+    parser.add_argument('--token-delay', type=float, default=0.05)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    shutil.copy(args.db, os.path.join(workdir, 'finance.db'))
+    os.chdir(workdir)
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'finance.db')
+
+    stub = start_stub(latency=args.intent_latency, token_delay=args.token_delay)
+    from werkzeug.serving import make_server
+    import run
+    server = make_server('127.0.0.1', args.port, run.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        print(f"{'endpoint':>18} {'first byte':>11} {'intent':>8} {'1st token':>10} {'total':>8}   (ms, median)")
+        for path in ('/api/chat', '/api/chat/stream'):
+            runs = []
+            for i in range(args.runs):
+                # A fresh message each run so the intent cache cannot answer it
+                body = {'user_id': 1, 'message': f'tell me about my money #{i} {path}'}
+                runs.append(timed_request(args.port, path, body))
+
+            def median(key):
+                values = sorted(r[key] for r in runs if key in r)
+                return f"{values[len(values) // 2] * 1000:.0f}" if values else '-'
+            print(f"{path:>18} {median('first_byte'):>11} {median('intent'):>8} "
+                  f"{median('first_token'):>10} {median('total'):>8}")
+    finally:
+        server.shutdown()
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
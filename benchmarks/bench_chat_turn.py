@@ -0,0 +1,107 @@
+"""
+Chat Turn Benchmark
+Measures SQL reads and wall time of the data work behind one /api/chat turn
+(context + intent handler, LLM calls excluded), before and after sharing a
+UserDataSnapshot. "Before" replays the old flow: the context re-reads the
+history and runs detect_anomalies, then the handler reads it again.
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+import argparse
+from datetime import datetime
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.models.database import Database
+from app.models.snapshot import UserDataSnapshot
+from app.intelligence.anomaly_detector import AnomalyDetector
+from app.intelligence.forecasting import ExpenseForecaster
+
+class StatementCounter:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.selects = 0
+        self.history_reads = 0
+
+    def __call__(self, statement):
+        sql = ' '.join(statement.upper().split())
+        if sql.startswith(('SELECT', 'WITH')):
+            self.selects += 1
+            if 'FROM TRANSACTIONS' in sql:
+                self.history_reads += 1
+
+def before_turn(db, detector, forecaster, user_id, intent):
+    df = db.get_user_transactions(user_id)
+    context = {
+        'balance': df[df['type'] == 'income']['amount'].sum() - df[df['type'] == 'expense']['amount'].sum(),
+        'anomaly_count': len(detector.detect_anomalies(user_id)),
+        'categories': df['category'].unique().tolist()
+    }
+    if intent == 'forecast':
+        return context, forecaster.forecast_expenses(user_id, 30)
+    if intent == 'anomaly_check':
+        return context, detector.detect_anomalies(user_id)
+    df = db.get_user_transactions(user_id)
+    return context, df[df['type'] == 'expense'].groupby('category')['amount'].sum().to_dict()
+
+def after_turn(db, detector, forecaster, user_id, intent):
+    snapshot = UserDataSnapshot(db, user_id)
+    context = {
+        'balance': snapshot.balance,
+        'monthly_spending': snapshot.monthly_total(datetime.now().strftime('%Y-%m')),
+        'anomaly_count': db.count_anomalies(user_id),
+        'categories': snapshot.categories
+    }
+    if intent == 'forecast':
+        return context, forecaster.forecast_expenses(user_id, 30, snapshot=snapshot)
+    if intent == 'anomaly_check':
+        return context, detector.detect_anomalies(user_id, snapshot=snapshot)
+    return context, snapshot.category_totals('expense')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), '..', 'finance.db'),
+                        help='Database to copy and benchmark against')
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--turns', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'bench.db')
+        shutil.copy(args.db, path)
+        db = Database(path)
+
+        counter = StatementCounter()
+        connect = db.pool._connect
+        def traced_connect():
+            conn = connect()
+            conn.set_trace_callback(counter)
+            return conn
+        db.pool._connect = traced_connect
+        db.pool.close_all()
+
+        detector = AnomalyDetector(db)
+        forecaster = ExpenseForecaster(db)
+        # Warm model and forecast caches so both flows see the same state
+        detector.detect_anomalies(args.user_id)
+        forecaster.forecast_expenses(args.user_id, 30)
+
+        print(f"{'intent':>17} {'flow':>7} {'SELECTs':>8} {'history reads':>14} {'ms/turn':>9}")
+        for intent in ('spending_summary', 'forecast', 'anomaly_check'):
+            for name, turn in (('before', before_turn), ('after', after_turn)):
+                counter.reset()
+                start = time.perf_counter()
+                for _ in range(args.turns):
+                    turn(db, detector, forecaster, args.user_id, intent)
+                elapsed = (time.perf_counter() - start) / args.turns
+                print(f"{intent:>17} {name:>7} {counter.selects / args.turns:8.1f} "
+                      f"{counter.history_reads / args.turns:14.1f} {elapsed * 1000:9.1f}")
+
+if __name__ == '__main__':
+    main()
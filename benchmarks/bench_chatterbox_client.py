@@ -0,0 +1,92 @@
+"""
+Chatterbox Client Benchmark
+Runs ChatterboxClient against the local stub: per-call latency of bare
+requests.post versus the pooled keep-alive session, retry behaviour under
+injected 503s, circuit breaker fail-fast once the service is down, and
+the overlap gained by the async variant.
+"""
+import sys
+import os
+import asyncio
+import time
+import argparse
+import requests
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.append(os.path.dirname(__file__))
+
+from app.utils.chatterbox_client import ChatterboxClient, CircuitOpenError
+from chatterbox_stub import start_stub
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=4123)
+    parser.add_argument('--calls', type=int, default=300)
+    args = parser.parse_args()
+    base_url = f"http://127.0.0.1:{args.port}"
+    payload = {'input': 'how much did I spend?', 'context': {}}
+
+    server = start_stub(port=args.port)
+    try:
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            requests.post(f"{base_url}/chat", json=payload, timeout=10).json()
+        bare = (time.perf_counter() - start) / args.calls
+
+        client = ChatterboxClient(base_url)
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            client.process_query(payload['input'], payload['context'])
+        pooled = (time.perf_counter() - start) / args.calls
+        print(f"Latency per call: bare requests.post {bare * 1000:.2f}ms, "
+              f"pooled session {pooled * 1000:.2f}ms ({bare / pooled:.1f}x)")
+
+        server.config.fail_rate = 0.3
+        client = ChatterboxClient(base_url, retries=3, backoff_factor=0.01, failure_threshold=1000)
+        failed = 0
+        for _ in range(100):
+            try:
+                client.process_query(payload['input'], payload['context'])
+            except requests.RequestException:
+                failed += 1
+        print(f"With 30% injected 503s and 3 retries: {failed}/100 calls failed "
+              f"({server.config.calls - 2 * args.calls} requests reached the stub)")
+        server.config.fail_rate = 0.0
+
+        server.config.latency = 0.2
+        client = ChatterboxClient(base_url)
+
+        async def overlapped():
+            await asyncio.gather(
+                client.aprocess_query(payload['input'], {}),
+                asyncio.to_thread(time.sleep, 0.2)
+            )
+        start = time.perf_counter()
+        client.process_query(payload['input'], {})
+        time.sleep(0.2)
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        asyncio.run(overlapped())
+        print(f"200ms intent call + 200ms prefetch: serial {serial * 1000:.0f}ms, "
+              f"async overlap {(time.perf_counter() - start) * 1000:.0f}ms")
+        server.config.latency = 0.0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    client = ChatterboxClient(base_url, retries=0, failure_threshold=3, reset_timeout=30)
+    outcomes = []
+    for _ in range(6):
+        start = time.perf_counter()
+        try:
+            client.process_query('hi', {})
+        except CircuitOpenError:
+            outcomes.append(f"fast-fail {(time.perf_counter() - start) * 1000:.2f}ms")
+        except requests.RequestException:
+            outcomes.append(f"error {(time.perf_counter() - start) * 1000:.2f}ms")
+    print(f"Service down, breaker threshold 3: {', '.join(outcomes)}")
+    print(f"Client stats: {client.stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Columnar Read Benchmark
+Compares ways of loading a transactions table into typed columns with the
+dates parsed: pandas read_sql_query followed by pd.to_datetime (the old
+path), a tuple-per-row fetch converted to NumPy, and the ColumnReader
+engines (the packed stdlib sqlite reader, and ADBC when it is installed).
+"""
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import statistics
+import argparse
+from datetime import date, timedelta
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+import pandas as pd
+from app.models.columnar import ColumnReader, adbc_available, days_to_datetime
+from app.models.database import Database
+from app.models.history_cache import HISTORY_READ_COLUMNS
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health', 'Education']
+
+def fill(db_path, n, seed=42):
+    # Plain executemany: fast to build, same schema and indexes as the app
+    db = Database(db_path)
+    with db.connection() as conn:
+        category_ids = {name: ids[0] for name, ids in db.categories.resolve(conn, CATEGORIES).items()}
+    db.pool.close_all()
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    conn = sqlite3.connect(db_path)
+    chunk = 100000
+    for offset in range(0, n, chunk):
+        rows = []
+        for _ in range(min(chunk, n - offset)):
+            category = rng.choice(CATEGORIES)
+            day = start + timedelta(days=rng.randrange(2000))
+            rows.append((day.isoformat(), (day - date(1970, 1, 1)).days,
+                         round(rng.uniform(20, 3000), 2), category, category_ids[category],
+                         'expense' if rng.random() < 0.8 else 'income', 'bench', 'bench'))
+        conn.executemany(
+            'INSERT INTO transactions (user_id, date, day, amount, category, category_id, type, description, '
+            'source) VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        conn.commit()
+    conn.close()
+
+def median_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def read_sql(conn):
+    df = pd.read_sql_query(
+        'SELECT id, date, amount, category, type FROM transactions WHERE user_id = 1', conn
+    )
+    df['date'] = pd.to_datetime(df['date'])
+    df['category'] = df['category'].astype('category')
+    return df
+
+def read_tuples(conn):
+    cursor = conn.execute('SELECT id, date, amount, category, type FROM transactions WHERE user_id = 1')
+    ids, dates, amounts, categories, types = zip(*cursor.fetchall())
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'ds': np.array(dates, dtype='datetime64[D]').astype('datetime64[ns]'),
+        'amount': np.array(amounts, dtype=np.float64),
+        'category': pd.Categorical(categories),
+        'expense': np.array(types, dtype=object) == 'expense',
+    }
+
+def read_columns(reader, conn):
+    columns = reader.read(conn, HISTORY_READ_COLUMNS, 'transactions WHERE user_id = ?', (1,))
+    columns['ds'] = days_to_datetime(columns['day'])
+    return columns
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10000,100000,1000000,5000000', help='Comma-separated row counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("COLUMNAR READ")
+    print("=" * 60)
+    engines = ['sqlite'] + (['adbc'] if adbc_available() else [])
+    if len(engines) == 1:
+        print("ADBC not installed (pip install adbc-driver-sqlite pyarrow); skipping it")
+
+    header = f"{'rows':>9} {'read_sql s':>11} {'tuples s':>10}" + ''.join(f" {e + ' s':>10}" for e in engines)
+    print(header + f" {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in [int(x) for x in args.sizes.split(',')]:
+            db_path = os.path.join(tmpdir, f'rows_{n}.db')
+            fill(db_path, n)
+            conn = sqlite3.connect(db_path)
+
+            # Same values from every path
+            expected = read_sql(conn).sort_values('id')
+            for engine in engines:
+                got = read_columns(ColumnReader(db_path, engine), conn)
+                order = np.argsort(got['id'])
+                assert np.array_equal(got['id'][order], expected['id'].to_numpy())
+                assert np.array_equal(got['ds'][order], expected['date'].to_numpy())
+                assert np.array_equal(got['amount'][order], expected['amount'].to_numpy())
+
+            sql_s = median_time(lambda: read_sql(conn), args.repeat)
+            tuple_s = median_time(lambda: read_tuples(conn), args.repeat)
+            engine_s = []
+            for engine in engines:
+                reader = ColumnReader(db_path, engine)
+                engine_s.append(median_time(lambda: read_columns(reader, conn), args.repeat))
+            print(f"{n:9d} {sql_s:11.3f} {tuple_s:10.3f}" + ''.join(f" {s:10.3f}" for s in engine_s)
+                  + f" {sql_s / min(engine_s):7.1f}x")
+            conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Integer Day Benchmark
+Compares dates kept as 'YYYY-MM-DD' text against the integer transactions.day
+column on a scratch database: index sizes, a per-user history load, a
+date-range filter, daily expense totals, the anomaly calendar features and
+weekly spending trends.
+"""
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import statistics
+import argparse
+from datetime import date, timedelta
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+import pandas as pd
+from app.models.columnar import ColumnReader, day_number
+from app.models.database import Database
+from app.models.dates import CALENDAR, to_day
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health', 'Education',
+              'Groceries', 'Rent', 'Insurance', 'Subscriptions', 'Travel', 'Gifts']
+
+# The same indexes as TRANSACTION_INDEXES, keyed on the date text
+TEXT_INDEXES = {
+    'idx_text_user_date': '''
+        CREATE INDEX idx_text_user_date ON transactions(user_id, date)
+    ''',
+    'idx_text_user_type_date': '''
+        CREATE INDEX idx_text_user_type_date ON transactions(user_id, type, date, amount, category_id)
+    ''',
+    'idx_text_expense_daily': '''
+        CREATE INDEX idx_text_expense_daily ON transactions(user_id, category_id, date, amount)
+        WHERE type = 'expense'
+    ''',
+}
+
+def fill(db_path, n, users, seed=42):
+    db = Database(db_path)
+    with db.connection() as conn:
+        category_ids = [ids[0] for ids in db.categories.resolve(conn, CATEGORIES).values()]
+    db.pool.close_all()
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    conn = sqlite3.connect(db_path)
+    chunk = 100000
+    for offset in range(0, n, chunk):
+        rows = []
+        for _ in range(min(chunk, n - offset)):
+            day = start + timedelta(days=rng.randrange(2000))
+            rows.append((rng.randint(1, users), day.isoformat(), (day - date(1970, 1, 1)).days,
+                         round(rng.uniform(20, 3000), 2), rng.choice(CATEGORIES), rng.choice(category_ids),
+                         'expense' if rng.random() < 0.8 else 'income'))
+        conn.executemany(
+            'INSERT INTO transactions (user_id, date, day, amount, category, category_id, type) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        conn.commit()
+    for statement in TEXT_INDEXES.values():
+        conn.execute(statement)
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn
+
+def median_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def index_bytes(conn, name):
+    return conn.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (name,)).fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10, help='Per-user reads use the first user')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("INTEGER DAY COLUMN")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'days.db')
+        conn = fill(db_path, args.rows, args.users)
+        print(f"{args.rows} rows, {args.users} users\n")
+
+        print(f"{'index':32s} {'text MB':>9} {'day MB':>9} {'saved':>7}")
+        for text_name, day_name in (('idx_text_user_date', 'idx_transactions_user_day'),
+                                    ('idx_text_user_type_date', 'idx_transactions_user_type_day'),
+                                    ('idx_text_expense_daily', 'idx_transactions_expense_daily')):
+            text_mb = index_bytes(conn, text_name) / 1024 / 1024
+            day_mb = index_bytes(conn, day_name) / 1024 / 1024
+            print(f"{day_name:32s} {text_mb:9.2f} {day_mb:9.2f} {1 - day_mb / text_mb:6.0%}")
+
+        reader = ColumnReader(db_path, 'sqlite')
+        history = [('id', 'id', 'int64'), ('amount', 'amount', 'float64'),
+                   ('category_id', 'category_id', 'int64'), ('expense', "type = 'expense'", 'bool')]
+        # Text: julianday() of every date; day: the stored integer
+        history_text = lambda: reader.read(conn, history + [('day', day_number('date'), 'int32')],
+                                           'transactions INDEXED BY idx_text_user_type_date WHERE user_id = ?',
+                                           (1,))
+        history_day = lambda: reader.read(conn, history + [('day', 'day', 'int32')],
+                                          'transactions WHERE user_id = ?', (1,))
+
+        # A quarter, as get_user_transactions filters it
+        start, end = '2022-01-01', '2022-03-31'
+        range_text = lambda: conn.execute('''
+            SELECT * FROM transactions INDEXED BY idx_text_user_date
+            WHERE user_id = ? AND date >= ? AND date <= ? ORDER BY date DESC
+        ''', (1, start, end)).fetchall()
+        range_day = lambda: conn.execute('''
+            SELECT * FROM transactions WHERE user_id = ? AND day >= ? AND day <= ? ORDER BY day DESC
+        ''', (1, to_day(start), to_day(end))).fetchall()
+
+        daily = '''
+            SELECT user_id, category_id, {key}, SUM(amount) FROM transactions {hint}
+            WHERE type = 'expense' GROUP BY user_id, category_id, {key}
+        '''
+        daily_text = lambda: conn.execute(
+            daily.format(key='date', hint='INDEXED BY idx_text_expense_daily')
+        ).fetchall()
+        daily_day = lambda: conn.execute(daily.format(key='day', hint='')).fetchall()
+
+        frame = pd.read_sql_query('SELECT date, day, amount, category_id FROM transactions', conn)
+        frame['date'] = frame['date'].astype(object)
+
+        def features_text():
+            ds = pd.to_datetime(frame['date'])
+            return ds.dt.dayofweek.to_numpy(), ds.dt.day.to_numpy()
+
+        ds = pd.to_datetime(frame['date'])
+
+        def features_datetime():
+            return ds.dt.dayofweek.to_numpy(), ds.dt.day.to_numpy()
+
+        def features_day():
+            calendar = CALENDAR.lookup(frame['day'].to_numpy(), ('day_of_week', 'day_of_month'))
+            return calendar['day_of_week'], calendar['day_of_month']
+
+        features_check = features_text(), features_day()
+        assert all(np.array_equal(a, b) for a, b in zip(*features_check))
+
+        def weekly_text():
+            df = frame.assign(ds=pd.to_datetime(frame['date']))
+            return df.groupby(['category_id', pd.Grouper(key='ds', freq='W')])['amount'].sum()
+
+        def weekly_day():
+            week_end = CALENDAR.lookup(frame['day'].to_numpy(), ('week_start',))['week_start'] + 6
+            return frame['amount'].groupby([frame['category_id'], week_end]).sum()
+
+        print(f"\n{'operation':28s} {'text ms':>9} {'day ms':>9} {'speedup':>8}")
+        for name, text_fn, day_fn in (('history load (1 user)', history_text, history_day),
+                                      ('date range (1 user)', range_text, range_day),
+                                      ('daily expense totals', daily_text, daily_day),
+                                      ('calendar features (parse)', features_text, features_day),
+                                      ('calendar features (.dt)', features_datetime, features_day),
+                                      ('weekly trends', weekly_text, weekly_day)):
+            text_ms = median_time(text_fn, args.repeat) * 1000
+            day_ms = median_time(day_fn, args.repeat) * 1000
+            print(f"{name:28s} {text_ms:9.1f} {day_ms:9.1f} {text_ms / day_ms:7.1f}x")
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Forecast Engine Benchmark
+Compares latency and accuracy (MAPE on a held-out window) of the NumPy
+smoothing engine against Prophet on synthetic daily expense histories
+with weekly seasonality. Prophet is skipped if it is not installed.
+"""
+import sys
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.intelligence.forecasting import ENGINES
+
+def make_series(n_days, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_days)
+    weekly = np.array([1.0, 0.9, 0.9, 1.0, 1.2, 1.6, 1.4])[t % 7]
+    y = (400 + 0.5 * t) * weekly * rng.lognormal(0, 0.25, n_days)
+    ds = pd.date_range('2024-01-01', periods=n_days, freq='D')
+    return pd.DataFrame({'ds': ds, 'y': y})
+
+def mape(actual, predicted):
+    actual = np.asarray(actual)
+    mask = actual > 0
+    return float(np.mean(np.abs((actual[mask] - np.asarray(predicted)[mask]) / actual[mask])) * 100)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lengths', default='30,60,100,365', help='Comma-separated history lengths (days)')
+    parser.add_argument('--horizon', type=int, default=14)
+    parser.add_argument('--trials', type=int, default=5)
+    args = parser.parse_args()
+
+    engines = ['smoothing']
+    try:
+        import prophet  # noqa: F401
+        import logging
+        logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+        engines.append('prophet')
+    except ImportError:
+        print("Prophet not installed, benchmarking the smoothing engine only")
+
+    print(f"{'days':>6} {'engine':>10} {'latency (ms)':>13} {'MAPE (%)':>9}")
+    for length in (int(x) for x in args.lengths.split(',')):
+        for name in engines:
+            latencies, errors = [], []
+            for trial in range(args.trials):
+                series = make_series(length + args.horizon, seed=trial)
+                train, test = series.iloc[:length], series.iloc[length:]
+
+                start = time.perf_counter()
+                result = ENGINES[name]().forecast(train, args.horizon)
+                latencies.append(time.perf_counter() - start)
+                errors.append(mape(test['y'], result['predicted_amount']))
+
+            print(f"{length:>6} {name:>10} {np.median(latencies) * 1000:13.1f} {np.mean(errors):9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+History Cache Benchmark
+Compares reading one user's history straight from SQLite (the old
+get_user_transactions frame and an uncached get_user_history) with serving
+it from the columnar history cache. Reports memory per cached row against
+the DataFrame it replaces, the cost of a write-through insert, and the hit
+rate of a skewed multi-user workload under a memory bound.
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+import statistics
+import argparse
+from datetime import date, timedelta
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import pandas as pd
+from app.models.database import Database
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health', 'Education']
+
+def make_rows(n, user_id, seed=42):
+    rng = random.Random(seed + user_id)
+    start = date(2022, 1, 1)
+    return [{
+        'user_id': user_id,
+        'date': (start + timedelta(days=rng.randrange(1000))).isoformat(),
+        'amount': round(rng.uniform(20, 3000), 2),
+        'category': rng.choice(CATEGORIES),
+        'type': 'expense' if rng.random() < 0.8 else 'income',
+        'description': 'bench',
+        'source': 'bench'
+    } for _ in range(n)]
+
+def median_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def read_sql_frame(db, user_id):
+    # What get_user_transactions did for every forecast and anomaly check
+    with db.connection() as conn:
+        return pd.read_sql_query(
+            'SELECT * FROM transactions WHERE user_id = ? ORDER BY date DESC', conn, params=(user_id,)
+        )
+
+def bench_sizes(db_dir, sizes, repeat):
+    print(f"{'rows':>8} {'read_sql ms':>12} {'uncached ms':>12} {'cached ms':>10} {'page ms':>8} "
+          f"{'B/row cache':>12} {'B/row frame':>12} {'insert ms':>10}")
+    for n in sizes:
+        db = Database(os.path.join(db_dir, f'sizes_{n}.db'))
+        db.add_transactions(make_rows(n, 1))
+        cache = db.history_cache
+
+        sql_ms = median_time(lambda: read_sql_frame(db, 1), repeat) * 1000
+
+        def uncached():
+            cache.clear()
+            db.get_user_history(1)
+        uncached_ms = median_time(uncached, repeat) * 1000
+
+        db.get_user_history(1)
+        cached_ms = median_time(lambda: db.get_user_history(1), repeat) * 1000
+        page_ms = median_time(lambda: list(db.iter_user_transactions(
+            1, fields=['id', 'date', 'amount', 'category'], limit=50)), repeat) * 1000
+
+        stats = cache.stats()
+        frame = read_sql_frame(db, 1)
+        frame_bytes = frame.memory_usage(deep=True).sum() / len(frame)
+
+        insert_ms = median_time(lambda: db.add_transaction(1, '2023-06-01', 10.0, 'Food', 'expense'), 20) * 1000
+        assert cache.stats()['write_throughs'] >= 20
+
+        print(f"{n:8d} {sql_ms:12.2f} {uncached_ms:12.2f} {cached_ms:10.2f} {page_ms:8.3f} "
+              f"{stats['bytes_per_row']:12.1f} {frame_bytes:12.1f} {insert_ms:10.3f}")
+        db.pool.close_all()
+
+def bench_hit_rate(db_dir, users, rows_per_user, requests, cache_mb):
+    db = Database(os.path.join(db_dir, 'users.db'), history_cache_bytes=int(cache_mb * 1024 * 1024))
+    for uid in range(1, users + 1):
+        db.add_transactions(make_rows(rows_per_user, uid))
+
+    # Zipf-like: a few users make most of the requests
+    rng = random.Random(7)
+    weights = [1 / rank for rank in range(1, users + 1)]
+    picks = rng.choices(range(1, users + 1), weights=weights, k=requests)
+
+    start = time.perf_counter()
+    for i, uid in enumerate(picks):
+        db.get_user_history(uid, txn_type='expense')
+        # An occasional write keeps write-through in the mix
+        if i % 50 == 0:
+            db.add_transaction(uid, '2023-01-15', 42.0, 'Food', 'expense')
+    elapsed = time.perf_counter() - start
+
+    stats = db.history_cache_stats()
+    print(f"\n{users} users x {rows_per_user} rows, {requests} requests, cache {cache_mb:g} MB:")
+    print(f"   hit rate {stats['hit_rate'] * 100:.1f}%  ({stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['evictions']} evictions, {stats['write_throughs']} write-throughs)")
+    print(f"   {stats['size']} users cached, {stats['bytes'] / 1024 / 1024:.2f} MB, "
+          f"{stats['bytes_per_row']:.1f} B/row")
+    print(f"   {elapsed / requests * 1000:.2f} ms per request")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated history lengths')
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rows-per-user', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--cache-mb', type=float, default=2.0, help='Memory bound for the hit-rate run')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("HISTORY CACHE")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bench_sizes(tmpdir, [int(x) for x in args.sizes.split(',')], args.repeat)
+        bench_hit_rate(tmpdir, args.users, args.rows_per_user, args.requests, args.cache_mb)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Load Test
+Starts the backend on a copy of finance.db, under the development server
+(python run.py) and/or gunicorn (wsgi:app with gunicorn.conf.py), and hits
+read endpoints from concurrent keep-alive clients for a fixed duration.
+Reports requests/second and latency percentiles per server.
+"""
+import sys
+import os
+import http.client
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import statistics
+import argparse
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+def endpoints(user_id):
+    return [
+        '/health',
+        f'/api/transactions/balance/{user_id}',
+        f'/api/transactions/categories/{user_id}',
+        f'/api/transactions/{user_id}?limit=50',
+    ]
+
+def start_server(kind, port, db_path, workers, threads):
+    env = dict(os.environ, DATABASE_PATH=db_path, FLASK_ENV='production', PORT=str(port),
+               HOST='127.0.0.1', WARM_UP='false', GUNICORN_ACCESS_LOG='')
+    if kind == 'dev':
+        cmd = [sys.executable, 'run.py']
+    else:
+        env.update(WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads))
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{kind} server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{kind} server did not come up on port {port}")
+
+def stop_server(proc):
+    # SIGTERM exercises the graceful shutdown path
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=35)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+def client(port, paths, stop_at, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    i = 0
+    while time.perf_counter() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except http.client.RemoteDisconnected:
+            # Server closed an idle keep-alive connection: reconnect, not an error
+            errors.append('reconnect')
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def run_load(port, paths, clients, duration):
+    latencies = []
+    errors = []
+    # Short warm-up so both servers are measured with open connections
+    client(port, paths, time.perf_counter() + 1.0, [], [])
+
+    stop_at = time.perf_counter() + duration
+    workers = [threading.Thread(target=client, args=(port, paths, stop_at, latencies, errors))
+               for _ in range(clients)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    reconnects = errors.count('reconnect')
+    return {
+        'requests': len(latencies),
+        'errors': len(errors) - reconnects,
+        'reconnects': reconnects,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), '..', 'finance.db'))
+    parser.add_argument('--server', choices=['dev', 'gunicorn', 'both'], default='both')
+    parser.add_argument('--port', type=int, default=5061)
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per server')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='Gunicorn threads per worker')
+    args = parser.parse_args()
+
+    kinds = ['dev', 'gunicorn'] if args.server == 'both' else [args.server]
+    paths = endpoints(args.user_id)
+
+    print("=" * 60)
+    print("LOAD TEST")
+    print("=" * 60)
+    print(f"Endpoints: {', '.join(paths)}")
+    print(f"Clients: {args.clients}, duration: {args.duration:.0f}s per server, CPUs: {os.cpu_count()}")
+
+    results = {}
+    for offset, kind in enumerate(kinds):
+        workdir = tempfile.mkdtemp()
+        db_path = os.path.join(workdir, 'finance.db')
+        shutil.copy(args.db, db_path)
+        proc = start_server(kind, args.port + offset, db_path, args.workers, args.threads)
+        try:
+            results[kind] = run_load(args.port + offset, paths, args.clients, args.duration)
+        finally:
+            stop_server(proc)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    label = {'dev': 'dev server', 'gunicorn': f'gunicorn {args.workers}x{args.threads}'}
+    print(f"\n{'server':>18} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'requests':>9} {'errors':>7} {'reconn':>7}")
+    for kind, r in results.items():
+        print(f"{label[kind]:>18} {r['rps']:9.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+              f"{r['requests']:9d} {r['errors']:7d} {r['reconnects']:7d}")
+    if len(results) == 2:
+        print(f"\nSpeedup: {results['gunicorn']['rps'] / results['dev']['rps']:.2f}x")
+
+if __name__ == '__main__':
+    main()
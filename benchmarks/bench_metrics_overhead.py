@@ -0,0 +1,88 @@
+"""
+Metrics Overhead Benchmark
+Measures what the metrics instrumentation costs on the hot path: the raw
+cost of one histogram observation, and the per-request time of the read
+endpoints through the Flask test client with metrics enabled vs disabled
+(alternating rounds, median of rounds). Also prints a sample of /metrics.
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+import statistics
+import argparse
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+def observe_cost(iterations):
+    from app.utils.metrics import Histogram, Registry
+    histogram = Histogram('bench_seconds', 'bench', ('label',), registry=Registry())
+    start = time.perf_counter()
+    for _ in range(iterations):
+        histogram.observe(0.003, 'x')
+    return (time.perf_counter() - start) / iterations
+
+def round_time(client, paths, requests_per_round):
+    start = time.perf_counter()
+    for i in range(requests_per_round):
+        response = client.get(paths[i % len(paths)])
+        assert response.status_code == 200, response.status_code
+    return (time.perf_counter() - start) / requests_per_round
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), '..', 'finance.db'))
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=400, help='Requests per round')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    shutil.copy(args.db, os.path.join(workdir, 'finance.db'))
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'finance.db')
+
+    try:
+        from app.factory import create_app
+        from app.utils import metrics
+        app = create_app('production')
+        client = app.test_client()
+        uid = args.user_id
+        paths = [
+            f'/api/transactions/balance/{uid}',
+            f'/api/transactions/categories/{uid}',
+            f'/api/transactions/{uid}?limit=50',
+        ]
+
+        print("=" * 60)
+        print("METRICS OVERHEAD")
+        print("=" * 60)
+        print(f"Histogram.observe: {observe_cost(200000) * 1e9:.0f} ns per call")
+
+        # Warm up both paths
+        round_time(client, paths, 100)
+        on, off = [], []
+        for _ in range(args.rounds):
+            metrics.set_enabled(False)
+            off.append(round_time(client, paths, args.requests))
+            metrics.set_enabled(True)
+            on.append(round_time(client, paths, args.requests))
+
+        off_us = statistics.median(off) * 1e6
+        on_us = statistics.median(on) * 1e6
+        print(f"\nPer request, metrics off: {off_us:8.1f} us")
+        print(f"Per request, metrics on:  {on_us:8.1f} us")
+        print(f"Overhead:                 {on_us - off_us:8.1f} us ({(on_us - off_us) / off_us * 100:+.2f}%)")
+
+        text = client.get('/metrics').get_data(as_text=True)
+        print(f"\n/metrics: {len(text.splitlines())} lines, e.g.")
+        for line in text.splitlines():
+            if line.startswith(('http_request_duration_seconds_count', 'db_method_duration_seconds_sum',
+                                'db_pool_checkouts_total')):
+                print(f"  {line}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Startup Benchmark
+Reports the import time of every backend module and of the heavy third-party
+packages (from python -X importtime), the wall time of a cold `import run`,
+and how long building the ML services takes (Services.warm_up) once the app
+is up. Each measurement runs in a fresh interpreter on a scratch database.
+"""
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+import statistics
+import argparse
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+HEAVY_PACKAGES = ('flask', 'requests', 'numpy', 'pandas', 'scipy', 'sklearn', 'prophet', 'cmdstanpy')
+
+WALL_SNIPPET = '''
+import time
+start = time.perf_counter()
+import run
+print(f"wall {time.perf_counter() - start:.6f}")
+'''
+
+WARM_SNIPPET = '''
+import time
+import run
+start = time.perf_counter()
+run.app.services.warm_up(background=False)
+print(f"warm {time.perf_counter() - start:.6f}")
+'''
+
+def run_python(args, db_path, capture_stderr=False):
+    env = dict(os.environ, DATABASE_PATH=db_path, PYTHONPATH=BACKEND_DIR, WARM_UP='false')
+    result = subprocess.run(
+        [sys.executable] + args,
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True
+    )
+    return result.stderr if capture_stderr else result.stdout
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Keep the first (outermost) import of each module
+        times.setdefault(name.strip(), (int(self_us), int(cumulative_us)))
+    return times
+
+def last_value(output, label):
+    for line in output.splitlines():
+        if line.startswith(label + ' '):
+            return float(line.split()[1])
+    raise RuntimeError(f"No '{label}' line in output:\n{output}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), '..', 'finance.db'),
+                        help='Database copied for each run')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'finance.db')
+
+    def fresh_db():
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        if os.path.exists(args.db):
+            shutil.copy(args.db, db_path)
+        return db_path
+
+    try:
+        print("=" * 60)
+        print("BACKEND STARTUP")
+        print("=" * 60)
+
+        times = parse_importtime(run_python(['-X', 'importtime', '-c', 'import run'], fresh_db(), True))
+
+        print("\nBackend modules (cumulative ms):")
+        for name in sorted(n for n in times if n == 'run' or n == 'config' or n.startswith('app.')):
+            print(f"  {name:<40} {times[name][1] / 1000:8.1f}")
+
+        print("\nHeavy packages imported by `import run` (cumulative ms):")
+        for name in HEAVY_PACKAGES:
+            status = f"{times[name][1] / 1000:8.1f}" if name in times else '     not loaded'
+            print(f"  {name:<40} {status}")
+
+        print(f"\nSlowest {args.top} modules by self time (ms):")
+        for name, (self_us, _) in sorted(times.items(), key=lambda item: -item[1][0])[:args.top]:
+            print(f"  {name:<40} {self_us / 1000:8.1f}")
+
+        walls = [last_value(run_python(['-c', WALL_SNIPPET], fresh_db()), 'wall') for _ in range(args.runs)]
+        warms = [last_value(run_python(['-c', WARM_SNIPPET], fresh_db()), 'warm') for _ in range(args.runs)]
+
+        print(f"\nCold `import run`:        {statistics.median(walls) * 1000:8.1f} ms (median of {args.runs})")
+        print(f"Services.warm_up():       {statistics.median(warms) * 1000:8.1f} ms (paid on first chat request "
+              f"or at startup with WARM_UP=true)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
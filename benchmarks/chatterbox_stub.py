@@ -0,0 +1,110 @@
+"""
+Chatterbox Stub Server
+Stands in for the local model service on 127.0.0.1:4123 so the client and
+chat route can be exercised without it. /chat returns a keyword-matched
+intent, /respond echoes a short answer, streamed as NDJSON tokens when the
+request sets "stream". Latency, token pacing and failures are configurable.
+"""
+import json
+import random
+import threading
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubConfig:
+    latency = 0.0
+    token_delay = 0.0
+    fail_rate = 0.0
+    calls = 0
+
+def guess_intent(message):
+    text = message.lower()
+    if 'forecast' in text or 'predict' in text or 'next' in text:
+        return {'intent': 'forecast', 'time_range': 30}
+    if 'unusual' in text or 'anomal' in text or 'weird' in text:
+        return {'intent': 'anomaly_check'}
+    return {'intent': 'spending_summary'}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # add ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+    config = StubConfig
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.config.calls += 1
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.config.latency:
+            time.sleep(self.config.latency)
+        if random.random() < self.config.fail_rate:
+            return self._send(503, {'error': 'stub failure'})
+
+        if self.path == '/chat':
+            body = {'response': json.dumps(guess_intent(payload.get('input', '')))}
+        elif self.path == '/respond':
+            text = f"Here is what I found for: {payload.get('input', '')}"
+            if payload.get('stream'):
+                return self._stream_tokens(text)
+            # Same generation time as the streamed answer, just delivered at once
+            time.sleep(self.config.token_delay * len(text.split(' ')))
+            body = {'response': text}
+        else:
+            return self._send(404, {'error': 'not found'})
+        self._send(200, body)
+
+    def _stream_tokens(self, text):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, word in enumerate(text.split(' ')):
+            token = word if i == 0 else ' ' + word
+            line = (json.dumps({'token': token}) + '\n').encode()
+            self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+            if self.config.token_delay:
+                time.sleep(self.config.token_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_stub(host='127.0.0.1', port=4123, latency=0.0, fail_rate=0.0, token_delay=0.0):
+    """Start the stub in a daemon thread; returns the server (call shutdown())"""
+    config = type('Config', (StubConfig,), {
+        'latency': latency, 'fail_rate': fail_rate, 'token_delay': token_delay, 'calls': 0
+    })
+    handler = type('Handler', (StubHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4123)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to sleep per request')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered 503')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Seconds between streamed tokens')
+    args = parser.parse_args()
+
+    server = start_stub(args.host, args.port, args.latency, args.fail_rate, args.token_delay)
+    print(f"Chatterbox stub listening on http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
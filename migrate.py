@@ -0,0 +1,161 @@
+"""
+Schema Migrations
+Applies pending schema migrations (see backend/app/models/migrations.py) to
+a database, refreshes planner statistics, and reports the query plan and
+timing of the app's main read shapes before and after. --dry-run lists the
+pending migrations and the current plans without changing anything.
+"""
+import sys
+import os
+import sqlite3
+import statistics
+import time
+import argparse
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.models.dates import to_day
+from app.models.migrations import (LATEST_VERSION, column_names, optimize, pending_migrations,
+                                   run_migrations, schema_version)
+from app.models.profiler import plan_summary
+
+# (name, SQL, parameter names) of the statements the read paths run. {day}
+# and {category} name the columns the schema being measured has: day and
+# category_id, or the date and category text before migrations 6 and 8.
+PLAN_QUERIES = [
+    ('history load', '''
+        SELECT id, {day}, amount, {category}, type FROM transactions WHERE user_id = ?
+    ''', ('user_id',)),
+    ('expenses by date', '''
+        SELECT {day}, amount, {category} FROM transactions
+        WHERE user_id = ? AND type = 'expense'
+        ORDER BY {day} DESC
+    ''', ('user_id',)),
+    ('transactions list', '''
+        SELECT * FROM transactions WHERE user_id = ? ORDER BY {day} DESC
+    ''', ('user_id',)),
+    ('date range', '''
+        SELECT * FROM transactions WHERE user_id = ? AND {day} >= ? AND {day} <= ? ORDER BY {day} DESC
+    ''', ('user_id', 'start_{day}', 'end_{day}')),
+    ('daily expense totals', '''
+        SELECT user_id, {category}, {day}, SUM(amount) AS amount
+        FROM transactions
+        WHERE type = 'expense'
+        GROUP BY user_id, {category}, {day}
+    ''', ()),
+    # Without get_anomalies' join to anomaly_models, a table only the app
+    # creates: it is one primary key lookup and does not change the plan
+    ('recent anomalies', '''
+        SELECT a.*, t.date, t.amount, t.category
+        FROM anomalies a
+        JOIN transactions t ON a.transaction_id = t.id
+        WHERE t.user_id = ?
+        ORDER BY a.detected_at DESC
+        LIMIT 10
+    ''', ('user_id',)),
+]
+
+def sample_params(conn):
+    """The busiest user and the last 90 days of their history, as dates and day numbers"""
+    row = conn.execute('''
+        SELECT user_id, MAX(date) FROM transactions
+        GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1
+    ''').fetchone()
+    user_id, last = row if row is not None else (1, '2024-03-31')
+    start = conn.execute("SELECT date(?, '-90 days')", (last,)).fetchone()[0]
+    return {'user_id': user_id, 'start_date': start, 'end_date': last,
+            'start_day': to_day(start), 'end_day': to_day(last)}
+
+def schema_columns(conn):
+    """PLAN_QUERIES column names for the database's current schema"""
+    columns = column_names(conn, 'transactions')
+    return {'day': 'day' if 'day' in columns else 'date',
+            'category': 'category_id' if 'category_id' in columns else 'category'}
+
+def measure(conn, params, repeat):
+    """{name: (plan details, median ms)} for PLAN_QUERIES"""
+    schema = schema_columns(conn)
+    results = {}
+    for name, sql, names in PLAN_QUERIES:
+        sql = sql.format(**schema)
+        args = [params[n.format(**schema)] for n in names]
+        try:
+            plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', args)]
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql, args).fetchall()
+                times.append((time.perf_counter() - start) * 1000)
+            results[name] = (plan, statistics.median(times))
+        except sqlite3.OperationalError as e:
+            results[name] = ([f'error: {e}'], None)
+    return results
+
+def print_plans(before, after=None):
+    for name, _, _ in PLAN_QUERIES:
+        plan, ms = before[name]
+        if after is None:
+            timing = f'{ms:.2f} ms' if ms is not None else 'n/a'
+        else:
+            new_plan, new_ms = after[name]
+            timing = (f'{ms:.2f} ms -> {new_ms:.2f} ms ({ms / new_ms:.1f}x)'
+                      if ms is not None and new_ms else 'n/a')
+        print(f"\n{name}: {timing}")
+        for label, details in (('before', plan), ('after', None if after is None else after[name][0])):
+            if details is None:
+                continue
+            indexes, scans = plan_summary(details)
+            if after is not None:
+                print(f"   {label}: indexes {', '.join(indexes) or 'none'}"
+                      f"{'; full scan of ' + ', '.join(scans) if scans else ''}")
+            for detail in details:
+                print(f"      -> {detail}")
+
+def migrate(db_path, target=None, dry_run=False, repeat=5):
+    print("=" * 60)
+    print("SCHEMA MIGRATIONS (DRY RUN)" if dry_run else "SCHEMA MIGRATIONS")
+    print("=" * 60)
+
+    if not os.path.exists(db_path):
+        print(f"No database at {db_path}; a new one is created at the current schema on first start")
+        return 1
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        pending = pending_migrations(conn, target)
+        print(f"\nSchema version: {schema_version(conn)} (latest {LATEST_VERSION})")
+        print(f"Pending migrations: {len(pending)}")
+        for version, description in pending:
+            print(f"   {version}: {description}")
+
+        params = sample_params(conn)
+        print(f"\nSample parameters: {params}")
+        before = measure(conn, params, repeat)
+
+        if dry_run:
+            print("\nCurrent query plans:")
+            print_plans(before)
+            return 0
+
+        applied = run_migrations(conn, target)
+        optimize(conn)
+        print(f"\n[OK] Applied {len(applied)} migrations in {sum(s for _, _, s in applied):.2f}s, "
+              f"schema version now {schema_version(conn)}")
+
+        after = measure(conn, params, repeat)
+        print("\nQuery plans before -> after:")
+        print_plans(before, after)
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply schema migrations and report query plans')
+    # No default: migrating rewrites the file in place, so name it explicitly
+    parser.add_argument('--db', required=True, help='Path to the SQLite database')
+    parser.add_argument('--target', type=int, default=None, help='Migrate up to this version (default: latest)')
+    parser.add_argument('--dry-run', action='store_true', help='Only list pending migrations and current plans')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+    args = parser.parse_args()
+    sys.exit(migrate(args.db, args.target, args.dry_run, args.repeat))
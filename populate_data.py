@@ -9,11 +9,25 @@ def populate_demo_data():
     user_id = db.add_user('demo_user', 'demo@example.com')
     print(f"User ID: {user_id}")
 
+    # Collected and written in one bulk insert at the end
+    rows = []
+    
+    def add(date, amount, category, txn_type, description='', source=''):
+        rows.append({
+            'user_id': user_id,
+            'date': date,
+            'amount': amount,
+            'category': category,
+            'type': txn_type,
+            'description': description,
+            'source': source
+        })
+    
     # 2. Add Monthly Income (Income)
     # Salary for past 3 months
     for i in range(3):
         date = (datetime.now() - timedelta(days=30*i)).strftime('%Y-%m-%d')
-        db.add_transaction(user_id, date, 50000, 'Income', 'income', 'Salary', 'Job')
+        add(date, 50000, 'Income', 'income', 'Salary', 'Job')
     
     # 3. Add Regular Expenses (Food, Transport, Utilities)
     categories = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health']
@@ -39,14 +53,17 @@ def populate_demo_data():
                 amount = random.randint(500, 5000)
                 
             if amount > 0:
-                db.add_transaction(user_id, date, amount, category, 'expense', f'{category} expense')
+                add(date, amount, category, 'expense', f'{category} expense')
 
     # 4. Add some Anomalies (Weird high spending)
     # A party a week ago
-    db.add_transaction(user_id, (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'), 12000, 'Entertainment', 'expense', 'Big Party', 'Bar')
+    add((datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'), 12000, 'Entertainment', 'expense', 'Big Party', 'Bar')
     
     # A medical emergency 20 days ago
-    db.add_transaction(user_id, (datetime.now() - timedelta(days=20)).strftime('%Y-%m-%d'), 15000, 'Health', 'expense', 'Emergency', 'Hospital')
+    add((datetime.now() - timedelta(days=20)).strftime('%Y-%m-%d'), 15000, 'Health', 'expense', 'Emergency', 'Hospital')
+    
+    result = db.add_transactions(rows)
+    print(f"Transactions added: {result['inserted']}")
 
     # 5. Add Goals
     db.add_financial_goal(user_id, 'New Laptop', 80000, '2026-06-01')
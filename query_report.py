@@ -0,0 +1,164 @@
+"""
+Query Profile Report
+Aggregates a query profile log (written with DB_PROFILE=true, see
+DB_PROFILE_LOG) into the top statements by total time, shows the query plan
+of each, and lists which indexes the logged workload used and which tables
+it scanned in full. --workload first profiles the app's read paths against
+the database, so the report can be produced without running the server.
+"""
+import sys
+import os
+import json
+import sqlite3
+import argparse
+from collections import defaultdict
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.models.profiler import QueryProfiler, plan_summary
+
+def run_workload(db_path, log_path, users, threshold_ms):
+    """Profile the read paths the API and intelligence services use"""
+    from app.models.database import Database
+
+    # Open once unprofiled so any schema migration stays out of the log
+    Database(db_path).pool.close_all()
+    profiler = QueryProfiler(db_path, threshold_ms=threshold_ms, log_path=log_path)
+    db = Database(db_path, profiler=profiler)
+    if not users:
+        with db.connection() as conn:
+            users = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+
+    for uid in users:
+        db.get_user_transactions(uid)
+        db.get_user_history(uid)
+        db.get_user_aggregates(uid)
+        db.get_all_categories(uid)
+        db.get_user_balance(uid)
+        db.get_category_totals(uid)
+        db.get_monthly_totals(uid)
+        db.get_anomalies(uid)
+        db.count_anomalies(uid)
+        db.get_data_version(uid)
+        categories = db.get_all_categories(uid)
+        if categories:
+            db.get_user_transactions(uid, category=categories[0])
+        db.get_user_transactions(uid, start_date='2024-01-01', end_date='2024-03-31')
+    db.get_daily_expense_totals()
+
+    db.pool.close_all()
+    profiler.close()
+    print(f"Profiled workload for {len(users)} users into {log_path}")
+
+def load_log(log_path):
+    entries = []
+    with open(log_path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+def aggregate(entries):
+    queries = {}
+    for entry in entries:
+        stats = queries.get(entry['sql'])
+        if stats is None:
+            stats = queries[entry['sql']] = {
+                'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'rows': 0, 'slow': 0, 'params': entry.get('params'), 'plan': None, 'durations': []
+            }
+        stats['count'] += 1
+        stats['total_ms'] += entry['ms']
+        stats['max_ms'] = max(stats['max_ms'], entry['ms'])
+        stats['rows'] += entry.get('rows', 0)
+        stats['slow'] += 1 if entry.get('slow') else 0
+        stats['durations'].append(entry['ms'])
+        if entry.get('plan'):
+            stats['plan'] = entry['plan']
+    return sorted(queries.values(), key=lambda q: -q['total_ms'])
+
+def query_report(log_path, db_path=None, top=15, workload=False, users=None, threshold_ms=50.0):
+    if workload:
+        if not db_path:
+            print("--workload needs --db")
+            return 1
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        run_workload(db_path, log_path, users, threshold_ms)
+
+    if not os.path.exists(log_path):
+        print(f"No query log at {log_path} (run with DB_PROFILE=true or use --workload)")
+        return 1
+
+    queries = aggregate(load_log(log_path))
+    total_ms = sum(q['total_ms'] for q in queries)
+    executions = sum(q['count'] for q in queries)
+
+    # Plans for statements that were never slow enough to carry one
+    explainer = QueryProfiler(db_path) if db_path else None
+    for q in queries:
+        if q['plan'] is None and explainer:
+            q['plan'] = explainer.explain(q['sql'])
+
+    print("=" * 60)
+    print("QUERY PROFILE")
+    print("=" * 60)
+    print(f"Log: {log_path}")
+    print(f"{executions} executions of {len(queries)} distinct statements, {total_ms:.1f} ms total")
+
+    print(f"\nTop {min(top, len(queries))} statements by total time:")
+    for rank, q in enumerate(queries[:top], 1):
+        durations = sorted(q['durations'])
+        p95 = durations[int(len(durations) * 0.95)] if len(durations) > 1 else durations[0]
+        share = q['total_ms'] / total_ms * 100 if total_ms else 0.0
+        print(f"\n{rank:2d}. {q['total_ms']:9.1f} ms ({share:4.1f}%)  x{q['count']}  "
+              f"avg {q['total_ms'] / q['count']:.2f} ms  p95 {p95:.2f} ms  max {q['max_ms']:.2f} ms  "
+              f"rows {q['rows']}  slow {q['slow']}")
+        print(f"    params {q['params']}")
+        print(f"    {q['sql'][:240]}")
+        for detail in q['plan'] or ():
+            print(f"      -> {detail}")
+
+    # Which indexes the workload used, and what it scanned in full
+    index_time = defaultdict(float)
+    scan_time = defaultdict(float)
+    for q in queries:
+        indexes, scans = plan_summary(q['plan'] or ())
+        for name in indexes:
+            index_time[name] += q['total_ms']
+        for table in scans:
+            scan_time[table] += q['total_ms']
+
+    print("\nIndex usage (ms of logged time in statements using each):")
+    defined = []
+    if db_path:
+        conn = sqlite3.connect(db_path)
+        try:
+            defined = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )]
+        finally:
+            conn.close()
+    for name in sorted(set(defined) | set(index_time)):
+        used = index_time.get(name)
+        print(f"   {name:40s} {f'{used:9.1f} ms' if used is not None else '   unused'}")
+
+    print("\nFull table scans:")
+    if not scan_time:
+        print("   none")
+    for table, ms in sorted(scan_time.items(), key=lambda item: -item[1]):
+        print(f"   {table:40s} {ms:9.1f} ms")
+    return 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Aggregate a query profile log by total time')
+    parser.add_argument('--log', default='query_profile.jsonl', help='Query profile JSONL (DB_PROFILE_LOG)')
+    parser.add_argument('--db', default=None, help='SQLite database, for plans and the index list')
+    parser.add_argument('--top', type=int, default=15, help='Statements to show')
+    parser.add_argument('--workload', action='store_true', help='Profile the read paths into --log first')
+    parser.add_argument('--users', type=int, nargs='*', help='User ids for --workload (default: all)')
+    parser.add_argument('--slow-ms', type=float, default=50.0, help='Slow query threshold for --workload')
+    args = parser.parse_args()
+    sys.exit(query_report(args.log, args.db, args.top, args.workload, args.users, args.slow_ms))
@@ -0,0 +1,44 @@
+"""
+Rebuild or Verify User Aggregates
+Recomputes the user_aggregates rollup from the transactions table, or
+checks the stored rollup against a fresh scan without modifying it
+"""
+import sys
+import os
+import argparse
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from app.models.database import Database
+
+def rebuild_aggregates(db_path, verify_only=False):
+    print("=" * 60)
+    print("VERIFYING USER AGGREGATES" if verify_only else "REBUILDING USER AGGREGATES")
+    print("=" * 60)
+    
+    db = Database(db_path)
+    
+    mismatches = db.verify_aggregates()
+    print(f"\nMismatched rollup rows: {len(mismatches)}")
+    for row in mismatches[:20]:
+        print(f"   user={row['user_id']} {row['type']}/{row['category']} {row['month']}: "
+              f"expected {row['expected_total']} ({row['expected_count']}), "
+              f"stored {row['stored_total']} ({row['stored_count']})")
+    
+    if verify_only:
+        return 1 if mismatches else 0
+    
+    rows = db.rebuild_aggregates()
+    print(f"\n[OK] Rebuilt {rows} rollup rows")
+    
+    remaining = db.verify_aggregates()
+    print(f"Mismatches after rebuild: {len(remaining)}")
+    return 1 if remaining else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild or verify user_aggregates')
+    parser.add_argument('--db', required=True, help='Path to the SQLite database (rewritten in place)')
+    parser.add_argument('--verify', action='store_true', help='Only report mismatches')
+    args = parser.parse_args()
+    sys.exit(rebuild_aggregates(args.db, verify_only=args.verify))
@@ -0,0 +1,128 @@
+"""
+Run Batch Forecasts
+Forecasts expenses for every user (overall and per category) in a process
+pool and bulk-writes the results to the forecasts table, where the chat
+route picks them up as long as the user's data version is unchanged
+"""
+import sys
+import os
+import time
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+from app.models.database import Database
+from app.intelligence.forecasting import select_engine
+
+def build_tasks(daily, min_points):
+    """Partition daily totals into one task per user and per (user, category)"""
+    tasks = []
+    for user_id, user_rows in daily.groupby('user_id', sort=False):
+        overall = user_rows.groupby('date', sort=True)['amount'].sum()
+        if len(overall) >= min_points:
+            tasks.append((int(user_id), None, overall.index.to_numpy(), overall.to_numpy()))
+        
+        for category, rows in user_rows.groupby('category', sort=False):
+            if len(rows) >= min_points:
+                tasks.append((int(user_id), category, rows['date'].to_numpy(), rows['amount'].to_numpy()))
+    return tasks
+
+def run_task(user_id, category, dates, amounts, days_ahead, engine, prophet_min_points):
+    """Fit one series in a worker process"""
+    import logging
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    
+    start = time.perf_counter()
+    history = pd.DataFrame({'ds': pd.to_datetime(dates), 'y': amounts})
+    selected = select_engine(history, engine, prophet_min_points)
+    try:
+        result = selected.forecast(history, days_ahead)
+        error = None
+    except Exception as e:
+        result, error = None, str(e)
+    return user_id, category, selected.name, result, error, time.perf_counter() - start
+
+def run_batch_forecasts(db_path, days_ahead=30, workers=None, engine='auto',
+                        prophet_min_points=100, min_points=2):
+    print("=" * 60)
+    print("RUNNING BATCH FORECASTS")
+    print("=" * 60)
+    
+    db = Database(db_path)
+    
+    # Versions first: data that changes after this read only makes the
+    # stored forecasts look stale, never fresh
+    load_start = time.perf_counter()
+    versions = db.get_data_versions()
+    daily = db.get_daily_expense_totals()
+    tasks = build_tasks(daily, min_points)
+    print(f"\nLoaded {len(daily)} daily totals in {time.perf_counter() - load_start:.2f}s")
+    print(f"Tasks: {len(tasks)} series across {daily['user_id'].nunique()} users")
+    
+    if not tasks:
+        print("\nNothing to forecast.")
+        return
+    
+    rows, failures = [], []
+    timings = {}
+    start = time.perf_counter()
+    progress_every = max(1, len(tasks) // 20)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_task, *task, days_ahead, engine, prophet_min_points)
+            for task in tasks
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            user_id, category, engine_name, result, error, elapsed = future.result()
+            timings.setdefault(engine_name, []).append(elapsed)
+            
+            if error:
+                failures.append((user_id, category, error))
+            else:
+                rows.append((user_id, category, days_ahead, versions.get(user_id, 0), json.dumps(result)))
+            
+            if done % progress_every == 0 or done == len(tasks):
+                wall = time.perf_counter() - start
+                print(f"  [{done}/{len(tasks)}] {done / len(tasks):.0%}  "
+                      f"{done / wall:.1f} tasks/s  elapsed {wall:.1f}s")
+    
+    write_start = time.perf_counter()
+    db.save_forecasts(rows)
+    write_s = time.perf_counter() - write_start
+    wall = time.perf_counter() - start
+    
+    print(f"\n[OK] Wrote {len(rows)} forecasts in {write_s:.2f}s")
+    print(f"Throughput: {len(tasks) / wall:.1f} tasks/s over {wall:.1f}s")
+    print("\nPer-task timing (ms):")
+    for engine_name, values in sorted(timings.items()):
+        values = np.array(values) * 1000
+        print(f"   {engine_name:>10}: n={len(values)}  p50={np.percentile(values, 50):.1f}  "
+              f"p95={np.percentile(values, 95):.1f}  max={values.max():.1f}")
+    
+    if failures:
+        print(f"\nFailed tasks: {len(failures)}")
+        for user_id, category, error in failures[:10]:
+            print(f"   user={user_id} category={category or '(all)'}: {error}")
+    
+    print("\n" + "=" * 60)
+    print("BATCH FORECASTS COMPLETE")
+    print("=" * 60)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Forecast all users and categories')
+    parser.add_argument('--db', required=True, help='Path to the SQLite database (forecasts are stored in it)')
+    parser.add_argument('--days', type=int, default=30, help='Days ahead to forecast')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--engine', default='auto', choices=['auto', 'prophet', 'smoothing'])
+    parser.add_argument('--prophet-min-points', type=int, default=100)
+    parser.add_argument('--min-points', type=int, default=2, help='Skip series with fewer days of data')
+    args = parser.parse_args()
+    
+    run_batch_forecasts(args.db, args.days, args.workers, args.engine,
+                        args.prophet_min_points, args.min_points)